@@ -2,7 +2,7 @@
 Flask Web Application - E-Wallet Transaction Verification System
 Database version (no JSON files)
 """
-from flask import Flask, render_template, jsonify, request  
+from flask import Flask, render_template, jsonify, request, Response, g
 import os
 
 # ✅ Fixed imports - use database functions
@@ -14,10 +14,43 @@ from core.transaction import (
     get_transaction_by_id
 )
 from core.verification import full_verification_flow
+from core.batch import submit_batch
 from core.fraud_detection import get_fraud_statistics
+from core.instrumentation import render_prometheus
+from core.sweeper import start_sweeper
+from blockchain.blockchain import get_blockchain
+from core import profiling
 
 app = Flask(__name__)
 
+PROFILE_HEADER = 'X-Profile'
+
+@app.before_request
+def start_request_profile():
+    """Header X-Profile: 1|cprofile|sample -> profile riêng request này (debug / --profile)"""
+    modes = request.headers.get(PROFILE_HEADER)
+    if modes and (app.debug or profiling.is_enabled()):
+        try:
+            g.profiler = profiling.Profiler(f"request_{request.endpoint}", modes).start()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+@app.after_request
+def stop_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        paths = profiler.stop()
+        if paths:
+            response.headers['X-Profile-Path'] = profiler.directory
+    return response
+
+@app.teardown_request
+def discard_request_profile(error=None):
+    # Request lỗi không qua after_request - vẫn phải dừng profiler của thread
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
 @app.route('/')
 def index():
     """Home page"""
@@ -108,19 +141,36 @@ def api_create_transaction():
 
         # Return full transaction info
         return jsonify({
-            "id": signed_tx.get("id"),
-            "from": signed_tx.get("sender"),  # ✅ Changed from "from"
-            "to": signed_tx.get("receiver"),   # ✅ Changed from "to"
-            "amount": signed_tx.get("amount"),
-            "timestamp": signed_tx.get("timestamp"),
-            "status": signed_tx.get("status", "signed"),
-            "signature": signed_tx.get("signature")[:32] + "..."
+            "id": signed_tx.id,
+            "from": signed_tx.sender,
+            "to": signed_tx.receiver,
+            "amount": signed_tx.amount,
+            "timestamp": signed_tx.timestamp,
+            "status": signed_tx.status or "signed",
+            "signature": signed_tx.signature[:32] + "..."
         })
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Lỗi tạo giao dịch: {str(e)}'}), 500
 
+@app.route('/api/transactions/batch', methods=['POST'])
+def api_batch_transactions():
+    """Create, sign and verify many transfers in one request"""
+    try:
+        data = request.json or {}
+        transfers = data.get('transfers')
+
+        if not isinstance(transfers, list) or not transfers:
+            return jsonify({'error': 'Danh sách transfers không được để trống'}), 400
+
+        result = submit_batch(transfers, data.get('passphrases'))
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Lỗi xử lý batch: {str(e)}'}), 500
+
 @app.route('/api/verify-transaction', methods=['POST'])
 def api_verify_transaction():
     """Verify transaction"""
@@ -160,13 +210,13 @@ def api_get_transactions():
         formatted_txs = []
         for tx in transactions:
             formatted_txs.append({
-                "id": tx.get("id"),
-                "from": tx.get("sender"),
-                "to": tx.get("receiver"),
-                "amount": tx.get("amount"),
-                "timestamp": tx.get("timestamp"),
-                "status": tx.get("status"),
-                "executed": tx.get("executed")
+                "id": tx.id,
+                "from": tx.sender,
+                "to": tx.receiver,
+                "amount": tx.amount,
+                "timestamp": tx.timestamp,
+                "status": tx.status,
+                "executed": tx.executed
             })
         
         return jsonify(formatted_txs)
@@ -187,11 +237,41 @@ def api_fraud_statistics():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/transaction-proof', methods=['GET'])
+def api_transaction_proof():
+    """Merkle inclusion proof của giao dịch đã vào block"""
+    try:
+        tx_id = request.args.get('tx_id')
+        if not tx_id:
+            return jsonify({'error': 'Thiếu tx_id'}), 400
+
+        try:
+            proof = get_blockchain().get_transaction_proof(tx_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        if not proof:
+            return jsonify({'error': 'Giao dịch chưa được đưa vào block'}), 404
+
+        return jsonify(proof)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics (latency từng stage, counters)"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    # python app.py --profile[=cprofile|sample]
+    profiling.enable_from_argv()
+    
     # Ensure directories exist
     os.makedirs('templates', exist_ok=True)
     os.makedirs('data', exist_ok=True)
     
+    # Dọn giao dịch pending/signed hết hạn định kỳ
+    start_sweeper()
+    
     # Run Flask app
     print("🚀 Starting E-Wallet Web Server (Database Mode)...")
     print("📱 Open browser: http://localhost:5000")
@@ -0,0 +1,299 @@
+"""
+ASGI Application - E-Wallet Transaction Verification System
+Cùng API JSON với app.py (Flask) nhưng chạy trên asyncio qua AsyncTransactionService.
+
+Chạy bằng bất kỳ ASGI server nào, ví dụ:
+    uvicorn asgi:app --port 8000
+"""
+import os
+import json
+import asyncio
+from urllib.parse import parse_qs
+
+from core.async_api import get_async_service, close_async_service
+from core.instrumentation import render_prometheus
+from core.sweeper import start_sweeper, stop_sweeper
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+_index_html = None  # đọc một lần lúc startup (hoặc lần gọi đầu, ngoài event loop)
+
+
+def _load_index():
+    global _index_html
+    if _index_html is None:
+        with open(os.path.join(TEMPLATE_DIR, "index.html"), "rb") as f:
+            _index_html = f.read()
+    return _index_html
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    if not body:
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "Body không phải JSON hợp lệ")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Body phải là JSON object")
+    return data
+
+
+async def _send(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, json.dumps(payload).encode(), b"application/json")
+
+
+# ------------------ Routes ------------------ #
+
+async def index(service, request):
+    """Home page"""
+    body = _index_html
+    if body is None:
+        # Server không gửi lifespan -> đọc file trên executor, không chặn event loop
+        body = await asyncio.get_running_loop().run_in_executor(None, _load_index)
+    return 200, (body, b"text/html; charset=utf-8")
+
+
+async def get_wallets(service, request):
+    """Lấy danh sách ví - chỉ thông tin công khai."""
+    wallets = await service.get_all_wallets()
+    return 200, {
+        wallet["name"]: {
+            "name": wallet["name"],
+            "address": wallet["address"],
+            "balance": wallet.get("balance", 0),
+            "created_at": wallet.get("created_at")
+        }
+        for wallet in wallets
+    }
+
+
+async def api_create_wallet(service, request):
+    """Create new wallet"""
+    data = request["json"]
+    name = data.get('name')
+    passphrase = data.get('passphrase')
+
+    if not name or not passphrase:
+        raise HTTPError(400, 'Tên ví và passphrase không được để trống')
+
+    wallet_info = await service.create_wallet(name, passphrase)
+    return 200, {
+        "name": wallet_info["name"],
+        "address": wallet_info["address"],
+        "balance": wallet_info.get("balance", 0),
+        "created_at": wallet_info.get("created_at")
+    }
+
+
+async def api_create_transaction(service, request):
+    """Create and sign transaction"""
+    data = request["json"]
+    from_user = data.get('from_user')
+    to_user = data.get('to_user')
+    amount = data.get('amount')
+    passphrase = data.get('passphrase')
+
+    if not all([from_user, to_user, amount, passphrase]):
+        raise HTTPError(400, 'Thiếu thông tin giao dịch hoặc passphrase')
+
+    try:
+        amount = int(amount)
+    except (ValueError, TypeError):
+        raise HTTPError(400, 'Số tiền không hợp lệ')
+    if amount <= 0:
+        raise HTTPError(400, 'Số tiền phải lớn hơn 0')
+
+    from_wallet = await service.get_wallet_info(from_user)
+    to_wallet = await service.get_wallet_info(to_user)
+    if not from_wallet:
+        raise HTTPError(404, f'Không tìm thấy ví: {from_user}')
+    if not to_wallet:
+        raise HTTPError(404, f'Không tìm thấy ví: {to_user}')
+
+    try:
+        transaction = await service.create_transaction(
+            from_user, to_user, amount,
+            from_wallet["address"], to_wallet["address"]
+        )
+        signed_tx = await service.sign_transaction(transaction, from_user, passphrase)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    except Exception as e:
+        raise HTTPError(500, f'Lỗi tạo giao dịch: {str(e)}')
+
+    return 200, {
+        "id": signed_tx.id,
+        "from": signed_tx.sender,
+        "to": signed_tx.receiver,
+        "amount": signed_tx.amount,
+        "timestamp": signed_tx.timestamp,
+        "status": signed_tx.status or "signed",
+        "signature": signed_tx.signature[:32] + "..."
+    }
+
+
+async def api_batch_transactions(service, request):
+    """Create, sign and verify many transfers in one request"""
+    data = request["json"]
+    transfers = data.get('transfers')
+
+    if not isinstance(transfers, list) or not transfers:
+        raise HTTPError(400, 'Danh sách transfers không được để trống')
+
+    try:
+        return 200, await service.submit_batch(transfers, data.get('passphrases'))
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    except Exception as e:
+        raise HTTPError(500, f'Lỗi xử lý batch: {str(e)}')
+
+
+async def api_verify_transaction(service, request):
+    """Verify transaction"""
+    tx_id = request["json"].get('tx_id')
+    if not tx_id or not isinstance(tx_id, str):
+        raise HTTPError(400, 'Thiếu tx_id')
+    return 200, await service.verify_transaction(tx_id)
+
+
+async def api_wallet_info(service, request):
+    """Lấy thông tin ví công khai"""
+    name = request["query"].get('name')
+    if not name:
+        raise HTTPError(400, 'Tên ví không được để trống')
+
+    wallet_info = await service.get_wallet_info(name, safe=True)
+    if not wallet_info:
+        raise HTTPError(404, 'Không tìm thấy ví')
+    return 200, wallet_info
+
+
+async def api_get_transactions(service, request):
+    """Get all transactions from database"""
+    transactions = await service.get_all_transactions()
+    return 200, [
+        {
+            "id": tx.id,
+            "from": tx.sender,
+            "to": tx.receiver,
+            "amount": tx.amount,
+            "timestamp": tx.timestamp,
+            "status": tx.status,
+            "executed": tx.executed
+        }
+        for tx in transactions
+    ]
+
+
+async def api_fraud_statistics(service, request):
+    """Get fraud detection statistics"""
+    stats = await service.get_fraud_statistics()
+    wallets = await service.get_all_wallets()
+    stats['total_wallets'] = len(wallets)
+    return 200, stats
+
+
+async def api_transaction_proof(service, request):
+    """Merkle inclusion proof của giao dịch đã vào block"""
+    tx_id = request["query"].get('tx_id')
+    if not tx_id:
+        raise HTTPError(400, 'Thiếu tx_id')
+
+    try:
+        proof = await service.get_transaction_proof(tx_id)
+    except ValueError as e:
+        raise HTTPError(409, str(e))
+    if not proof:
+        raise HTTPError(404, 'Giao dịch chưa được đưa vào block')
+    return 200, proof
+
+
+async def metrics(service, request):
+    """Prometheus metrics (latency từng stage, counters)"""
+    return 200, (render_prometheus().encode(), b"text/plain; version=0.0.4")
+
+
+ROUTES = {
+    ("GET", "/"): index,
+    ("GET", "/api/wallets"): get_wallets,
+    ("POST", "/api/create-wallet"): api_create_wallet,
+    ("POST", "/api/create-transaction"): api_create_transaction,
+    ("POST", "/api/transactions/batch"): api_batch_transactions,
+    ("POST", "/api/verify-transaction"): api_verify_transaction,
+    ("GET", "/api/wallet-info"): api_wallet_info,
+    ("GET", "/api/transactions"): api_get_transactions,
+    ("GET", "/api/fraud-statistics"): api_fraud_statistics,
+    ("GET", "/api/transaction-proof"): api_transaction_proof,
+    ("GET", "/metrics"): metrics,
+}
+
+
+# ------------------ ASGI entry point ------------------ #
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            get_async_service()
+            _load_index()
+            start_sweeper()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            stop_sweeper()
+            close_async_service()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        return await _send_json(send, 404, {'error': 'Not found'})
+
+    try:
+        query = parse_qs(scope.get("query_string", b"").decode())
+        request = {
+            "query": {key: values[0] for key, values in query.items()},
+            "json": await _read_json(receive) if scope["method"] == "POST" else {},
+        }
+        status, payload = await handler(get_async_service(), request)
+    except HTTPError as e:
+        return await _send_json(send, e.status, {'error': e.message})
+    except Exception as e:
+        return await _send_json(send, 500, {'error': str(e)})
+
+    if isinstance(payload, tuple):
+        body, content_type = payload
+        return await _send(send, status, body, content_type)
+    return await _send_json(send, status, payload)
@@ -0,0 +1,85 @@
+"""
+Benchmark crypto backend: ops/sec cho keygen / sign / verify của từng backend,
+kèm kiểm tra chữ ký ký bằng backend này verify được bằng backend kia.
+
+Chạy: python -m benchmarks.crypto_bench [--seconds 1.0]
+"""
+import os
+import time
+import argparse
+import hashlib
+from core.crypto import available_backends, create_crypto_backend
+
+
+def _ops_per_sec(fn, seconds):
+    """Gọi fn lặp lại trong khoảng `seconds`, trả về số lần / giây"""
+    fn()  # warm-up (cache key, load thư viện)
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        fn()
+        count += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - start)
+
+
+def bench_backend(backend, seconds=1.0):
+    private_key, public_key = backend.generate_keypair()
+    message_hash = hashlib.sha256(os.urandom(32)).digest()
+    signature = backend.sign(private_key, message_hash)
+
+    return {
+        "keygen": _ops_per_sec(backend.generate_keypair, seconds),
+        "sign": _ops_per_sec(lambda: backend.sign(private_key, message_hash), seconds),
+        "verify": _ops_per_sec(lambda: backend.verify(public_key, signature, message_hash), seconds),
+    }
+
+
+def check_interop(backends):
+    """Chữ ký giữa các backend phải giống hệt nhau và verify chéo được"""
+    private_key, public_key = backends[0].generate_keypair()
+    message_hash = hashlib.sha256(b"interop").digest()
+
+    signatures = {b.name: b.sign(private_key, message_hash) for b in backends}
+    identical = len(set(signatures.values())) == 1
+    cross_verified = all(
+        verifier.verify(public_key, signature, message_hash)
+        for verifier in backends
+        for signature in signatures.values()
+    )
+    return identical, cross_verified
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crypto backends")
+    parser.add_argument("--seconds", type=float, default=1.0, help="thời gian đo mỗi thao tác")
+    args = parser.parse_args()
+
+    backends = [create_crypto_backend(name) for name in available_backends()]
+
+    print(f"\n🔐 CRYPTO BACKEND BENCHMARK ({args.seconds}s / thao tác)")
+    print(f"{'backend':<14}{'keygen/s':>12}{'sign/s':>12}{'verify/s':>12}")
+    results = {}
+    for backend in backends:
+        result = bench_backend(backend, args.seconds)
+        results[backend.name] = result
+        print(f"{backend.name:<14}{result['keygen']:>12,.0f}{result['sign']:>12,.0f}{result['verify']:>12,.0f}")
+
+    if "ecdsa" in results and "cryptography" in results:
+        base = results["ecdsa"]
+        fast = results["cryptography"]
+        print(f"\n⚡ cryptography / ecdsa: sign x{fast['sign'] / base['sign']:.1f}, "
+              f"verify x{fast['verify'] / base['verify']:.1f}")
+
+    if len(backends) > 1:
+        identical, cross_verified = check_interop(backends)
+        print(f"\n🔁 Chữ ký giống hệt nhau: {'✅' if identical else '❌'}")
+        print(f"🔁 Verify chéo: {'✅' if cross_verified else '❌'}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Benchmark harness - các scenario đo hiệu năng có tên, workload sinh theo seed,
+chạy không tương tác (thay cho tests/run_1000_accounts.py).
+
+Chạy:
+    python -m benchmarks.harness                         # mọi scenario
+    python -m benchmarks.harness sign verify --repeats 5
+    python -m benchmarks.harness --scale 0.2             # bản nhanh
+    python -m benchmarks.harness --save-baseline         # lưu làm baseline
+    python -m benchmarks.harness --compare               # so với baseline, exit 1 nếu regression
+    python -m benchmarks.harness --compare-files old.json new.json
+
+Mỗi lần chạy (repeat) của một scenario dùng storage mới (SQLite trong thư mục
+tạm hoặc memory): setup (không đo) -> warm-up -> `ops` thao tác, đo từng
+thao tác. Report JSON ghi throughput (median / min / max các repeat), latency
+p50/p95/p99 và số liệu instrumentation từng stage vào data/reports/.
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+from contextlib import contextmanager
+
+from core import instrumentation, profiling
+from core.instrumentation import Histogram
+from core.storage import use_storage
+from core.crypto import get_crypto_backend
+from core.log import set_silent, configure
+
+REPORT_DIR = os.path.abspath(os.path.join("data", "reports"))
+BASELINE_FILE = os.path.join(REPORT_DIR, "bench_baseline.json")
+
+DEFAULT_SEED = 1234
+DEFAULT_THRESHOLD = 0.10
+
+SCENARIOS = {}
+
+
+class Scenario:
+    """Một kịch bản benchmark: setup(workload) trả về hàm op(i)"""
+
+    def __init__(self, name, setup, ops, warmup, description):
+        self.name = name
+        self.setup = setup
+        self.ops = ops
+        self.warmup = warmup
+        self.description = description
+
+
+def scenario(name, ops, warmup=None, description=""):
+    """Đăng ký scenario; ops / warmup là số thao tác ở scale 1.0"""
+    def decorator(setup):
+        SCENARIOS[name] = Scenario(name, setup, ops,
+                                   warmup if warmup is not None else max(ops // 10, 1),
+                                   description)
+        return setup
+    return decorator
+
+
+class Workload:
+    """Tham số chung cho setup: rng theo seed + scale cho kích thước dữ liệu"""
+
+    def __init__(self, seed, scale):
+        self.rng = random.Random(seed)
+        self.scale = scale
+
+    def size(self, base, minimum=1):
+        return max(int(base * self.scale), minimum)
+
+    def digest(self):
+        return hashlib.sha256(self.rng.getrandbits(256).to_bytes(32, "big")).digest()
+
+
+@contextmanager
+def fresh_storage(kind):
+    """Storage rỗng cho một repeat; SQLite nằm trong thư mục tạm (data/ tương đối)"""
+    if kind == "memory":
+        with use_storage("memory") as storage:
+            yield storage
+        return
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="ecdsa-bench-") as tmp:
+        os.chdir(tmp)
+        try:
+            with use_storage("sqlite") as storage:
+                yield storage
+        finally:
+            os.chdir(cwd)
+
+
+# ------------------ Scenarios ------------------ #
+
+@scenario("keygen", ops=200, description="Sinh cặp khóa secp256k1")
+def _setup_keygen(workload):
+    backend = get_crypto_backend()
+    return lambda i: backend.generate_keypair()
+
+
+@scenario("kdf", ops=5, warmup=1, description="PBKDF2 390k vòng (mã hóa / giải mã private key)")
+def _setup_kdf(workload):
+    from core.wallet import _derive_fernet_key
+    salts = [workload.rng.getrandbits(128).to_bytes(16, "big") for _ in range(8)]
+    return lambda i: _derive_fernet_key(f"pass_{i:06d}", salts[i % len(salts)])
+
+
+@scenario("sign", ops=500, description="Ký ECDSA (RFC 6979) một message hash")
+def _setup_sign(workload):
+    backend = get_crypto_backend()
+    private_key, _ = backend.generate_keypair()
+    messages = [workload.digest() for _ in range(64)]
+    return lambda i: backend.sign(private_key, messages[i % len(messages)])
+
+
+@scenario("verify", ops=500, description="Verify chữ ký ECDSA")
+def _setup_verify(workload):
+    backend = get_crypto_backend()
+    private_key, public_key = backend.generate_keypair()
+    messages = [workload.digest() for _ in range(64)]
+    signatures = [backend.sign(private_key, message) for message in messages]
+
+    def op(i):
+        k = i % len(messages)
+        return "verified" if backend.verify(public_key, signatures[k], messages[k]) else "invalid"
+    return op
+
+
+@scenario("transfer", ops=100, description="Tạo + ký + xác thực + thực thi một giao dịch (key đã giải mã sẵn)")
+def _setup_transfer(workload):
+    from core.wallet import create_wallets, get_private_key_bytes
+    from core.transaction import create_transaction, compute_signature, store_signature
+    from core.verification import full_verification_flow
+
+    specs = [(f"bench_{n:04d}", f"pass_{n:04d}", 10 ** 12) for n in range(workload.size(16, 2))]
+    wallets = create_wallets(specs)
+    keys = {name: get_private_key_bytes(name, passphrase) for name, passphrase, _ in specs}
+
+    def op(i):
+        sender, receiver = workload.rng.sample(wallets, 2)
+        transaction = create_transaction(sender["name"], receiver["name"],
+                                         workload.rng.randint(1000, 100000),
+                                         sender["address"], receiver["address"])
+        store_signature(compute_signature(transaction, keys[sender["name"]]))
+        return full_verification_flow(transaction.id)["transaction_status"]
+    return op
+
+
+def _block_transactions(workload, count, index):
+    return [
+        {
+            "id": f"bench_tx_{index}_{k}",
+            "sender": f"bench_{workload.rng.randrange(1000):04d}",
+            "receiver": f"bench_{workload.rng.randrange(1000):04d}",
+            "amount": workload.rng.randint(1000, 100000),
+            "timestamp": datetime(2025, 1, 1).isoformat(),
+            "status": "verified",
+            "signature": workload.digest().hex(),
+        }
+        for k in range(count)
+    ]
+
+
+@scenario("mine", ops=20, warmup=2, description="Mine một block đầy (PoW + lưu chain)")
+def _setup_mine(workload):
+    from blockchain.blockchain import Blockchain
+    chain = Blockchain()
+
+    def op(i):
+        chain.pending_transactions = _block_transactions(workload, chain.max_transactions_per_block, i)
+        chain.mine_pending_transactions()
+    return op
+
+
+def _seed_chain(workload, blocks, transactions_per_block=10):
+    """Ghi thẳng `blocks` block đã mine vào storage (không qua save_blockchain)"""
+    from core.database import save_block
+    from blockchain.blockchain import Block
+    difficulty = 2
+    previous_hash = "0"
+    for index in range(blocks):
+        transactions = _block_transactions(workload, transactions_per_block if index else 0, index)
+        block = Block(index, transactions, 1735689600.0 + index, previous_hash).mine_block(difficulty)
+        save_block(block.to_dict())
+        previous_hash = block.hash
+
+
+@scenario("chain_load", ops=5, warmup=1, description="Load toàn bộ chain từ storage (Blockchain())")
+def _setup_chain_load(workload):
+    from blockchain.blockchain import Blockchain
+    _seed_chain(workload, workload.size(200, 2))
+    return lambda i: Blockchain()
+
+
+@scenario("audit", ops=3, warmup=1, description="Audit song song toàn bộ chain từ storage")
+def _setup_audit(workload):
+    from blockchain.audit import audit_chain
+    _seed_chain(workload, workload.size(1000, 2))
+    return lambda i: "verified" if audit_chain(chunk_size=workload.size(200, 10))["valid"] else "invalid"
+
+
+@scenario("stats", ops=20, warmup=2, description="Truy vấn thống kê của dashboard (fraud + blockchain)")
+def _setup_stats(workload):
+    from core.storage import get_storage
+    from core.transaction import new_transaction
+    from core.fraud_detection import get_fraud_statistics
+    from blockchain.blockchain import Blockchain
+
+    statuses = ("verified", "rejected", "signed", "pending")
+    get_storage().insert_transactions([
+        new_transaction(f"bench_{workload.rng.randrange(100):04d}", f"bench_{workload.rng.randrange(100):04d}",
+                        workload.rng.randint(1000, 100000), nonce=n).replace(status=workload.rng.choice(statuses))
+        for n in range(workload.size(2000, 10))
+    ])
+    _seed_chain(workload, workload.size(50, 2))
+    chain = Blockchain()
+
+    def op(i):
+        get_fraud_statistics()
+        chain.get_blockchain_stats()
+    return op
+
+
+# ------------------ Chạy ------------------ #
+
+def run_scenario(item, scale=1.0, repeats=3, seed=DEFAULT_SEED, storage="sqlite"):
+    """Chạy một scenario `repeats` lần, mỗi lần trên storage mới"""
+    ops = max(int(item.ops * scale), 1)
+    latency = Histogram()
+    throughputs = []
+    outcomes = {}
+    instrumentation.reset()
+
+    for repeat in range(repeats):
+        with fresh_storage(storage):
+            workload = Workload(seed + repeat, scale)
+            op = item.setup(workload)
+            for i in range(item.warmup):
+                op(-1 - i)
+
+            start = time.perf_counter()
+            for i in range(ops):
+                op_start = time.perf_counter()
+                outcome = op(i)
+                latency.record(time.perf_counter() - op_start)
+                if isinstance(outcome, str):
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            throughputs.append(ops / (time.perf_counter() - start))
+
+    return {
+        "description": item.description,
+        "ops": ops,
+        "repeats": repeats,
+        "throughput": {
+            "median": statistics.median(throughputs),
+            "min": min(throughputs),
+            "max": max(throughputs),
+            "runs": throughputs,
+        },
+        "latency_ms": latency.summary(),
+        "outcomes": outcomes,
+        "stages": instrumentation.summary()["histograms"],
+    }
+
+
+def run_suite(names=None, scale=1.0, repeats=3, seed=DEFAULT_SEED, storage="sqlite", progress=print):
+    """Chạy các scenario (mặc định: tất cả), trả về report dict"""
+    names = names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Scenario không tồn tại: {', '.join(unknown)}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "scenarios": names,
+            "scale": scale,
+            "repeats": repeats,
+            "seed": seed,
+            "storage": storage,
+            "crypto_backend": get_crypto_backend().name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": {},
+    }
+
+    for name in names:
+        if progress:
+            progress(f"⏱️  {name:<11} ...")
+        result = run_scenario(SCENARIOS[name], scale, repeats, seed, storage)
+        report["scenarios"][name] = result
+        if progress:
+            progress(_format_result(name, result))
+    return report
+
+
+def _format_result(name, result):
+    latency = result["latency_ms"]
+    return (f"   {name:<11}{result['throughput']['median']:>12,.1f} ops/s"
+            f"   p50={latency['p50_ms']:.3f} p95={latency['p95_ms']:.3f} p99={latency['p99_ms']:.3f} ms")
+
+
+def save_report(report, path=None):
+    if path is None:
+        path = os.path.join(REPORT_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ------------------ So sánh với baseline ------------------ #
+
+def _change(current, baseline):
+    return (current / baseline - 1) if baseline else 0.0
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    So sánh từng scenario chung của hai report.
+    Regression: throughput giảm quá threshold hoặc p95 latency tăng quá threshold.
+    """
+    rows = []
+    for name, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        throughput_change = _change(result["throughput"]["median"], base["throughput"]["median"])
+        p95_change = _change(result["latency_ms"]["p95_ms"], base["latency_ms"]["p95_ms"])
+        rows.append({
+            "scenario": name,
+            "baseline_throughput": base["throughput"]["median"],
+            "throughput": result["throughput"]["median"],
+            "throughput_change": throughput_change,
+            "baseline_p95_ms": base["latency_ms"]["p95_ms"],
+            "p95_ms": result["latency_ms"]["p95_ms"],
+            "p95_change": p95_change,
+            "regression": throughput_change < -threshold or p95_change > threshold,
+        })
+    return rows
+
+
+def print_comparison(rows, baseline, current, threshold=DEFAULT_THRESHOLD):
+    mismatched = [
+        key for key in ("scale", "storage", "crypto_backend", "seed")
+        if baseline["config"].get(key) != current["config"].get(key)
+    ]
+    if mismatched:
+        print(f"⚠️  Cấu hình khác baseline: {', '.join(mismatched)} - kết quả không so sánh trực tiếp được")
+
+    print(f"\n📊 SO SÁNH VỚI BASELINE ({baseline['timestamp']}, ngưỡng {threshold:.0%})")
+    print(f"{'scenario':<12}{'ops/s':>12}{'Δ':>9}{'p95 ms':>12}{'Δ':>9}")
+    for row in rows:
+        flag = "⚠️  REGRESSION" if row["regression"] else "✅"
+        print(f"{row['scenario']:<12}{row['throughput']:>12,.1f}{row['throughput_change']:>+9.1%}"
+              f"{row['p95_ms']:>12.3f}{row['p95_change']:>+9.1%}  {flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark harness")
+    parser.add_argument("scenarios", nargs="*", help=f"scenario cần chạy ({', '.join(SCENARIOS)})")
+    parser.add_argument("--scale", type=float, default=1.0, help="nhân số thao tác / kích thước dữ liệu")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--storage", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--output", help="đường dẫn file report (mặc định data/reports/bench_<time>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="lưu report làm baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE, metavar="BASELINE",
+                        help="so sánh với baseline sau khi chạy")
+    parser.add_argument("--compare-files", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="chỉ so sánh hai report có sẵn")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--list", action="store_true", help="liệt kê scenario")
+    parser.add_argument("--verbose", action="store_true", help="giữ log của core")
+    parser.add_argument("--profile", nargs="?", const="all", metavar="cprofile|sample",
+                        help="profile verification / mining / create_wallets trong lúc chạy")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for item in SCENARIOS.values():
+            print(f"{item.name:<12}{item.ops:>6} ops  {item.description}")
+        return 0
+
+    if args.compare_files:
+        baseline, current = (load_report(path) for path in args.compare_files)
+        rows = compare_reports(baseline, current, args.threshold)
+        print_comparison(rows, baseline, current, args.threshold)
+        return 1 if any(row["regression"] for row in rows) else 0
+
+    if args.profile:
+        profiling.enable(args.profile)
+    if not args.verbose:
+        set_silent()
+    try:
+        print(f"\n🏁 BENCHMARK (scale={args.scale}, repeats={args.repeats}, seed={args.seed}, "
+              f"storage={args.storage}, crypto={get_crypto_backend().name})")
+        report = run_suite(args.scenarios, args.scale, args.repeats, args.seed, args.storage)
+    finally:
+        if not args.verbose:
+            configure()
+
+    path = save_report(report, args.output)
+    print(f"\n📄 Report: {path}")
+    if args.profile:
+        profiles = profiling.flush()
+        if profiles:
+            print(f"🔬 Profiles: {os.path.dirname(profiles[0])}")
+    if args.save_baseline:
+        save_report(report, BASELINE_FILE)
+        print(f"📌 Baseline: {BASELINE_FILE}")
+
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print(f"⚠️  Chưa có baseline: {args.compare}")
+            return 0
+        baseline = load_report(args.compare)
+        rows = compare_reports(baseline, report, args.threshold)
+        print_comparison(rows, baseline, report, args.threshold)
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
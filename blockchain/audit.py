@@ -0,0 +1,156 @@
+"""
+Audit toàn bộ chain song song - dùng sau khi restore hoặc khi nghi ngờ bị sửa.
+
+- Chia chain thành các khoảng index; với SQLite mỗi worker tự đọc khoảng
+  của mình (load_block_range) - process chính không phải đọc + pickle block.
+  Storage khác: process chính đọc tuần tự theo chunk (iter_blocks)
+- Hash lại từng chunk trên process pool (compute_block_hash là hàm thuần,
+  các block độc lập nhau)
+- Kiểm tra tuần tự ở process chính theo đúng thứ tự: index liên tiếp,
+  hash lưu == hash tính lại, previous_hash, proof of work
+- Dừng ở block lỗi đầu tiên, báo height + throughput (blocks/s)
+
+Chạy: python -m blockchain.audit [--workers N] [--chunk-size 500]
+"""
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from core.storage import get_storage, set_storage
+from core.log import get_logger
+from blockchain.blockchain import compute_block_hash
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _hash_chunk(blocks):
+    """Worker: [(index, hash lưu, previous_hash, hash tính lại)] cho một chunk"""
+    return [
+        (
+            block["index"],
+            block["hash"],
+            block["previous_hash"],
+            compute_block_hash(block["index"], block["transactions"], block["timestamp"],
+                               block["previous_hash"], block["nonce"], block.get("version") or 1),
+        )
+        for block in blocks
+    ]
+
+
+def _hash_range(start, stop):
+    """Worker (SQLite): tự đọc các block trong [start, stop) rồi hash"""
+    return _hash_chunk(get_storage().load_block_range(start, stop))
+
+
+def _check(entries, state, target):
+    """Kiểm tra tuần tự một chunk đã hash; trả về (height, lỗi) đầu tiên hoặc None"""
+    for index, stored_hash, previous_hash, computed_hash in entries:
+        if index != state["next_index"]:
+            return state["next_index"], "missing block"
+        state["next_index"] = index + 1
+        state["checked"] += 1
+        if index == 0:
+            # Genesis: chỉ cần hash khớp (giống is_chain_valid)
+            state["previous_hash"] = stored_hash
+            continue
+        if stored_hash != computed_hash:
+            return index, "invalid hash"
+        if previous_hash != state["previous_hash"]:
+            return index, "invalid previous_hash"
+        if not stored_hash.startswith(target):
+            return index, "invalid proof of work"
+        state["previous_hash"] = stored_hash
+    return None
+
+
+def audit_chain(workers=None, chunk_size=DEFAULT_CHUNK_SIZE, difficulty=None, storage=None):
+    """
+    Audit toàn bộ chain trong storage.
+    workers=0: hash ngay trong process hiện tại (chain nhỏ / debug).
+    Trả về dict: valid, blocks_checked, first_invalid_height, error, seconds, blocks_per_sec.
+    """
+    storage = storage or get_storage()
+    if difficulty is None:
+        difficulty = int(storage.get_metadata("difficulty", 2))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    target = "0" * difficulty
+
+    state = {"next_index": 0, "checked": 0, "previous_hash": None}
+    failure = None
+    start_time = time.perf_counter()
+
+    if workers <= 0:
+        for chunk in storage.iter_blocks(chunk_size=chunk_size):
+            failure = _check(_hash_chunk(chunk), state, target)
+            if failure:
+                break
+    else:
+        if storage.name == "sqlite":
+            top = storage.get_max_block_index()
+            top = -1 if top is None else top
+            jobs = ((_hash_range, (start, start + chunk_size)) for start in range(0, top + 1, chunk_size))
+            pool_options = {"initializer": set_storage, "initargs": ("sqlite",)}
+        else:
+            jobs = ((_hash_chunk, (chunk,)) for chunk in storage.iter_blocks(chunk_size=chunk_size))
+            pool_options = {}
+
+        # Giới hạn số chunk đang xử lý -> bộ nhớ cố định dù chain dài bao nhiêu
+        in_flight = deque()
+        with ProcessPoolExecutor(max_workers=workers, **pool_options) as pool:
+            for fn, args in jobs:
+                in_flight.append(pool.submit(fn, *args))
+                if len(in_flight) >= workers * 2:
+                    failure = _check(in_flight.popleft().result(), state, target)
+                    if failure:
+                        break
+            while in_flight and not failure:
+                failure = _check(in_flight.popleft().result(), state, target)
+            for future in in_flight:
+                future.cancel()
+
+    elapsed = time.perf_counter() - start_time
+    result = {
+        "valid": failure is None,
+        "blocks_checked": state["checked"],
+        "first_invalid_height": failure[0] if failure else None,
+        "error": failure[1] if failure else None,
+        "seconds": elapsed,
+        "blocks_per_sec": state["checked"] / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+        "chunk_size": chunk_size,
+    }
+
+    if failure:
+        logger.error("❌ Audit: block #%s has %s", failure[0], failure[1])
+    else:
+        logger.info("✅ Audit: %s blocks valid (%.0f blocks/s)", state["checked"], result["blocks_per_sec"])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit toàn bộ blockchain (song song)")
+    parser.add_argument("--workers", type=int, default=None, help="số process (0 = không dùng pool)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--difficulty", type=int, default=None, help="mặc định lấy từ metadata")
+    args = parser.parse_args(argv)
+
+    result = audit_chain(args.workers, args.chunk_size, args.difficulty)
+
+    print(f"\n🔍 CHAIN AUDIT ({result['workers']} workers, chunk {result['chunk_size']})")
+    print(f"   Blocks checked: {result['blocks_checked']:,}")
+    print(f"   Time: {result['seconds']:.3f}s ({result['blocks_per_sec']:,.0f} blocks/s)")
+    if result["valid"]:
+        print("   ✅ Chain hợp lệ")
+    else:
+        print(f"   ❌ Block lỗi đầu tiên: #{result['first_invalid_height']} ({result['error']})")
+    return 0 if result["valid"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
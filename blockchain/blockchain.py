@@ -1,43 +1,127 @@
 import json
 import hashlib
 import time
+import sqlite3
+import threading
 from datetime import datetime
+from functools import wraps
 from core.database import (
-    save_block, 
-    load_all_blocks, 
+    insert_block,
+    since,
+    load_block_range,
+    iter_block_headers,
     get_blockchain_metadata,
     set_blockchain_metadata,
-    delete_all_blocks
+    delete_all_blocks,
+    find_transaction_location
 )
+from core.records import TransactionRecord
+from core.log import get_logger, Amount
+from core.instrumentation import timed, inc
+from core.profiling import profiled
+from blockchain.merkle import merkle_root as compute_merkle_root, merkle_proof
+from blockchain.chain_view import ChainView, BlockHeader
+from blockchain.snapshot import SNAPSHOT_INTERVAL, restore_ledger, write_snapshot
+from core.storage import get_storage
+
+logger = get_logger(__name__)
+
+# Cứ mỗi CHECKPOINT_INTERVAL block đã validate thì lưu một checkpoint
+# (height -> hash) vào blockchain_metadata, giữ MAX_CHECKPOINTS cái gần nhất
+CHECKPOINT_INTERVAL = 100
+MAX_CHECKPOINTS = 16
+
+# Số block đọc mỗi lần khi refresh() nối tail từ DB
+REFRESH_BATCH_SIZE = 500
+
+# Version block:
+# 1 - (legacy) hash JSON toàn bộ block kể cả transactions
+# 2 - hash header chứa merkle_root (có Merkle inclusion proof), mặc định cho block mới
+LEGACY_BLOCK_VERSION = 1
+BLOCK_VERSION = 2
+
+
+def compute_header_hash(index, merkle_root_hex, timestamp, previous_hash, nonce, version=BLOCK_VERSION):
+    """Hash header của block version >= 2"""
+    header_string = json.dumps({
+        "index": index,
+        "merkle_root": merkle_root_hex,
+        "timestamp": timestamp,
+        "previous_hash": previous_hash,
+        "nonce": nonce,
+        "version": version
+    }, sort_keys=True)
+    return hashlib.sha256(header_string.encode()).hexdigest()
+
+
+def compute_block_hash(index, transactions, timestamp, previous_hash, nonce, version=LEGACY_BLOCK_VERSION):
+    """
+    Hash SHA-256 của block - hàm thuần, dùng được trong process worker (audit).
+    Version 2 tính lại merkle root từ transactions nên vẫn phát hiện được sửa đổi.
+    """
+    if version >= 2:
+        return compute_header_hash(index, compute_merkle_root(transactions), timestamp, previous_hash, nonce, version)
+    block_string = json.dumps({
+        "index": index,
+        "transactions": transactions,
+        "timestamp": timestamp,
+        "previous_hash": previous_hash,
+        "nonce": nonce
+    }, sort_keys=True)
+    return hashlib.sha256(block_string.encode()).hexdigest()
+
 
 class Block:
     """Khối blockchain chứa nhiều giao dịch"""
-    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0):
+    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0,
+                 version=BLOCK_VERSION, merkle_root=None, block_hash=None):
         self.index = index
         self.transactions = transactions
         self.timestamp = timestamp
         self.previous_hash = previous_hash
         self.nonce = nonce
-        self.hash = self.calculate_hash()
+        self.version = version
+        if version >= 2 and merkle_root is None:
+            merkle_root = compute_merkle_root(transactions)
+        self.merkle_root = merkle_root
+        # block_hash: hash đã lưu (from_dict) - không tính lại; kiểm tra bằng calculate_hash()
+        self.hash = block_hash if block_hash is not None else self._pow_hash()
     
     def calculate_hash(self):
-        """Tính hash của block"""
-        block_string = json.dumps({
+        """Tính hash của block (version 2: tính lại merkle root từ transactions)"""
+        return compute_block_hash(self.index, self.transactions, self.timestamp,
+                                  self.previous_hash, self.nonce, self.version)
+    
+    def _pow_hash(self):
+        """Hash dùng khi mine: version 2 chỉ hash header với merkle root đã tính sẵn"""
+        if self.version >= 2:
+            return compute_header_hash(self.index, self.merkle_root, self.timestamp,
+                                       self.previous_hash, self.nonce, self.version)
+        return self.calculate_hash()
+    
+    def header(self):
+        """Header của block (không có transactions) - đủ để kiểm tra Merkle proof"""
+        return {
             "index": self.index,
-            "transactions": self.transactions,
             "timestamp": self.timestamp,
             "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+            "nonce": self.nonce,
+            "merkle_root": self.merkle_root,
+            "version": self.version,
+            "hash": self.hash
+        }
     
+    @timed("mining_seconds")
     def mine_block(self, difficulty):
         """Proof of Work - mining"""
         target = "0" * difficulty
+        start_nonce = self.nonce
         while self.hash[:difficulty] != target:
             self.nonce += 1
-            self.hash = self.calculate_hash()
-        print(f"⛏️  Block mined: {self.hash[:32]}...")
+            self.hash = self._pow_hash()
+        inc("mining_hashes_total", self.nonce - start_nonce + 1)
+        inc("blocks_mined_total")
+        logger.debug("⛏️  Block mined: %s...", self.hash[:32])
         return self
     
     def to_dict(self):
@@ -47,33 +131,107 @@ class Block:
             "timestamp": self.timestamp,
             "previous_hash": self.previous_hash,
             "nonce": self.nonce,
-            "hash": self.hash
+            "hash": self.hash,
+            "merkle_root": self.merkle_root,
+            "version": self.version
         }
+    
+    @classmethod
+    def from_dict(cls, block_data):
+        """Dựng lại block đã lưu (giữ nguyên hash trong storage, không hash lại)"""
+        return cls(
+            index=block_data["index"],
+            transactions=block_data["transactions"],
+            timestamp=block_data["timestamp"],
+            previous_hash=block_data["previous_hash"],
+            nonce=block_data["nonce"],
+            version=block_data.get("version") or LEGACY_BLOCK_VERSION,
+            merkle_root=block_data.get("merkle_root"),
+            block_hash=block_data["hash"]
+        )
+
+
+def _exclusive(method):
+    """Thao tác ghi chain (pending pool, mine, lưu, reset) chạy tuần tự qua Blockchain.lock"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _load_blocks(start, stop):
+    """Loader của ChainView: đọc body block từ storage khi không có trong cache"""
+    return [Block.from_dict(data) for data in load_block_range(start, stop)]
+
 
 class Blockchain:
-    """Blockchain chính - SQLite3 version"""
-    def __init__(self, difficulty=2):
-        self.chain = []
+    """
+    Blockchain chính - SQLite3 version.
+    self.chain là ChainView: header của mọi block + cửa sổ LRU block đầy đủ
+    (cache_blocks / cache_bytes), block cũ đọc lại từ SQLite khi cần.
+    """
+    def __init__(self, difficulty=2, cache_blocks=None, cache_bytes=None, is_writer=None):
+        # Một writer: mọi thao tác ghi giữ lock này (xem blockchain/service.py)
+        self.lock = threading.RLock()
+        # is_writer(): process này có được mine / ghi block không (blockchain/leader.py)
+        self.is_writer = is_writer or (lambda: True)
+        self._listeners = []
+        self.chain = ChainView(_load_blocks, cache_blocks, cache_bytes)
         self.difficulty = int(get_blockchain_metadata("difficulty", difficulty))
         self.pending_transactions = []
         self.mining_reward = int(get_blockchain_metadata("mining_reward", 100))
         self.transaction_fee_rate = 0.001  
         self.max_transactions_per_block = 10
         
+        # Trạng thái validate: các block <= validated_height đã kiểm tra
+        # (hash, liên kết, PoW); is_chain_valid() chỉ kiểm tra phần mới
+        self.validated_height = -1
+        self.invalid_height = None
+        
+        # Số liệu cộng dồn khi append block - stats không phải duyệt cả chain.
+        # total_transactions lấy từ tx_count của header; reward cần body nên
+        # chỉ tính (quét theo chunk) ở lần đầu được hỏi
+        self.total_transactions = 0
+        self._rewards = None  # [số block reward, tổng reward] | None = chưa tính
+        
+        # Số dư / nonce theo chain (blockchain/snapshot.py) - dựng lazy từ
+        # snapshot gần nhất ở lần get_balance() đầu, sau đó cập nhật theo block
+        self._ledger = None
+        
         # ✅ Load từ SQLite thay vì JSON
         self.load_blockchain()
         
-        # Tạo genesis block nếu chưa có
+        # Tạo genesis block nếu chưa có (chỉ process writer)
         if len(self.chain) == 0:
-            self.create_genesis_block()
+            if self.is_writer():
+                self.create_genesis_block()
+            else:
+                logger.info("ℹ️  Chain trống - chờ process writer tạo genesis block")
     
     def create_genesis_block(self):
         """Tạo block đầu tiên"""
         genesis_block = Block(0, [], time.time(), "0")
         genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
+        self._append_block(genesis_block)
         self.save_blockchain()
-        print("✅ Genesis block created!")
+        logger.info("✅ Genesis block created!")
+        self._notify(genesis_block)
+    
+    def add_listener(self, callback):
+        """callback(block) được gọi sau khi block mới đã được lưu"""
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _notify(self, block):
+        for callback in list(self._listeners):
+            try:
+                callback(block)
+            except Exception as e:
+                logger.warning("⚠️  Block listener error: %s", e)
     
     def get_latest_block(self):
         """Lấy block mới nhất"""
@@ -84,28 +242,51 @@ class Blockchain:
         fee = int(amount * self.transaction_fee_rate)
         return max(fee, 100)  
     
+    @_exclusive
     def add_transaction(self, transaction):
         """Thêm giao dịch vào pending pool"""
         if transaction.get("status") != "verified":
-            print(f"❌ Transaction {transaction['id'][:8]}... chưa được verify")
+            logger.warning("❌ Transaction %s... chưa được verify", transaction['id'][:8])
             return False
         
+        if not self.is_writer():
+            # Follower: giao dịch verified nằm trong DB (anchored = 0), leader sẽ đưa vào block
+            logger.debug("📨 Transaction %s... forwarded to chain writer", transaction['id'][:8])
+            return True
+        
+        if any(tx["id"] == transaction["id"] for tx in self.pending_transactions) \
+                or self.find_transaction(transaction["id"]):
+            logger.debug("ℹ️  Transaction %s... already queued / in chain", transaction['id'][:8])
+            return True
+        
         for pending_tx in self.pending_transactions:
             if (pending_tx.get("sender") == transaction.get("sender") and 
                 pending_tx["id"] != transaction["id"]):
-                print(f"⚠️  Warning: User {transaction.get('sender')} có giao dịch pending khác")
+                logger.warning("⚠️  Warning: User %s có giao dịch pending khác", transaction.get('sender'))
         
         self.pending_transactions.append(transaction)
-        print(f"📝 Transaction {transaction['id'][:8]}... added to pending pool")
+        logger.debug("📝 Transaction %s... added to pending pool", transaction['id'][:8])
         if len(self.pending_transactions) >= self.max_transactions_per_block:
             self.mine_pending_transactions()
         
         return True
     
+    @profiled("mining")
+    @_exclusive
     def mine_pending_transactions(self, miner_address="system"):
         """Mine các giao dịch pending thành block mới"""
+        if not self.is_writer():
+            logger.info("ℹ️  Process này không phải chain writer - bỏ qua mining")
+            return None
+        
+        # Nối các block writer trước (nếu vừa đổi leader) đã ghi, để không mine trùng index
+        self.refresh()
+        if len(self.chain) == 0:
+            # Khởi động lúc còn là follower trên DB trống: chưa ai tạo genesis
+            self.create_genesis_block()
+        
         if len(self.pending_transactions) == 0:
-            print("⚠️  Không có giao dịch nào để mine")
+            logger.warning("⚠️  Không có giao dịch nào để mine")
             return None
         
         # Lấy tối đa max_transactions_per_block giao dịch
@@ -133,7 +314,11 @@ class Blockchain:
         }
         
         # Thêm reward vào danh sách transactions
-        all_transactions = transactions_to_mine + [reward_tx]
+        # (block lưu dict view của record - đúng dạng đã hash từ trước tới nay)
+        all_transactions = [
+            tx.to_dict() if isinstance(tx, TransactionRecord) else tx
+            for tx in transactions_to_mine
+        ] + [reward_tx]
         
         # Tạo block mới
         previous_block = self.get_latest_block()
@@ -144,23 +329,32 @@ class Blockchain:
             previous_hash=previous_block.hash
         )
         
-        print(f"⛏️  Mining block {new_block.index} with {len(transactions_to_mine)} transactions + reward...")
+        logger.info("⛏️  Mining block %s with %s transactions + reward...", new_block.index, len(transactions_to_mine))
         new_block.mine_block(self.difficulty)
         
-        # Thêm block vào chain
-        self.chain.append(new_block)
+        # Thêm block vào chain + validate riêng block mới
+        self._append_block(new_block)
+        self.is_chain_valid()
         
         # Xóa các giao dịch đã mine khỏi pending pool
         self.pending_transactions = self.pending_transactions[self.max_transactions_per_block:]
         
         # ✅ Lưu vào SQLite
         self.save_blockchain()
+        if len(self.chain) <= new_block.index or self.chain.header(new_block.index).hash != new_block.hash:
+            # Process khác đã ghi block cùng index - bỏ block này, trả giao dịch chưa vào block về pending
+            self.pending_transactions = [
+                tx for tx in transactions_to_mine if not self.find_transaction(tx["id"])
+            ] + self.pending_transactions
+            return None
+        self._notify(new_block)
+        self._maybe_snapshot(new_block)
         
-        print(f"✅ Block {new_block.index} mined successfully!")
-        print(f"   Reward: {self.mining_reward:,} VND")
-        print(f"   Fees: {total_fees:,} VND")
-        print(f"   Total: {self.mining_reward + total_fees:,} VND")
-        print(f"📊 Remaining pending transactions: {len(self.pending_transactions)}")
+        logger.info("✅ Block %s mined successfully!", new_block.index)
+        logger.debug("   Reward: %s VND", Amount(self.mining_reward))
+        logger.debug("   Fees: %s VND", Amount(total_fees))
+        logger.debug("   Total: %s VND", Amount(self.mining_reward + total_fees))
+        logger.debug("📊 Remaining pending transactions: %s", len(self.pending_transactions))
         
         # Update balance của miner (nếu có wallet)
         if miner_address != "system":
@@ -170,50 +364,173 @@ class Blockchain:
                 if miner_wallet:
                     new_balance = miner_wallet["balance"] + self.mining_reward + total_fees
                     update_balance(miner_address, new_balance)
-                    print(f"💰 Miner balance updated: {new_balance:,} VND")
+                    logger.info("💰 Miner balance updated: %s VND", Amount(new_balance))
             except Exception as e:
-                print(f"⚠️  Could not update miner balance: {e}")
+                logger.warning("⚠️  Could not update miner balance: %s", e)
         
         return new_block
     
-    def is_chain_valid(self):
-        """Kiểm tra tính hợp lệ của blockchain"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-            
-            # Kiểm tra hash của block hiện tại
-            if current_block.hash != current_block.calculate_hash():
-                print(f"❌ Block {i} has invalid hash")
-                return False
-            
-            # Kiểm tra liên kết với block trước
-            if current_block.previous_hash != previous_block.hash:
-                print(f"❌ Block {i} has invalid previous_hash")
-                return False
-            
-            # Kiểm tra proof of work
-            if not current_block.hash.startswith("0" * self.difficulty):
-                print(f"❌ Block {i} has invalid proof of work")
-                return False
+    def _append_block(self, block, saved=False):
+        """Thêm block vào chain + cập nhật số liệu cộng dồn"""
+        self.chain.append(block, dirty=not saved)
+        self._count_block(block, 1)
+        if self._ledger is not None:
+            self._ledger.apply_block(block)
+    
+    def _count_block(self, block, sign):
+        """Cộng (sign=1) / trừ (sign=-1) block vào số liệu cộng dồn"""
+        self.total_transactions += sign * len(block.transactions)
+        if self._rewards is not None:
+            self._add_rewards(self._rewards, block, sign)
+    
+    @staticmethod
+    def _add_rewards(rewards, block, sign=1):
+        for tx in block.transactions:
+            if tx.get("type") == "mining_reward":
+                rewards[0] += sign
+                rewards[1] += sign * tx.get("amount", 0)
+    
+    def _reward_totals(self):
+        """[số block reward, tổng reward]: lần đầu quét body theo chunk, sau đó cộng dồn"""
+        with self.lock:
+            if self._rewards is None:
+                rewards = [0, 0]
+                for block in self.chain.iter_blocks(0):
+                    self._add_rewards(rewards, block)
+                self._rewards = rewards
+            return self._rewards
+    
+    @property
+    def mining_rewards_count(self):
+        return self._reward_totals()[0]
+    
+    @property
+    def total_mining_rewards(self):
+        return self._reward_totals()[1]
+    
+    @property
+    def ledger(self):
+        """Ledger tại tip: snapshot mới nhất + replay các block sau (lần đầu)"""
+        with self.lock:
+            if self._ledger is None:
+                self._ledger = restore_ledger(self)
+            return self._ledger
+    
+    def _maybe_snapshot(self, block):
+        """Writer ghi snapshot mỗi SNAPSHOT_INTERVAL block (chỉ storage SQLite)"""
+        if SNAPSHOT_INTERVAL <= 0 or block.index % SNAPSHOT_INTERVAL or get_storage().name != "sqlite":
+            return
+        try:
+            write_snapshot(self.ledger)
+        except OSError as e:
+            logger.warning("⚠️  Could not write snapshot: %s", e)
+    
+    def _block_error(self, current_block, previous_hash):
+        """Lỗi của block so với hash block trước (None nếu hợp lệ); genesis luôn hợp lệ"""
+        if current_block.index == 0:
+            return None
         
-        return True
+        # Kiểm tra hash của block hiện tại
+        if current_block.hash != current_block.calculate_hash():
+            return "invalid hash"
+        
+        # Kiểm tra liên kết với block trước
+        if current_block.previous_hash != previous_hash:
+            return "invalid previous_hash"
+        
+        # Kiểm tra proof of work
+        if not current_block.hash.startswith("0" * self.difficulty):
+            return "invalid proof of work"
+        
+        return None
     
-    def get_balance(self, address):
-        """Tính số dư của một địa chỉ từ blockchain"""
-        balance = 0
+    def _load_checkpoints(self):
+        try:
+            checkpoints = json.loads(get_blockchain_metadata("checkpoints", "{}"))
+            return {int(height): block_hash for height, block_hash in checkpoints.items()}
+        except (TypeError, ValueError):
+            return {}
+    
+    def _save_validation_state(self, checkpoints=None):
+        """Lưu validated height/hash (+ checkpoint mới) vào blockchain_metadata"""
+        set_blockchain_metadata("validated_height", self.validated_height)
+        set_blockchain_metadata("validated_hash", self.chain.header(self.validated_height).hash)
+        if checkpoints:
+            saved = self._load_checkpoints()
+            saved.update(checkpoints)
+            recent = sorted(saved)[-MAX_CHECKPOINTS:]
+            set_blockchain_metadata("checkpoints", json.dumps({h: saved[h] for h in recent}))
+    
+    def _restore_validation_state(self):
+        """
+        Dùng lại phần đã validate ở lần chạy trước nếu khớp với chain vừa load:
+        validated height/hash, nếu lệch thì checkpoint gần nhất còn khớp,
+        nếu không có gì khớp thì validate lại từ genesis.
+        """
+        self.validated_height = 0 if self.chain else -1
         
-        for block in self.chain:
-            for tx in block.transactions:
-                sender = tx.get("from") or tx.get("sender")
-                receiver = tx.get("to") or tx.get("receiver")
-                
-                if sender == address:
-                    balance -= tx.get("amount", 0)
-                if receiver == address:
-                    balance += tx.get("amount", 0)
+        height = int(get_blockchain_metadata("validated_height", -1))
+        if 0 <= height < len(self.chain) and self.chain.header(height).hash == get_blockchain_metadata("validated_hash"):
+            self.validated_height = height
+            return
         
-        return balance
+        for height, block_hash in sorted(self._load_checkpoints().items(), reverse=True):
+            if height < len(self.chain) and self.chain.header(height).hash == block_hash:
+                self.validated_height = height
+                logger.info("ℹ️  Validation resumed from checkpoint #%s", height)
+                return
+    
+    def is_chain_valid(self):
+        """
+        Kiểm tra tính hợp lệ của blockchain - chỉ validate các block sau
+        validated_height, nên gọi lặp lại (stats) là O(1).
+        Kiểm tra lại toàn bộ từ genesis: audit_chain().
+        """
+        if self.invalid_height is not None:
+            return False
+        if not self.chain:
+            return True
+        
+        start = max(self.validated_height + 1, 0)
+        previous_hash = self.chain.header(start - 1).hash if start else None
+        checkpoints = {}
+        # Block cũ ngoài cache được đọc theo chunk (audit từ genesis không load cả chain vào RAM)
+        for block in self.chain.iter_blocks(start):
+            i = block.index
+            error = self._block_error(block, previous_hash)
+            if error:
+                logger.error("❌ Block %s has %s", i, error)
+                self.invalid_height = i
+                break
+            self.validated_height = i
+            previous_hash = block.hash
+            if i and i % CHECKPOINT_INTERVAL == 0:
+                checkpoints[i] = block.hash
+        
+        if self.validated_height >= start:
+            self._save_validation_state(checkpoints)
+        return self.invalid_height is None
+    
+    def audit_chain(self):
+        """Kiểm tra lại TOÀN BỘ chain từ genesis (bỏ qua validated height / checkpoint)"""
+        start_time = time.perf_counter()
+        self.validated_height = 0 if self.chain else -1
+        self.invalid_height = None
+        valid = self.is_chain_valid()
+        elapsed = time.perf_counter() - start_time
+        
+        logger.info("🔍 Full audit: %s blocks in %.3fs - %s",
+                    len(self.chain), elapsed, "valid" if valid else f"invalid at #{self.invalid_height}")
+        return {
+            "valid": valid,
+            "blocks_checked": len(self.chain),
+            "first_invalid_height": self.invalid_height,
+            "seconds": elapsed
+        }
+    
+    def get_balance(self, address):
+        """Số dư của một địa chỉ theo blockchain (từ ledger, không duyệt lại chain)"""
+        return self.ledger.balance(address)
     
     def get_transaction_history(self, address):
         """Lấy lịch sử giao dịch của một địa chỉ"""
@@ -234,18 +551,52 @@ class Blockchain:
         
         return history
     
+    def _locate_transaction(self, tx_id):
+        """(block, position) qua tx_index của storage - không quét chain"""
+        location = find_transaction_location(tx_id)
+        if location is None:
+            return None
+        block_index, position = location
+        if block_index >= len(self.chain):
+            return None
+        block = self.chain[block_index]
+        if position >= len(block.transactions) or block.transactions[position].get("id") != tx_id:
+            return None
+        return block, position
+    
     def find_transaction(self, tx_id):
         """Tìm giao dịch trong blockchain"""
-        for block in self.chain:
-            for tx in block.transactions:
-                if tx.get("id") == tx_id:
-                    return {
-                        "transaction": tx,
-                        "block": block.index,
-                        "block_hash": block.hash,
-                        "confirmations": len(self.chain) - block.index
-                    }
-        return None
+        located = self._locate_transaction(tx_id)
+        if located is None:
+            return None
+        block, position = located
+        return {
+            "transaction": block.transactions[position],
+            "block": block.index,
+            "block_hash": block.hash,
+            "confirmations": len(self.chain) - block.index
+        }
+    
+    def get_transaction_proof(self, tx_id):
+        """
+        Merkle inclusion proof cho giao dịch: header block + các hash anh em.
+        Kiểm tra bằng blockchain.merkle.verify_inclusion() trong O(log n).
+        None nếu giao dịch chưa vào block; ValueError nếu block là version 1.
+        """
+        located = self._locate_transaction(tx_id)
+        if located is None:
+            return None
+        block, position = located
+        if block.version < 2:
+            raise ValueError(f"Block #{block.index} là block version {block.version}, không có Merkle root")
+        return {
+            "transaction_id": tx_id,
+            "transaction": block.transactions[position],
+            "position": position,
+            "block": block.header(),
+            "proof": merkle_proof(block.transactions, position),
+            "confirmations": len(self.chain) - block.index
+        }
     
     def get_transaction_by_id(self, tx_id):
         """Lấy transaction theo ID từ blockchain"""
@@ -259,98 +610,146 @@ class Blockchain:
             }
         return None
     
+    def get_block_by_index(self, index):
+        """Block theo index (đọc từ storage nếu không nằm trong cửa sổ cache)"""
+        if 0 <= index < len(self.chain):
+            return self.chain[index]
+        return None
+    
     def get_chain_info(self):
         """Lấy thông tin tổng quan về blockchain"""
-        total_transactions = sum(len(block.transactions) for block in self.chain)
         return {
             "total_blocks": len(self.chain),
-            "total_transactions": total_transactions,
+            "total_transactions": self.total_transactions,
             "difficulty": self.difficulty,
             "is_valid": self.is_chain_valid(),
             "latest_block_hash": self.get_latest_block().hash if self.chain else None,
             "pending_transactions": len(self.pending_transactions)
         }
     
+    @_exclusive
     def reset_chain(self):
         """Reset blockchain (for testing only)"""
-        self.chain = []
+        self.chain.clear()
         self.pending_transactions = []
+        self.validated_height = -1
+        self.invalid_height = None
+        self.total_transactions = 0
+        self._rewards = [0, 0]
+        self._ledger = None
         delete_all_blocks()  # ✅ Xóa từ SQLite
+        set_blockchain_metadata("checkpoints", "{}")
         self.create_genesis_block()
-        print("🔄 Blockchain reset complete")
+        logger.info("🔄 Blockchain reset complete")
     
+    @_exclusive
     def save_blockchain(self):
         """✅ Lưu blockchain vào SQLite thay vì JSON"""
         try:
-            # Save all blocks
-            for block in self.chain:
-                block_dict = block.to_dict()
-                save_block(block_dict)
+            # Chỉ lưu các block chưa có trong DB, bằng INSERT - không bao giờ ghi đè
+            for block in self.chain.dirty_blocks():
+                try:
+                    insert_block(block.to_dict())
+                except sqlite3.IntegrityError:
+                    logger.error("❌ Block #%s đã được process khác ghi - bỏ block local, đọc lại từ DB",
+                                 block.index)
+                    self._discard_unsaved()
+                    self.refresh()
+                    break
+                self.chain.mark_saved(block.index)
             
             # Save metadata
             set_blockchain_metadata("difficulty", self.difficulty)
             set_blockchain_metadata("mining_reward", self.mining_reward)
             
         except Exception as e:
-            print(f"❌ Error saving blockchain: {e}")
+            logger.error("❌ Error saving blockchain: %s", e)
+    
+    def _discard_unsaved(self):
+        """Bỏ các block chưa lưu ở cuối chain (bị process writer khác ghi trước)"""
+        blocks = self.chain.dirty_blocks()
+        if not blocks:
+            return
+        height = blocks[0].index
+        self.chain.truncate(height)
+        self._ledger = None
+        for block in blocks:
+            self._count_block(block, -1)
+        self.validated_height = min(self.validated_height, height - 1)
+        if self.invalid_height is not None and self.invalid_height >= height:
+            self.invalid_height = None
+    
+    @_exclusive
+    def refresh(self, batch_size=REFRESH_BATCH_SIZE):
+        """
+        Nối các block trong DB có index > tip local (do process writer khác ghi)
+        mà không load lại chain: đọc theo batch qua core.database.since(),
+        validate riêng phần mới, cập nhật số liệu cộng dồn + pending pool và
+        báo cho listener. Trả về số block mới.
+        """
+        if self.chain.dirty_blocks():
+            # Còn block local chưa lưu - save_blockchain() xử lý xung đột trước
+            return 0
+        
+        added = 0
+        while True:
+            batch = [Block.from_dict(data) for data in since(len(self.chain) - 1, batch_size)]
+            if not batch:
+                break
+            for block in batch:
+                self._append_block(block, saved=True)
+            self.is_chain_valid()
+            
+            mined = {tx.get("id") for block in batch for tx in block.transactions}
+            self.pending_transactions = [tx for tx in self.pending_transactions if tx["id"] not in mined]
+            for block in batch:
+                self._notify(block)
+            added += len(batch)
+            if len(batch) < batch_size:
+                break
+        
+        if added:
+            inc("chain_refresh_blocks_total", added)
+            logger.debug("🔄 Chain refresh: +%s blocks (tip #%s)", added, len(self.chain) - 1)
+        return added
     
     def load_blockchain(self):
         """✅ Load blockchain từ SQLite thay vì JSON"""
         try:
-            blocks_data = load_all_blocks()
+            # Chỉ đọc header (không body, không dựng Block): body block đọc khi
+            # cần qua ChainView, số dư qua ledger / snapshot
+            for chunk in iter_block_headers():
+                headers = [BlockHeader.from_dict(data) for data in chunk]
+                self.chain.extend_headers(headers)
+                self.total_transactions += sum(header.tx_count for header in headers)
             
-            if not blocks_data:
-                print("ℹ️  No blocks found in database")
+            if not self.chain:
+                logger.info("ℹ️  No blocks found in database")
                 return
             
-            # Reconstruct chain
-            for block_data in blocks_data:
-                block = Block(
-                    index=block_data["index"],
-                    transactions=block_data["transactions"],
-                    timestamp=block_data["timestamp"],
-                    previous_hash=block_data["previous_hash"],
-                    nonce=block_data["nonce"]
-                )
-                block.hash = block_data["hash"]
-                self.chain.append(block)
+            self._restore_validation_state()
             
-            print(f"✅ Blockchain loaded from SQLite: {len(self.chain)} blocks")
+            logger.info("✅ Blockchain loaded from SQLite: %s blocks", len(self.chain))
             
         except Exception as e:
-            print(f"❌ Error loading blockchain: {e}")
+            logger.error("❌ Error loading blockchain: %s", e)
     
     def get_blockchain_stats(self):
         """Thống kê blockchain"""
-        total_transactions = sum(len(block.transactions) for block in self.chain)
-        
-        # Đếm mining rewards
-        mining_rewards_count = 0
-        total_rewards = 0
-        for block in self.chain:
-            for tx in block.transactions:
-                if tx.get("type") == "mining_reward":
-                    mining_rewards_count += 1
-                    total_rewards += tx.get("amount", 0)
-        
         return {
             "total_blocks": len(self.chain),
-            "total_transactions": total_transactions,
+            "total_transactions": self.total_transactions,
             "pending_transactions": len(self.pending_transactions),
             "difficulty": self.difficulty,
             "mining_reward": self.mining_reward,
-            "total_mining_rewards": total_rewards,
+            "total_mining_rewards": self.total_mining_rewards,
             "latest_block_hash": self.get_latest_block().hash if self.chain else None,
             "is_valid": self.is_chain_valid(),
-            "storage": "SQLite3"  # ✅ Indicator
+            "storage": "SQLite3",  # ✅ Indicator
+            "cache": self.chain.cache_info()
         }
 
-# Singleton instance
-_blockchain_instance = None
-
 def get_blockchain():
-    """Lấy instance blockchain (singleton pattern)"""
-    global _blockchain_instance
-    if _blockchain_instance is None:
-        _blockchain_instance = Blockchain(difficulty=2)
-    return _blockchain_instance
\ No newline at end of file
+    """Blockchain dùng chung của process (qua ChainService - blockchain/service.py)"""
+    from blockchain.service import get_chain_service
+    return get_chain_service().blockchain
\ No newline at end of file
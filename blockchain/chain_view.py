@@ -0,0 +1,246 @@
+"""
+ChainView - chain trong RAM chỉ giữ header của mọi block + một cửa sổ LRU
+các block đầy đủ (kèm transactions). Body của block cũ được đọc lại từ
+storage khi cần (load_block_range).
+
+- chain[i], chain[-1], chain[a:b], len(chain), `for block in chain`: như list
+- Duyệt cả chain đọc theo chunk từ storage, block cũ không bị đưa vào cache
+  (một lần quét lịch sử không đẩy các block mới ra khỏi cửa sổ)
+- Lúc khởi động chỉ nạp header (extend_headers, từ load_block_headers của
+  storage): không đọc / giải mã body, không dựng Block cho block cũ
+- Giới hạn cache: max_blocks (số block đầy đủ) và max_bytes (độ dài JSON của
+  transactions, lấy từ body_bytes đã lưu trong header); env
+  ECDSA_CHAIN_CACHE_BLOCKS / ECDSA_CHAIN_CACHE_MB
+- Block tip và block chưa lưu (dirty) luôn nằm trong cache
+- Thread-safe: chain dùng chung giữa CLI / Flask / ASGI (blockchain/service.py)
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from core.instrumentation import inc
+from core.storage import body_size
+
+DEFAULT_CACHE_BLOCKS = int(os.environ.get("ECDSA_CHAIN_CACHE_BLOCKS", 256))
+DEFAULT_CACHE_BYTES = int(float(os.environ.get("ECDSA_CHAIN_CACHE_MB", 64)) * 1024 * 1024)
+ITER_CHUNK_SIZE = 500
+
+
+class BlockHeader:
+    """Header của block (không có transactions) - giữ cho mọi block trong chain"""
+
+    __slots__ = ("index", "timestamp", "previous_hash", "nonce", "hash",
+                 "version", "merkle_root", "tx_count", "body_bytes")
+
+    def __init__(self, index, timestamp, previous_hash, nonce, hash, version,
+                 merkle_root, tx_count, body_bytes):
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.hash = hash
+        self.version = version
+        self.merkle_root = merkle_root
+        self.tx_count = tx_count
+        self.body_bytes = body_bytes
+
+    @classmethod
+    def of_block(cls, block):
+        """Header của Block vừa mine / vừa đọc (body_bytes tính từ transactions)"""
+        return cls(block.index, block.timestamp, block.previous_hash, block.nonce, block.hash,
+                   block.version, block.merkle_root, len(block.transactions),
+                   body_size(block.transactions))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Header từ storage (core.storage.BLOCK_HEADER_FIELDS)"""
+        return cls(data["index"], data["timestamp"], data["previous_hash"], data["nonce"],
+                   data["hash"], data["version"], data["merkle_root"],
+                   data["tx_count"] or 0, data["body_bytes"])
+
+
+class ChainView:
+    """
+    Chain lazy: loader(start, stop) trả về list Block có start <= index < stop
+    (đọc từ storage, hash lấy đúng giá trị đã lưu).
+    """
+
+    def __init__(self, loader, max_blocks=None, max_bytes=None):
+        self._loader = loader
+        self._lock = threading.RLock()
+        self.max_blocks = DEFAULT_CACHE_BLOCKS if max_blocks is None else max_blocks
+        self.max_bytes = DEFAULT_CACHE_BYTES if max_bytes is None else max_bytes
+        self._headers = []
+        self._cache = OrderedDict()  # index -> Block, cũ nhất trước
+        self._sizes = {}             # index -> byte ước lượng
+        self._cached_bytes = 0
+        self._dirty = set()          # index các block chưa lưu vào storage
+
+    # ------------------ Sequence API ------------------ #
+
+    def __len__(self):
+        return len(self._headers)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._load_indices(range(*key.indices(len(self._headers))))
+        return self.get(self._normalize(key))
+
+    def __iter__(self):
+        return self.iter_blocks()
+
+    def _normalize(self, index):
+        if index < 0:
+            index += len(self._headers)
+        if not 0 <= index < len(self._headers):
+            raise IndexError("chain index out of range")
+        return index
+
+    def header(self, index):
+        """Header của block (không load transactions)"""
+        return self._headers[self._normalize(index)]
+
+    def get(self, index):
+        """Block đầy đủ theo index - lấy từ cache hoặc đọc từ storage"""
+        with self._lock:
+            block = self._cache.get(index)
+            if block is not None:
+                self._cache.move_to_end(index)
+                inc("chain_cache_total", result="hit")
+                return block
+            inc("chain_cache_total", result="miss")
+            loaded = self._loader(index, index + 1)
+            if not loaded:
+                raise LookupError(f"Block #{index} không có trong storage")
+            self._put(loaded[0])
+            self._evict()
+            return loaded[0]
+
+    def _load_indices(self, indices):
+        """Các block theo list index liên tiếp: phần thiếu đọc trong một query"""
+        with self._lock:
+            missing = [i for i in indices if i not in self._cache]
+            if missing:
+                inc("chain_cache_total", len(missing), result="miss")
+                for block in self._loader(missing[0], missing[-1] + 1):
+                    if block.index not in self._cache:
+                        self._put(block)
+            blocks = []
+            for i in indices:
+                block = self._cache.get(i)
+                if block is None:
+                    raise LookupError(f"Block #{i} không có trong storage")
+                self._cache.move_to_end(i)
+                blocks.append(block)
+            self._evict()
+            return blocks
+
+    def iter_blocks(self, start=0, chunk_size=ITER_CHUNK_SIZE):
+        """
+        Duyệt block từ `start` theo thứ tự; block không có trong cache được
+        đọc theo chunk và bỏ đi sau khi dùng (không làm xáo trộn cửa sổ LRU).
+        """
+        start = max(start, 0)
+        while start < len(self._headers):
+            yield from self._scan_chunk(start, min(start + chunk_size, len(self._headers)))
+            start += chunk_size
+
+    def _scan_chunk(self, start, stop):
+        with self._lock:
+            indices = range(start, stop)
+            if all(i in self._cache for i in indices):
+                return [self._cache[i] for i in indices]
+            inc("chain_cache_total", result="scan")
+            loaded = {block.index: block for block in self._loader(start, stop)}
+            chunk = []
+            for i in indices:
+                block = self._cache.get(i) or loaded.get(i)
+                if block is None:
+                    raise LookupError(f"Block #{i} không có trong storage")
+                chunk.append(block)
+            return chunk
+
+    def append(self, block, dirty=True):
+        """Thêm block mới ở cuối chain (dirty=False khi block vừa đọc từ storage)"""
+        with self._lock:
+            if block.index != len(self._headers):
+                raise ValueError(f"Block #{block.index} không nối tiếp chain dài {len(self._headers)}")
+            self._headers.append(BlockHeader.of_block(block))
+            self._put(block)
+            if dirty:
+                self._dirty.add(block.index)
+            self._evict()
+
+    def extend_headers(self, headers):
+        """Nối header các block đã lưu (BlockHeader) - body đọc khi cần"""
+        with self._lock:
+            for header in headers:
+                if header.index != len(self._headers):
+                    raise ValueError(f"Block #{header.index} không nối tiếp chain dài {len(self._headers)}")
+                self._headers.append(header)
+
+    def truncate(self, height):
+        """Bỏ các block có index >= height"""
+        with self._lock:
+            del self._headers[height:]
+            for index in [i for i in self._cache if i >= height]:
+                del self._cache[index]
+                self._cached_bytes -= self._sizes.pop(index)
+            self._dirty = {i for i in self._dirty if i < height}
+
+    def clear(self):
+        with self._lock:
+            self._headers = []
+            self._cache.clear()
+            self._sizes.clear()
+            self._cached_bytes = 0
+            self._dirty.clear()
+
+    # ------------------ Persist ------------------ #
+
+    def dirty_blocks(self):
+        """Các block chưa lưu vào storage (theo thứ tự index)"""
+        with self._lock:
+            return [self._cache[i] for i in sorted(self._dirty)]
+
+    def mark_saved(self, index):
+        with self._lock:
+            self._dirty.discard(index)
+            self._evict()
+
+    # ------------------ Cache ------------------ #
+
+    def _put(self, block):
+        header = self._headers[block.index] if block.index < len(self._headers) else None
+        if header is not None and header.body_bytes is not None:
+            size = header.body_bytes
+        else:
+            size = body_size(block.transactions)
+        previous = self._sizes.get(block.index)
+        if previous is not None:
+            self._cached_bytes -= previous
+        self._cache[block.index] = block
+        self._cache.move_to_end(block.index)
+        self._sizes[block.index] = size
+        self._cached_bytes += size
+
+    def _evict(self):
+        tip = len(self._headers) - 1
+        for index in list(self._cache):
+            if len(self._cache) <= self.max_blocks and self._cached_bytes <= self.max_bytes:
+                break
+            if index == tip or index in self._dirty:
+                continue
+            del self._cache[index]
+            self._cached_bytes -= self._sizes.pop(index)
+
+    def cache_info(self):
+        with self._lock:
+            return {
+                "blocks": len(self._headers),
+                "cached_blocks": len(self._cache),
+                "cached_bytes": self._cached_bytes,
+                "dirty_blocks": len(self._dirty),
+                "max_blocks": self.max_blocks,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,56 +1,92 @@
 from datetime import datetime
-from blockchain.blockchain import Blockchain
+from blockchain.service import get_chain_service
 from core.wallet import get_wallet_info
 from core.fraud_detection import check_fraud
 from core.transaction import (
     get_all_transactions,
+    get_unanchored_transactions,
     get_transaction_by_id,
     update_transaction_status
 )
-from core.database import fetch_all, execute
+from core.records import as_record
+from core.storage import get_storage
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+# Số giao dịch đọc mỗi lần khi sync DB -> blockchain
+SYNC_BATCH_SIZE = 100
 
 class BlockchainIntegration:
     """Quản lý blockchain cho hệ thống - PURE DB VERSION"""
     
-    def __init__(self, difficulty=4):
-        self.blockchain = Blockchain(difficulty=difficulty)
+    def __init__(self, service=None):
+        # Chain dùng chung của process - difficulty lấy từ blockchain_metadata
+        self.service = service or get_chain_service()
+        self.blockchain = self.service.blockchain
         self.mempool = []  # Pool chứa transactions chờ mine
+        # Service là singleton của process: phải huỷ đăng ký trong close()
+        self._unsubscribe = self.service.subscribe(self._on_new_block)
         self.sync_with_database()  # ✅ Sync from DB, not JSON
+    
+    def close(self):
+        """Ngừng nhận block mới từ chain service (gọi khi bỏ instance này)"""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+    
+    def _on_new_block(self, block):
+        """Block mới (từ bất kỳ consumer nào): bỏ các giao dịch đã vào block khỏi mempool"""
+        if self.mempool:
+            mined = {tx.get("id") for tx in block.transactions}
+            self.mempool = [tx for tx in self.mempool if tx.id not in mined]
         
-    def sync_with_database(self):
-        """Đồng bộ transactions từ DATABASE vào blockchain"""
+    def sync_with_database(self, batch_size=SYNC_BATCH_SIZE):
+        """
+        Đồng bộ transactions từ DATABASE vào blockchain.
+        Chỉ đọc các giao dịch verified + executed chưa anchored (theo batch,
+        cũ trước); save_block đánh dấu anchored nên lần sync sau không đọc lại.
+        Chi phí tỉ lệ với số giao dịch mới, không phải toàn bộ lịch sử.
+        Trả về số giao dịch đã đưa vào block.
+        """
+        if not self.service.is_leader():
+            # Follower: giao dịch ở lại DB, process writer sẽ anchor
+            return 0
+        
+        synced = 0
+        seen = set()
         try:
-            #  Lấy từ DATABASE 
-            db_txs = get_all_transactions()  # From database.py
-            
-            #Lấy các verified transactions chưa có trong blockchain
-            blockchain_tx_ids = set()
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    blockchain_tx_ids.add(tx["id"])
-            
-            #  Chỉ sync transactions đã verified và executed
-            pending_verified = [
-                tx for tx in db_txs 
-                if tx.get("status") == "verified" 
-                and tx.get("executed") == 1
-                and tx["id"] not in blockchain_tx_ids
-            ]
-            
-            if pending_verified:
-                print(f"🔄 Đồng bộ {len(pending_verified)} transactions từ DATABASE vào blockchain...")
-                for tx in pending_verified:
+            while True:
+                seen.update(tx["id"] for tx in self.blockchain.pending_transactions)
+                # `seen`: dòng đã xử lý mà vẫn chưa anchored (block chưa lưu được) thì không lặp lại
+                batch = [tx for tx in get_unanchored_transactions(batch_size) if tx.id not in seen]
+                if not batch:
+                    break
+                seen.update(tx.id for tx in batch)
+                
+                if not synced:
+                    logger.info("🔄 Đồng bộ transactions từ DATABASE vào blockchain...")
+                for tx in batch:
                     self.blockchain.add_transaction(tx)
                 
-                # Mine block nếu có transactions
+                # Mine hết pending -> các giao dịch được anchored theo đúng thứ tự
+                while self.blockchain.pending_transactions:
+                    if self.blockchain.mine_pending_transactions("system_sync") is None:
+                        break
+                
                 if self.blockchain.pending_transactions:
-                    self.blockchain.mine_pending_transactions("system_sync")
-                    print(f"✅ Đã đồng bộ vào blockchain")
+                    # Không mine được (lỗi lưu block...) - dừng, lần sync sau thử lại
+                    break
+                synced += len(batch)
+            
+            if synced:
+                logger.info("✅ Đã đồng bộ %s transactions vào blockchain", synced)
                     
         except Exception as e:
-            print(f"⚠️ Lỗi đồng bộ: {e}")
+            logger.warning("⚠️ Lỗi đồng bộ: %s", e)
             import traceback
             traceback.print_exc()
+        return synced
     
     def add_transaction_to_mempool(self, transaction):
         """
@@ -58,42 +94,44 @@ class BlockchainIntegration:
         Chỉ thêm nếu transaction đã được verified và executed
         """
         try:
+            transaction = as_record(transaction)
+            
             # Validate transaction format
-            if not transaction.get("signature"):
+            if not transaction.signature:
                 return False, "❌ Transaction chưa có chữ ký"
             
-            if transaction.get("status") not in ["signed", "pending"]:
-                return False, f"❌ Transaction không ở trạng thái hợp lệ: {transaction.get('status')}"
+            if transaction.status not in ["signed", "pending"]:
+                return False, f"❌ Transaction không ở trạng thái hợp lệ: {transaction.status}"
             
             # ✅ Check if already in blockchain
-            existing = self.blockchain.find_transaction(transaction["id"])
+            existing = self.blockchain.find_transaction(transaction.id)
             if existing:
                 return False, "❌ Transaction already in blockchain"
             
             # ✅ Check if already in mempool
-            if any(tx["id"] == transaction["id"] for tx in self.mempool):
+            if any(tx.id == transaction.id for tx in self.mempool):
                 return False, "❌ Transaction already in mempool"
             
             # Check fraud
             fraud_passed, fraud_msg = check_fraud(transaction)
             if not fraud_passed:
-                update_transaction_status(transaction["id"], "rejected")
+                update_transaction_status(transaction.id, "rejected")
                 return False, f"❌ Fraud check failed: {fraud_msg}"
             
             # Check balance
-            sender_wallet = get_wallet_info(transaction.get("sender") or transaction.get("from"))
+            sender_wallet = get_wallet_info(transaction.sender)
             if not sender_wallet:
-                return False, f"❌ Không tìm thấy ví: {transaction.get('sender')}"
+                return False, f"❌ Không tìm thấy ví: {transaction.sender}"
             
-            if sender_wallet["balance"] < transaction["amount"]:
-                update_transaction_status(transaction["id"], "rejected")
-                return False, f"❌ Số dư không đủ: {sender_wallet['balance']:,} < {transaction['amount']:,}"
+            if sender_wallet["balance"] < transaction.amount:
+                update_transaction_status(transaction.id, "rejected")
+                return False, f"❌ Số dư không đủ: {sender_wallet['balance']:,} < {transaction.amount:,}"
             
             # ✅ Add to mempool (NOT executed yet)
             self.mempool.append(transaction)
-            update_transaction_status(transaction["id"], "pending_in_mempool")
+            update_transaction_status(transaction.id, "pending_in_mempool")
             
-            print(f"✅ Added transaction {transaction['id'][:8]}... to mempool")
+            logger.debug("✅ Added transaction %s... to mempool", transaction.id[:8])
             
             return True, f"✅ Transaction added to mempool (waiting for mining)"
             
@@ -108,7 +146,7 @@ class BlockchainIntegration:
             if not self.mempool:
                 return False, "⚠️ No transactions in mempool"
             
-            print(f"\n⛏️ Mining {len(self.mempool)} transactions...")
+            logger.info("⛏️ Mining %s transactions...", len(self.mempool))
             
             valid_transactions = []
             rejected_transactions = []
@@ -116,21 +154,22 @@ class BlockchainIntegration:
             for tx in self.mempool:
                 try:
                     # ✅ Check if transaction is already verified and executed
-                    if tx.get("status") == "verified" and tx.get("executed"):
+                    if tx.status == "verified" and tx.executed:
                         valid_transactions.append(tx)
-                        print(f"✅ Including: {tx['id'][:8]}... (already verified & executed)")
+                        logger.debug("✅ Including: %s... (already verified & executed)", tx.id[:8])
                     else:
-                        print(f"⚠️ Skipping: {tx['id'][:8]}... (status: {tx.get('status')}, executed: {tx.get('executed')})")
+                        logger.warning("⚠️ Skipping: %s... (status: %s, executed: %s)",
+                                       tx.id[:8], tx.status, tx.executed)
                         rejected_transactions.append(tx)
                         
                 except Exception as e:
-                    update_transaction_status(tx["id"], "rejected")
+                    update_transaction_status(tx.id, "rejected")
                     rejected_transactions.append(tx)
-                    print(f"❌ Error processing {tx['id'][:8]}...: {e}")
+                    logger.error("❌ Error processing %s...: %s", tx.id[:8], e)
             
             # Update rejected transactions
             for tx in rejected_transactions:
-                update_transaction_status(tx["id"], "rejected")
+                update_transaction_status(tx.id, "rejected")
             
             if not valid_transactions:
                 self.mempool = []
@@ -151,9 +190,10 @@ class BlockchainIntegration:
             
             if block:
                 mining_time = end_time - start_time
-                print(f"✅ Block {block.index} mined in {mining_time:.2f}s with {len(valid_transactions)} transactions")
-                print(f"   Hash: {block.hash[:32]}...")
-                print(f"   Rejected: {len(rejected_transactions)} transactions")
+                logger.info("✅ Block %s mined in %.2fs with %s transactions",
+                            block.index, mining_time, len(valid_transactions))
+                logger.debug("   Hash: %s...", block.hash[:32])
+                logger.debug("   Rejected: %s transactions", len(rejected_transactions))
                 
                 return True, {
                     "block_index": block.index,
@@ -185,12 +225,12 @@ class BlockchainIntegration:
             
             # Add to blockchain
             self.blockchain.add_transaction(transaction)
-            print(f"✅ Added verified transaction to blockchain: {transaction['id'][:8]}...")
+            logger.debug("✅ Added verified transaction to blockchain: %s...", transaction['id'][:8])
             
             # Auto-mine if enough transactions
             if len(self.blockchain.pending_transactions) >= self.blockchain.max_transactions_per_block:
                 self.blockchain.mine_pending_transactions()
-                print(f"✅ Auto-mined block with {self.blockchain.max_transactions_per_block} transactions")
+                logger.info("✅ Auto-mined block with %s transactions", self.blockchain.max_transactions_per_block)
             
             return True, "Transaction added to blockchain"
             
@@ -201,7 +241,7 @@ class BlockchainIntegration:
         """Lấy status của transaction"""
         # Check mempool
         for tx in self.mempool:
-            if tx["id"] == tx_id:
+            if tx.id == tx_id:
                 return {
                     "status": "pending_in_mempool",
                     "location": "mempool",
@@ -237,11 +277,12 @@ class BlockchainIntegration:
         """Thống kê blockchain"""
         chain_info = self.blockchain.get_chain_info()
         
-        # Thống kê từ DATABASE 
-        db_txs = get_all_transactions()
-        db_verified = len([tx for tx in db_txs if tx.get("status") == "verified"])
-        db_rejected = len([tx for tx in db_txs if tx.get("status") == "rejected"])
-        db_pending = len([tx for tx in db_txs if tx.get("status") in ["pending", "signed"]])
+        # Thống kê từ DATABASE: COUNT theo status, không đọc cả bảng
+        storage = get_storage()
+        db_total = storage.count_transactions()
+        db_verified = storage.count_transactions(("verified",))
+        db_rejected = storage.count_transactions(("rejected",))
+        db_pending = storage.count_transactions(("pending", "signed"))
         
         return {
             "blockchain": {
@@ -258,18 +299,21 @@ class BlockchainIntegration:
                 "verified": db_verified,
                 "rejected": db_rejected,
                 "pending": db_pending,
-                "total": len(db_txs)
+                "total": db_total
             }
         }
     
-    def validate_chain(self):
-        """Validate toàn bộ blockchain"""
-        is_valid = self.blockchain.is_chain_valid()
+    def validate_chain(self, full=False):
+        """Validate blockchain (full=True: kiểm tra lại từ genesis)"""
+        if full:
+            is_valid = self.blockchain.audit_chain()["valid"]
+        else:
+            is_valid = self.blockchain.is_chain_valid()
         
         if is_valid:
-            print("✅ Blockchain is valid")
+            logger.info("✅ Blockchain is valid")
         else:
-            print("❌ Blockchain is INVALID!")
+            logger.error("❌ Blockchain is INVALID!")
         
         return is_valid
     
@@ -286,9 +330,9 @@ class BlockchainIntegration:
         blockchain_tx_ids = {tx["id"] for tx in blockchain_txs}
         
         all_confirmed = blockchain_txs
-        all_pending = self.mempool + [
-            tx for tx in db_txs 
-            if tx["id"] not in blockchain_tx_ids and tx.get("status") in ["pending", "signed"]
+        all_pending = [tx.to_dict() for tx in self.mempool] + [
+            tx.to_dict() for tx in db_txs 
+            if tx.id not in blockchain_tx_ids and tx.status in ["pending", "signed"]
         ]
         
         return {
@@ -301,13 +345,12 @@ class BlockchainIntegration:
         """Reset blockchain (only for testing)"""
         self.blockchain.reset_chain()
         self.mempool = []
-        print("🔄 Blockchain reset complete")
+        logger.info("🔄 Blockchain reset complete")
     
     def get_block_by_index(self, index):
         """Lấy block theo index"""
-        if 0 <= index < len(self.blockchain.chain):
-            return self.blockchain.chain[index].to_dict()
-        return None
+        block = self.blockchain.get_block_by_index(index)
+        return block.to_dict() if block else None
     
     def get_all_blocks(self):
         """Lấy tất cả blocks"""
@@ -321,7 +364,7 @@ def get_blockchain_instance():
     """Lấy blockchain instance (singleton)"""
     global _blockchain_instance
     if _blockchain_instance is None:
-        _blockchain_instance = BlockchainIntegration(difficulty=4)
+        _blockchain_instance = BlockchainIntegration()
     return _blockchain_instance
 
 
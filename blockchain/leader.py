@@ -0,0 +1,142 @@
+"""
+Chọn MỘT process ghi chain khi nhiều process dùng chung data/system.db
+(app.py + main.py, nhiều Flask worker...).
+
+- LeaderLock: advisory lock trên file data/chain.lock (fcntl.flock, trên
+  Windows dùng msvcrt.locking). Process giữ được lock là writer duy nhất:
+  mine block, ghi block mới (INSERT, không bao giờ ghi đè)
+- Process khác là follower: giao dịch verified được để lại trong DB
+  (anchored = 0) cho leader đưa vào block, còn block mới thì đọc tail từ DB
+- Lock tự nhả khi process thoát / chết -> follower kế tiếp thử lại và lên thay
+- Follower nhớ kết quả "không lấy được" trong retry_interval giây (mặc định
+  bằng ECDSA_CHAIN_POLL_INTERVAL): is_leader() trên đường nóng không mở file +
+  flock mỗi lần gọi
+- Lock gắn với pid: process con fork từ leader (Flask/gunicorn worker) kế thừa
+  fd đã flock nhưng KHÔNG phải leader -> bỏ fd đó (không unlock, lock vẫn là
+  của process cha) rồi tự thử lấy lock như follower
+
+Điều phối (tail, forward, failover) nằm ở ChainService (blockchain/service.py).
+"""
+import os
+import time
+import threading
+
+from core.database import DB_FILE
+from core.log import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = get_logger(__name__)
+
+LOCK_FILE = os.path.join(os.path.dirname(DB_FILE), "chain.lock")
+# Poll thread tắt (0) thì vẫn thử lại sau 2 giây
+RETRY_INTERVAL = float(os.environ.get("ECDSA_CHAIN_POLL_INTERVAL", 2.0)) or 2.0
+
+
+class LeaderLock:
+    """Lock file không chặn: try_acquire() True nếu process này là writer"""
+
+    def __init__(self, path=LOCK_FILE, retry_interval=RETRY_INTERVAL):
+        self.path = path
+        self.retry_interval = retry_interval
+        self._file = None
+        self._pid = None  # process đã lấy lock (fd kế thừa qua fork không tính)
+        self._next_attempt = 0.0  # monotonic: trước thời điểm này coi như vẫn là follower
+        self._mutex = threading.Lock()
+
+    @property
+    def held(self):
+        self._drop_inherited()
+        return self._file is not None
+
+    def _drop_inherited(self):
+        """Sau fork: bỏ fd kế thừa từ process cha mà không unlock"""
+        if self._pid is None or self._pid == os.getpid():
+            return
+        f, self._file, self._pid = self._file, None, None
+        # Mutex có thể đang bị thread khác của process cha giữ lúc fork
+        self._mutex = threading.Lock()
+        self._next_attempt = 0.0
+        if f is not None:
+            # flock gắn với open file description dùng chung với cha: đóng fd
+            # của process con không nhả lock của cha (khác với LOCK_UN)
+            f.close()
+
+    def try_acquire(self):
+        self._drop_inherited()
+        if self._file is not None:
+            return True
+        if time.monotonic() < self._next_attempt:
+            return False
+        with self._mutex:
+            if self._file is not None:
+                return True
+            if time.monotonic() < self._next_attempt:
+                return False
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            f = open(self.path, "a+")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                f.close()
+                self._next_attempt = time.monotonic() + self.retry_interval
+                return False
+
+            # Ghi pid để biết process nào đang là writer
+            f.seek(0)
+            f.truncate()
+            f.write(f"{os.getpid()}\n")
+            f.flush()
+            self._file = f
+            self._pid = os.getpid()
+            logger.info("👑 Chain writer lock acquired (pid %s)", os.getpid())
+            return True
+
+    def release(self):
+        self._drop_inherited()
+        with self._mutex:
+            f, self._file, self._pid = self._file, None, None
+            self._next_attempt = 0.0
+            if f is None:
+                return
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                f.close()
+            logger.info("🔓 Chain writer lock released")
+
+    def owner_pid(self):
+        """Pid ghi trong lock file (None nếu chưa có writer nào)"""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+
+_leader_lock = None
+
+
+def get_leader_lock():
+    """LeaderLock của process cho DB hiện tại (singleton)"""
+    global _leader_lock
+    if _leader_lock is None:
+        _leader_lock = LeaderLock()
+    return _leader_lock
+
+
+def set_leader_lock(lock):
+    global _leader_lock
+    _leader_lock = lock
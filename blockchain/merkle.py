@@ -0,0 +1,107 @@
+"""
+Merkle tree cho transactions của block + inclusion proof.
+
+- Lá:   sha256(0x00 || JSON chuẩn của transaction)
+- Nút:  sha256(0x01 || trái || phải)
+  (prefix khác nhau để không giả được nút trong thành lá)
+- Tầng lẻ: nút cuối được đẩy thẳng lên tầng trên (không nhân đôi)
+- Block rỗng: root = sha256("")
+
+Block version 2 hash header (index, merkle_root, timestamp, previous_hash,
+nonce, version) thay vì toàn bộ transactions, nên chỉ cần header + các
+hash anh em (O(log n)) là xác nhận được một giao dịch nằm trong block.
+"""
+import json
+import hashlib
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def leaf_hash(transaction):
+    """Hash lá của một transaction dict (JSON sort_keys giống hash block)"""
+    data = json.dumps(transaction, sort_keys=True).encode()
+    return hashlib.sha256(LEAF_PREFIX + data).hexdigest()
+
+
+def _node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _next_level(level):
+    parents = [_node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+
+def merkle_root(transactions):
+    """Merkle root (hex) của list transaction dict"""
+    level = [leaf_hash(tx) for tx in transactions]
+    if not level:
+        return EMPTY_ROOT
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(transactions, position):
+    """
+    Đường đi từ lá `position` lên root: list {"hash", "side"}
+    side = "left" / "right" là vị trí của hash anh em.
+    """
+    if not 0 <= position < len(transactions):
+        raise IndexError(f"Vị trí giao dịch không hợp lệ: {position}")
+
+    level = [leaf_hash(tx) for tx in transactions]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({"hash": level[sibling], "side": "left" if sibling < position else "right"})
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def root_from_proof(leaf, proof):
+    """Tính lại root từ hash lá + proof"""
+    current = leaf
+    for step in proof:
+        if step["side"] == "left":
+            current = _node_hash(step["hash"], current)
+        else:
+            current = _node_hash(current, step["hash"])
+    return current
+
+
+def verify_merkle_proof(transaction, proof, root):
+    """Transaction (dict) có nằm dưới merkle `root` theo `proof` không"""
+    try:
+        return root_from_proof(leaf_hash(transaction), proof) == root
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def verify_inclusion(inclusion, difficulty=None):
+    """
+    Kiểm tra proof do Blockchain.get_transaction_proof() trả về, không cần block đầy đủ:
+    1. hash header tính lại == block hash (và đủ PoW nếu truyền difficulty)
+    2. transaction + sibling hashes dẫn tới merkle_root trong header
+    """
+    from blockchain.blockchain import compute_header_hash
+
+    try:
+        header = inclusion["block"]
+        if header.get("version", 1) < 2:
+            return False
+        block_hash = compute_header_hash(header["index"], header["merkle_root"], header["timestamp"],
+                                         header["previous_hash"], header["nonce"], header["version"])
+        if block_hash != header["hash"]:
+            return False
+        if difficulty is not None and not block_hash.startswith("0" * difficulty):
+            return False
+        return verify_merkle_proof(inclusion["transaction"], inclusion["proof"], header["merkle_root"])
+    except (KeyError, TypeError, ValueError):
+        return False
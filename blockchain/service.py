@@ -0,0 +1,193 @@
+"""
+ChainService - một Blockchain dùng chung cho cả process.
+
+CLI (main.py), Flask (app.py), ASGI (core.async_api) và BlockchainIntegration
+đều lấy chain qua get_chain_service() / get_blockchain():
+- chỉ một bản chain được load (header + cửa sổ block, xem chain_view.py)
+- mọi thao tác ghi đi qua Blockchain.lock -> một writer, không còn hai
+  instance cùng save_blockchain()
+- difficulty / mining_reward lấy từ blockchain_metadata
+- subscribe(callback): nhận block mới ngay sau khi được lưu, không phải
+  load lại chain
+
+Nhiều process dùng chung SQLite: chỉ process giữ LeaderLock (leader.py)
+được mine. Một thread điều phối chạy mỗi poll_interval giây
+(ECDSA_CHAIN_POLL_INTERVAL, 0 = tắt):
+- follower: đọc tail block mới từ DB, thử lên làm writer nếu leader đã thoát
+  (vừa lên writer thì đối chiếu block store mmap với SQLite trước khi ghi)
+- leader: đưa giao dịch verified mà follower để lại trong DB vào pending pool,
+  archive body block sâu hơn ECDSA_ARCHIVE_DEPTH (core/archive.py, 0 = tắt)
+"""
+import os
+import threading
+
+from blockchain.blockchain import Blockchain
+from blockchain.leader import get_leader_lock
+from core.storage import get_storage
+from core.archive import ARCHIVE_DEPTH
+from core.database import archive_blocks, sync_block_store
+from core.transaction import get_unanchored_transactions
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_POLL_INTERVAL = float(os.environ.get("ECDSA_CHAIN_POLL_INTERVAL", 2.0))
+FORWARD_BATCH_SIZE = 100
+
+
+class ChainService:
+    """Giữ Blockchain dùng chung (load lazy ở lần truy cập đầu) + danh sách subscriber"""
+
+    def __init__(self, leader_lock=None, poll_interval=None, **chain_options):
+        self._options = chain_options
+        self._leader_lock = leader_lock
+        self.poll_interval = DEFAULT_POLL_INTERVAL if poll_interval is None else poll_interval
+        self._lock = threading.Lock()
+        self._promote_lock = threading.Lock()
+        self._promoted = False  # đã sync_block_store() kể từ lúc lấy writer lock
+        self._blockchain = None
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._poller = None
+
+    @property
+    def blockchain(self):
+        if self._blockchain is None:
+            with self._lock:
+                if self._blockchain is None:
+                    # Difficulty lấy từ blockchain_metadata (Blockchain.__init__)
+                    chain = Blockchain(is_writer=self.is_leader, **self._options)
+                    chain.add_listener(self._publish)
+                    self._blockchain = chain
+                    logger.debug("🔗 Chain service: loaded %s blocks (difficulty %s, %s)",
+                                 len(chain.chain), chain.difficulty, self.role)
+                    self._start_poller()
+        return self._blockchain
+
+    # ------------------ Writer election ------------------ #
+
+    @property
+    def leader_lock(self):
+        return self._leader_lock or get_leader_lock()
+
+    def is_leader(self):
+        """Process này có phải chain writer không (thử lấy lock nếu chưa có)"""
+        if get_storage().name != "sqlite":
+            # Storage trong process (memory): không có process nào khác cùng ghi
+            return True
+        lock = self.leader_lock
+        if self._promoted and lock.held:
+            return True
+        with self._promote_lock:
+            if not lock.try_acquire():
+                return False
+            if not self._promoted:
+                # Chỉ writer được sửa block store dùng chung; xong mới cho ghi block
+                sync_block_store()
+                self._promoted = True
+            return True
+
+    @property
+    def role(self):
+        return "leader" if self.is_leader() else "follower"
+
+    def poll(self):
+        """
+        Một vòng điều phối: nối block mới từ DB; nếu là leader thì đưa các
+        giao dịch được forward (verified, chưa anchored) vào pending pool.
+        Trả về số block mới đọc từ DB.
+        """
+        chain = self.blockchain
+        leader = self.is_leader()
+        added = chain.refresh()
+        if leader:
+            if not chain.chain:
+                chain.create_genesis_block()
+            self._anchor_forwarded(chain)
+            if ARCHIVE_DEPTH > 0:
+                archive_blocks(ARCHIVE_DEPTH)
+        return added
+
+    def _anchor_forwarded(self, chain):
+        queued = {tx["id"] for tx in chain.pending_transactions}
+        for tx in get_unanchored_transactions(FORWARD_BATCH_SIZE):
+            if tx.id not in queued:
+                # add_transaction tự mine khi đủ max_transactions_per_block
+                chain.add_transaction(tx)
+
+    def _start_poller(self):
+        if self.poll_interval <= 0 or self._poller is not None or get_storage().name != "sqlite":
+            return
+        self._poller = threading.Thread(target=self._poll_loop, name="chain-poller", daemon=True)
+        self._poller.start()
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning("⚠️  Chain poll error: %s", e)
+
+    def close(self):
+        """Dừng thread điều phối và nhả writer lock (nếu đang giữ)"""
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=self.poll_interval + 1)
+            self._poller = None
+        with self._promote_lock:
+            self._promoted = False
+            self.leader_lock.release()
+
+    @property
+    def is_loaded(self):
+        return self._blockchain is not None
+
+    @property
+    def difficulty(self):
+        return self.blockchain.difficulty
+
+    def subscribe(self, callback):
+        """callback(block) sau mỗi block mới được lưu; trả về hàm huỷ đăng ký"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _publish(self, block):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(block)
+            except Exception as e:
+                logger.warning("⚠️  Block subscriber error: %s", e)
+
+    def mine(self, miner_address="system"):
+        """Mine pending transactions của chain dùng chung (giữ write lock)"""
+        return self.blockchain.mine_pending_transactions(miner_address)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_chain_service():
+    """ChainService của process (singleton)"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ChainService()
+    return _service
+
+
+def set_chain_service(service):
+    """Thay ChainService (vd. test / benchmark với storage riêng), trả về service cũ"""
+    global _service
+    with _service_lock:
+        previous, _service = _service, service
+    return previous
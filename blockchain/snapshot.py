@@ -0,0 +1,183 @@
+"""
+Snapshot trạng thái ví (số dư + nonce) tính từ chain, gắn với một block.
+
+get_balance() trước đây duyệt lại toàn bộ chain (O(chain)). Ledger giữ số dư
+/ nonce cộng dồn theo từng block (cùng quy tắc với get_balance cũ):
+- Cứ SNAPSHOT_INTERVAL block (ECDSA_SNAPSHOT_INTERVAL) process writer ghi
+  data/snapshots/snapshot_<height>.json.gz gồm height, block hash, sha256
+  của phần state - giữ KEEP_SNAPSHOTS file gần nhất
+- restore_ledger(): lấy snapshot mới nhất còn khớp chain (hash block tại
+  height), kiểm tra sha256, rồi chỉ replay các block sau đó -> thời gian
+  khôi phục bị chặn bởi khoảng cách giữa hai snapshot
+
+Chạy: python -m blockchain.snapshot [create|restore|list]
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import hashlib
+import argparse
+from datetime import datetime
+
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_DIR = os.path.join("data", "snapshots")
+SNAPSHOT_INTERVAL = int(os.environ.get("ECDSA_SNAPSHOT_INTERVAL", 1000))
+KEEP_SNAPSHOTS = 5
+FORMAT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    """File snapshot hỏng / sai định dạng / sai hash"""
+
+
+class Ledger:
+    """Số dư + nonce lớn nhất của mỗi bên, sau khi áp dụng các block <= height"""
+
+    def __init__(self, height=-1, block_hash=None, balances=None, nonces=None):
+        self.height = height
+        self.block_hash = block_hash
+        self.balances = balances or {}
+        self.nonces = nonces or {}
+
+    def apply_block(self, block):
+        balances = self.balances
+        for tx in block.transactions:
+            sender = tx.get("from") or tx.get("sender")
+            receiver = tx.get("to") or tx.get("receiver")
+            amount = tx.get("amount", 0)
+            if sender is not None:
+                balances[sender] = balances.get(sender, 0) - amount
+            if receiver is not None:
+                balances[receiver] = balances.get(receiver, 0) + amount
+            nonce = tx.get("nonce")
+            if sender is not None and isinstance(nonce, int) and nonce > self.nonces.get(sender, -1):
+                self.nonces[sender] = nonce
+        self.height = block.index
+        self.block_hash = block.hash
+
+    def balance(self, party):
+        return self.balances.get(party, 0)
+
+    def nonce(self, party):
+        return self.nonces.get(party)
+
+    def state(self):
+        return {"balances": self.balances, "nonces": self.nonces}
+
+
+def _state_digest(state):
+    data = json.dumps(state, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _snapshot_path(directory, height):
+    return os.path.join(directory, f"snapshot_{height:010d}.json.gz")
+
+
+def write_snapshot(ledger, directory=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    """Ghi snapshot của ledger (ghi file tạm rồi rename), trả về đường dẫn"""
+    os.makedirs(directory, exist_ok=True)
+    state = ledger.state()
+    document = {
+        "format": FORMAT_VERSION,
+        "height": ledger.height,
+        "block_hash": ledger.block_hash,
+        "created_at": datetime.now().isoformat(),
+        "sha256": _state_digest(state),
+        "state": state,
+    }
+    path = _snapshot_path(directory, ledger.height)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logger.info("📸 Snapshot #%s: %s parties -> %s", ledger.height, len(ledger.balances), path)
+
+    for old in list_snapshots(directory)[:-keep] if keep else []:
+        os.remove(old)
+    return path
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Các file snapshot, height tăng dần"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith("snapshot_") and name.endswith(".json.gz")
+    )
+
+
+def load_snapshot(path):
+    """Đọc + kiểm tra snapshot -> Ledger (SnapshotError nếu hỏng)"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            document = json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        raise SnapshotError(f"Không đọc được snapshot {path}: {e}")
+
+    if document.get("format") != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot {path}: format {document.get('format')} không hỗ trợ")
+    state = document.get("state") or {}
+    if _state_digest(state) != document.get("sha256"):
+        raise SnapshotError(f"Snapshot {path}: sai sha256")
+    return Ledger(document["height"], document["block_hash"],
+                  state.get("balances", {}), state.get("nonces", {}))
+
+
+def restore_ledger(blockchain, directory=SNAPSHOT_DIR):
+    """
+    Ledger tại tip của `blockchain`: snapshot mới nhất hợp lệ + replay các
+    block sau nó (không có snapshot dùng được thì replay từ genesis).
+    """
+    start_time = time.perf_counter()
+    chain = blockchain.chain
+    ledger = Ledger()
+    for path in reversed(list_snapshots(directory)):
+        try:
+            candidate = load_snapshot(path)
+        except SnapshotError as e:
+            logger.warning("⚠️  %s", e)
+            continue
+        if candidate.height < len(chain) and chain.header(candidate.height).hash == candidate.block_hash:
+            ledger = candidate
+            break
+        logger.debug("ℹ️  Snapshot #%s không khớp chain hiện tại - bỏ qua", candidate.height)
+
+    snapshot_height = ledger.height
+    for block in chain.iter_blocks(ledger.height + 1):
+        ledger.apply_block(block)
+
+    logger.info("♻️  Ledger restored: snapshot #%s + %s blocks replayed in %.3fs",
+                snapshot_height, ledger.height - snapshot_height, time.perf_counter() - start_time)
+    return ledger
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot số dư / nonce theo block")
+    parser.add_argument("command", choices=("create", "restore", "list"), nargs="?", default="list")
+    parser.add_argument("--directory", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for path in list_snapshots(args.directory):
+            print(f"   {path} ({os.path.getsize(path):,} bytes)")
+        return 0
+
+    from blockchain.blockchain import get_blockchain
+    blockchain = get_blockchain()
+    ledger = restore_ledger(blockchain, args.directory)
+    if args.command == "create":
+        print(f"📸 {write_snapshot(ledger, args.directory)}")
+    else:
+        print(f"♻️  Ledger tại block #{ledger.height}: {len(ledger.balances):,} bên, {len(ledger.nonces):,} nonce")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Archive body block cũ ra file segment nén (cold storage).
+
+block_transactions giữ bản JSON đầy đủ của mọi giao dịch mãi mãi. Với
+archive, body (transactions) của các block sâu hơn `depth` so với tip được
+chuyển sang data/archive/segment_<n>.dat:
+- mỗi block là một record nén độc lập (zstd nếu có thư viện zstandard,
+  không thì zlib), chỉ append - không bao giờ ghi đè
+- offset index (block_index -> segment, offset, length, codec) nằm trong
+  bảng block_archive của SQLite; header, merkle_root và tx_index vẫn ở SQLite
+- SQLiteStorage đọc body từ archive khi block không còn dòng trong
+  block_transactions -> explorer / audit / proof không cần biết
+
+Chạy: python -m core.archive --depth 1000   (hoặc ECDSA_ARCHIVE_DEPTH cho leader)
+"""
+import os
+import sys
+import zlib
+import json
+import threading
+import argparse
+
+from core.log import get_logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger(__name__)
+
+ARCHIVE_DEPTH = int(os.environ.get("ECDSA_ARCHIVE_DEPTH", 0))
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def compress(data, codec=DEFAULT_CODEC):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    raise ValueError(f"Codec archive không hỗ trợ: {codec}")
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Segment nén zstd nhưng chưa cài zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Codec archive không hỗ trợ: {codec}")
+
+
+def encode_body(transaction_rows):
+    """Các chuỗi JSON transaction_data (theo position) -> bytes JSON array, không parse lại"""
+    return ("[" + ",".join(transaction_rows) + "]").encode("utf-8")
+
+
+class BlockArchive:
+    """Các file segment append-only trong `directory`"""
+
+    def __init__(self, directory, segment_max_bytes=SEGMENT_MAX_BYTES, codec=DEFAULT_CODEC):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.codec = codec
+        self._lock = threading.Lock()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment_{segment:06d}.dat")
+
+    def _current_segment(self):
+        segments = self.segments()
+        if not segments:
+            return 0
+        last = segments[-1]
+        if os.path.getsize(self._segment_path(last)) >= self.segment_max_bytes:
+            return last + 1
+        return last
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name[8:14]) for name in os.listdir(self.directory)
+            if name.startswith("segment_") and name.endswith(".dat")
+        )
+
+    def append(self, bodies):
+        """
+        Ghi list body (bytes chưa nén) vào cuối segment hiện tại, fsync.
+        Trả về list (segment, offset, length, codec) tương ứng.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            segment = self._current_segment()
+            locations = []
+            with open(self._segment_path(segment), "ab") as f:
+                offset = f.tell()
+                for body in bodies:
+                    record = compress(body, self.codec)
+                    f.write(record)
+                    locations.append((segment, offset, len(record), self.codec))
+                    offset += len(record)
+                f.flush()
+                os.fsync(f.fileno())
+            return locations
+
+    def read(self, segment, offset, length, codec):
+        """Transactions (list dict) của một block đã archive"""
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            record = f.read(length)
+        if len(record) != length:
+            raise LookupError(f"Archive segment {segment} bị cắt cụt tại offset {offset}")
+        return json.loads(decompress(record, codec))
+
+    def disk_usage(self):
+        return sum(os.path.getsize(self._segment_path(s)) for s in self.segments())
+
+    def clear(self):
+        with self._lock:
+            for segment in self.segments():
+                os.remove(self._segment_path(segment))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chuyển body block cũ sang file segment nén")
+    parser.add_argument("--depth", type=int, default=ARCHIVE_DEPTH or 1000,
+                        help="giữ body của `depth` block gần tip trong SQLite")
+    args = parser.parse_args(argv)
+
+    from core.storage import get_storage
+    storage = get_storage()
+    archived = storage.archive_blocks(args.depth)
+    print(f"📦 Archived {archived:,} blocks (depth {args.depth}, codec {DEFAULT_CODEC})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
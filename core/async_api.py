@@ -0,0 +1,201 @@
+"""
+Async facade cho core - dùng từ asyncio / ASGI (xem asgi.py).
+
+Các hàm core đều đồng bộ (SQLite, ECDSA, PBKDF2). Service này chia việc
+ra 3 executor để event loop không bao giờ bị chặn:
+
+- cpu:    ký / verify ECDSA, sinh khóa, PBKDF2 giải mã private key
+- reader: các truy vấn chỉ đọc (wallet, transaction, fraud/balance check)
+- writer: MỘT thread duy nhất cho mọi thao tác ghi DB -> không tranh lock
+          SQLite, thứ tự ghi giống như gọi tuần tự
+
+Mỗi request chỉ là một coroutine chờ future, nên một process giữ được
+hàng nghìn request đang chạy mà không cần một thread cho mỗi request.
+"""
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from core.crypto import get_crypto_backend
+from core.wallet import (
+    get_wallet_info,
+    get_all_wallets,
+    get_private_key_bytes,
+    build_wallet,
+    store_wallet,
+)
+from core.transaction import (
+    create_transaction,
+    compute_signature,
+    store_signature,
+    get_all_transactions,
+    get_transaction_by_id,
+)
+from core.verification import (
+    load_for_verification,
+    reject_early,
+    prepare_signature_check,
+    signature_failure,
+    check_transaction_state,
+    apply_verification,
+    error_result,
+)
+from core.fraud_detection import get_fraud_statistics
+from core.batch import load_batch, reserve_batch_nonces, sign_batch, commit_batch
+from core.instrumentation import timed, timer
+from core.profiling import profiled
+from blockchain.blockchain import get_blockchain
+
+
+def _verification_stage(fn):
+    # profile là theo thread: mỗi stage được profile trên thread executor của nó,
+    # gộp chung tên "verification" như full_verification_flow()
+    return profiled("verification")(fn)
+
+
+_load_for_verification = _verification_stage(load_for_verification)
+_reject_early = _verification_stage(reject_early)
+_prepare_signature_check = _verification_stage(prepare_signature_check)
+_check_transaction_state = _verification_stage(check_transaction_state)
+_apply_verification = _verification_stage(apply_verification)
+
+
+@_verification_stage
+def _verify_signature_job(public_key, signature, message_hash):
+    return get_crypto_backend().verify(public_key, signature, message_hash)
+
+
+def _transaction_proof(tx_id):
+    # Chạy trong reader: lần đầu gọi get_blockchain() sẽ load chain từ DB
+    return get_blockchain().get_transaction_proof(tx_id)
+
+
+class AsyncTransactionService:
+    """
+    API async cho wallet / transaction / verification.
+    - cpu_workers: số thread cho việc CPU (OpenSSL, PBKDF2 nhả GIL)
+    - io_workers: số thread đọc DB
+    """
+
+    def __init__(self, cpu_workers=None, io_workers=8):
+        self._cpu = ThreadPoolExecutor(max_workers=cpu_workers or os.cpu_count() or 1,
+                                       thread_name_prefix="async-cpu")
+        self._reader = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="async-reader")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+    async def _run(self, executor, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+    def _compute(self, fn, *args, **kwargs):
+        return self._run(self._cpu, fn, *args, **kwargs)
+
+    def _read(self, fn, *args, **kwargs):
+        return self._run(self._reader, fn, *args, **kwargs)
+
+    def _write(self, fn, *args, **kwargs):
+        return self._run(self._writer, fn, *args, **kwargs)
+
+    # ------------------ Wallets ------------------ #
+
+    async def create_wallet(self, name, passphrase, initial_balance=1000000):
+        existing = await self._read(get_wallet_info, name)
+        if existing:
+            return existing
+        wallet = await self._compute(build_wallet, name, passphrase, initial_balance)
+        return await self._write(store_wallet, wallet)
+
+    async def get_wallet_info(self, name, safe=False):
+        return await self._read(get_wallet_info, name, safe=safe)
+
+    async def get_all_wallets(self):
+        return await self._read(get_all_wallets)
+
+    # ------------------ Transactions ------------------ #
+
+    async def create_transaction(self, from_user, to_user, amount, from_address=None, to_address=None):
+        return await self._write(create_transaction, from_user, to_user, amount, from_address, to_address)
+
+    async def sign_transaction(self, transaction, from_user, passphrase):
+        # Đọc ví + PBKDF2 giải mã khóa đều chạy ở cpu executor (PBKDF2 chiếm gần hết thời gian)
+        private_key = await self._compute(get_private_key_bytes, from_user, passphrase)
+        signed = await self._compute(compute_signature, transaction, private_key)
+        return await self._write(store_signature, signed)
+
+    async def get_all_transactions(self):
+        return await self._read(get_all_transactions)
+
+    async def get_transaction(self, tx_id):
+        return await self._read(get_transaction_by_id, tx_id)
+
+    async def get_fraud_statistics(self):
+        return await self._read(get_fraud_statistics)
+
+    async def get_transaction_proof(self, tx_id):
+        return await self._read(_transaction_proof, tx_id)
+
+    async def submit_batch(self, transfers, passphrases=None):
+        # Giải mã khóa (PBKDF2), ký + xác thực ở cpu executor; đặt trước nonce
+        # và commit ở writer
+        draft = await self._compute(load_batch, transfers, passphrases)
+        first_nonces = await self._write(reserve_batch_nonces, draft)
+        plan = await self._compute(sign_batch, draft, first_nonces)
+        return await self._write(commit_batch, plan)
+
+    # ------------------ Verification ------------------ #
+
+    @timed("verification_seconds")
+    async def verify_transaction(self, tx_id=None):
+        """
+        Giống full_verification_flow(), mỗi stage chạy trên executor tương ứng.
+        Cùng metrics (verification_seconds, stage="signature") và profile "verification".
+        """
+        try:
+            transaction, early_result = await self._read(_load_for_verification, tx_id)
+            if early_result:
+                return await self._write(_reject_early, transaction, early_result)
+
+            with timer("verification_stage_seconds", stage="signature"):
+                ok, job = await self._read(_prepare_signature_check, transaction)
+                if ok:
+                    valid = await self._compute(_verify_signature_job, *job)
+                    signature_check = (True, "Chữ ký hợp lệ") if valid else (False, signature_failure(transaction))
+                else:
+                    signature_check = (False, job)
+
+            state_check = await self._read(_check_transaction_state, transaction)
+            return await self._write(_apply_verification, transaction, signature_check, state_check)
+
+        except Exception as e:
+            return error_result(tx_id, e)
+
+    # ------------------ Lifecycle ------------------ #
+
+    def close(self):
+        self._cpu.shutdown(wait=True)
+        self._reader.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_async_service():
+    """Lấy AsyncTransactionService dùng chung (singleton)"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = AsyncTransactionService()
+    return _service
+
+
+def close_async_service():
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
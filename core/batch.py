@@ -0,0 +1,244 @@
+"""
+Batch transfer API - tạo, ký và xác thực nhiều giao dịch trong một lần gọi.
+
+So với gọi create/sign/verify từng giao dịch:
+- mỗi ví chỉ đọc một lần, mỗi người gửi chỉ giải mã private key (PBKDF2) một lần
+- ký hàng loạt, fraud check đọc DB một lần cho mỗi người gửi
+- số dư được mô phỏng theo thứ tự trong batch trước khi ghi
+- ghi DB: một commit cho toàn bộ giao dịch, một transaction cho mọi chuyển khoản
+
+prepare_batch() gồm ba bước để async API chạy mỗi bước trên executor phù hợp:
+- load_batch(): validate + đọc ví + giải mã private key (PBKDF2)
+- reserve_batch_nonces(): bước ghi duy nhất trước commit - mỗi người gửi một
+  reserve_nonces cho cả block nonce (chữ ký phủ cả nonce)
+- sign_batch(): ký + xác thực, chỉ tính toán và đọc
+commit_batch() ghi giao dịch + chuyển khoản. Batch lỗi giữa chừng chỉ để lại
+khoảng trống nonce, không bao giờ trùng.
+"""
+from core.storage import get_storage
+from core.crypto import get_crypto_backend
+from core.wallet import get_private_key_bytes
+from core.transaction import new_transaction, compute_signature
+from core.verification import validate_transaction_format
+from core.fraud_detection import check_fraud_batch
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+MAX_BATCH_SIZE = 1000
+
+
+class BatchDraft:
+    """Kết quả load_batch(): transfer hợp lệ + ví + private key đã giải mã"""
+
+    def __init__(self, results, items, wallets, keys):
+        self.results = results  # index -> result dict (None = còn xử lý)
+        self.items = items      # [(index, transfer, from_user, to_user, amount, passphrase)]
+        self.wallets = wallets  # name -> wallet dict
+        self.keys = keys        # (from_user, passphrase) -> private key bytes | Exception
+
+    def nonce_counts(self):
+        """sender -> số nonce cần đặt trước (item có private key hợp lệ)"""
+        counts = {}
+        for _, _, from_user, _, _, passphrase in self.items:
+            if not isinstance(self.keys[(from_user, passphrase)], Exception):
+                counts[from_user] = counts.get(from_user, 0) + 1
+        return counts
+
+
+class BatchPlan:
+    """Kết quả prepare_batch(): các giao dịch đã ký + kết quả từng item"""
+
+    def __init__(self, results, transactions, accepted):
+        self.results = results            # index -> result dict (None = chờ commit)
+        self.transactions = transactions  # record cần lưu (signed / rejected)
+        self.accepted = accepted          # [(index, record)] chờ execute
+
+
+def _item_result(index, status, message, transaction=None, transfer=None):
+    source = transfer if isinstance(transfer, dict) else {}
+    return {
+        "index": index,
+        "status": status,
+        "transaction_id": transaction.id if transaction else None,
+        "from": transaction.sender if transaction else source.get("from_user"),
+        "to": transaction.receiver if transaction else source.get("to_user"),
+        "amount": transaction.amount if transaction else source.get("amount"),
+        "message": message
+    }
+
+
+def load_batch(transfers, passphrases=None):
+    """
+    Validate các transfer, đọc ví và giải mã private key (không ghi DB).
+    transfers: list dict {from_user, to_user, amount, passphrase?}
+    passphrases: dict sender -> passphrase dùng khi item không có passphrase
+    """
+    if len(transfers) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch tối đa {MAX_BATCH_SIZE} giao dịch")
+
+    storage = get_storage()
+    passphrases = passphrases or {}
+    results = [None] * len(transfers)
+    wallets = {}
+
+    def wallet(name):
+        if name not in wallets:
+            wallets[name] = storage.get_wallet(name)
+        return wallets[name]
+
+    # 1. Validate input + tra cứu ví (mỗi ví một lần)
+    items = []
+    for index, transfer in enumerate(transfers):
+        if not isinstance(transfer, dict):
+            results[index] = _item_result(index, "invalid", "Transfer phải là object")
+            continue
+
+        from_user = transfer.get("from_user")
+        to_user = transfer.get("to_user")
+        passphrase = transfer.get("passphrase") or passphrases.get(from_user)
+        if not all([from_user, to_user, transfer.get("amount"), passphrase]):
+            results[index] = _item_result(index, "invalid", "Thiếu thông tin giao dịch hoặc passphrase",
+                                          transfer=transfer)
+            continue
+
+        try:
+            amount = int(transfer["amount"])
+        except (ValueError, TypeError):
+            results[index] = _item_result(index, "invalid", "Số tiền không hợp lệ", transfer=transfer)
+            continue
+        if amount <= 0:
+            results[index] = _item_result(index, "invalid", "Số tiền phải lớn hơn 0", transfer=transfer)
+            continue
+
+        missing = next((name for name in (from_user, to_user) if not wallet(name)), None)
+        if missing:
+            results[index] = _item_result(index, "invalid", f"Không tìm thấy ví: {missing}", transfer=transfer)
+            continue
+
+        items.append((index, transfer, from_user, to_user, amount, passphrase))
+
+    # 2. Giải mã private key: một lần cho mỗi (người gửi, passphrase)
+    keys = {}
+    for _, _, from_user, _, _, passphrase in items:
+        if (from_user, passphrase) not in keys:
+            try:
+                keys[(from_user, passphrase)] = get_private_key_bytes(from_user, passphrase)
+            except Exception as e:
+                keys[(from_user, passphrase)] = e
+
+    return BatchDraft(results, items, wallets, keys)
+
+
+def reserve_batch_nonces(draft):
+    """Đặt trước nonce liên tiếp cho mỗi người gửi (một lần / người gửi), trả về nonce đầu tiên"""
+    storage = get_storage()
+    return {
+        sender: storage.reserve_nonces(sender, count) or 0
+        for sender, count in draft.nonce_counts().items()
+    }
+
+
+def sign_batch(draft, first_nonces):
+    """Tạo + ký hàng loạt với nonce đã đặt trước, rồi xác thực (không ghi DB)"""
+    results = list(draft.results)
+    wallets = draft.wallets
+    next_nonce = dict(first_nonces)
+
+    # 3. Tạo + ký
+    signed = []
+    for index, transfer, from_user, to_user, amount, passphrase in draft.items:
+        key = draft.keys[(from_user, passphrase)]
+        if isinstance(key, Exception):
+            results[index] = _item_result(index, "invalid", str(key), transfer=transfer)
+            continue
+
+        nonce = next_nonce[from_user]
+        next_nonce[from_user] = nonce + 1
+
+        transaction = new_transaction(
+            from_user, to_user, amount,
+            wallets[from_user]["address"], wallets[to_user]["address"], nonce
+        )
+        signed.append((index, compute_signature(transaction, key)))
+
+    # 4. Xác thực: format + chữ ký + fraud + số dư chạy theo thứ tự batch
+    backend = get_crypto_backend()
+    fraud_results = check_fraud_batch([tx for _, tx in signed])
+    balances = {}
+    transactions = []
+    accepted = []
+
+    for (index, transaction), (fraud_ok, fraud_msg) in zip(signed, fraud_results):
+        format_ok, format_msg = validate_transaction_format(transaction)
+        signature_ok = backend.verify(
+            bytes.fromhex(wallets[transaction.sender]["public_key"]),
+            bytes.fromhex(transaction.signature),
+            transaction.message_digest()
+        )
+        balance = balances.get(transaction.sender, wallets[transaction.sender]["balance"])
+
+        if not format_ok:
+            reason = f"Format không hợp lệ: {format_msg}"
+        elif not signature_ok:
+            reason = "Chữ ký không hợp lệ"
+        elif not fraud_ok:
+            reason = fraud_msg
+        elif balance < transaction.amount:
+            reason = f"Số dư không đủ: {balance:,} < {transaction.amount:,}"
+        else:
+            balances[transaction.sender] = balance - transaction.amount
+            balances[transaction.receiver] = (
+                balances.get(transaction.receiver, wallets[transaction.receiver]["balance"]) + transaction.amount
+            )
+            transactions.append(transaction)
+            accepted.append((index, transaction))
+            continue
+
+        rejected = transaction.replace(status="rejected")
+        transactions.append(rejected)
+        results[index] = _item_result(index, "rejected", reason, rejected)
+
+    return BatchPlan(results, transactions, accepted)
+
+
+def prepare_batch(transfers, passphrases=None):
+    """Kiểm tra, ký và xác thực các transfer (chỉ ghi phần đặt trước nonce)"""
+    draft = load_batch(transfers, passphrases)
+    return sign_batch(draft, reserve_batch_nonces(draft))
+
+
+def commit_batch(plan):
+    """Ghi batch: mọi giao dịch trong một commit, chuyển khoản trong một transaction"""
+    storage = get_storage()
+    results = list(plan.results)
+
+    if plan.transactions:
+        storage.insert_transactions(plan.transactions)
+
+    outcomes = storage.execute_transfers([
+        (tx.id, tx.sender, tx.receiver, tx.amount) for _, tx in plan.accepted
+    ]) if plan.accepted else []
+
+    for (index, transaction), (success, message) in zip(plan.accepted, outcomes):
+        if success:
+            results[index] = _item_result(index, "verified", message,
+                                          transaction.replace(status="verified", executed=1))
+        else:
+            results[index] = _item_result(index, "rejected", f"Execution failed: {message}",
+                                          transaction.replace(status="rejected"))
+
+    summary = {"total": len(results), "verified": 0, "rejected": 0, "invalid": 0}
+    for result in results:
+        summary[result["status"]] += 1
+
+    logger.info("📦 Batch: %d/%d verified, %d rejected, %d invalid",
+                summary["verified"], summary["total"], summary["rejected"], summary["invalid"])
+
+    summary["results"] = results
+    return summary
+
+
+def submit_batch(transfers, passphrases=None):
+    """Tạo + ký + xác thực + thực thi nhiều transfer, trả kết quả từng item"""
+    return commit_batch(prepare_batch(transfers, passphrases))
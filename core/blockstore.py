@@ -0,0 +1,270 @@
+"""
+Block store append-only đọc qua mmap (ECDSA_BLOCK_STORE=mmap).
+
+Với lịch sử dài, đọc block cũ qua SQLite (mỗi giao dịch một dòng + json.loads)
+chậm. MmapBlockStore giữ body block trong data/blocks/:
+- segment_<n>.dat: các record block nối tiếp nhau, chỉ append; segment mới
+  khi vượt SEGMENT_MAX_BYTES. Record = u8 định dạng payload | header nhị phân
+  (core/codec.encode_header) | mỗi giao dịch: u32 độ dài + payload - payload
+  là JSON utf-8 (mặc định, json.loads của C nhanh hơn decoder Python) hoặc
+  codec nhị phân (ECDSA_TX_CODEC=binary, nhỏ hơn ~45%)
+- blocks.idx: offset index kích thước cố định, entry thứ i (16 byte:
+  u32 segment, u64 offset, u32 length) là vị trí của block index i
+- Ghi lại một block (save_block ghi đè) = append record mới + sửa entry index
+- Đọc: mmap segment + index, header / byte của từng giao dịch lấy qua
+  memoryview (không copy), decode không qua SQL
+- Không file nào bị co lại: process khác có thể đang mmap chúng (đọc quá
+  cuối file bị co -> SIGBUS). Bỏ entry = ghi entry 0 (length 0 = chưa ghi).
+  Entry ghi dở ở cuối index (crash) bị bỏ qua khi đọc và ghi đè ở put sau.
+
+SQLiteStorage vẫn giữ header (bảng blocks), tx_index, anchored; chỉ body
+block chuyển sang store này (xem core/database.py). Chỉ process chain writer
+được ghi / đối chiếu store (SQLiteStorage.sync_block_store).
+"""
+import os
+import json
+import mmap
+import struct
+import threading
+
+from core.codec import encode_header, decode_header, encode_transaction, decode_transaction
+
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+_ENTRY = struct.Struct("<IQI")
+_EMPTY_ENTRY = b"\x00" * _ENTRY.size
+_U32 = struct.Struct("<I")
+
+PAYLOAD_JSON = 0
+PAYLOAD_BINARY = 1
+
+
+def encode_record(block_dict, payload=PAYLOAD_JSON):
+    """Block dict -> record của block store"""
+    out = bytearray((payload,))
+    out += encode_header(block_dict)
+    for tx in block_dict.get("transactions", ()):
+        if payload == PAYLOAD_BINARY:
+            data = encode_transaction(tx)
+        else:
+            data = json.dumps(tx, ensure_ascii=False).encode("utf-8")
+        out += _U32.pack(len(data))
+        out += data
+    return bytes(out)
+
+
+def _transaction_spans(data):
+    """(header, [(start, stop)] của từng payload giao dịch) trong record"""
+    header, tx_count, pos = decode_header(data, 1)
+    spans = []
+    for _ in range(tx_count):
+        (size,) = _U32.unpack_from(data, pos)
+        pos += 4
+        spans.append((pos, pos + size))
+        pos += size
+    return header, spans
+
+
+def decode_record(data):
+    """Record (bytes / memoryview) -> block dict"""
+    header, spans = _transaction_spans(data)
+    if data[0] == PAYLOAD_BINARY:
+        header["transactions"] = [decode_transaction(data[start:stop]) for start, stop in spans]
+    else:
+        loads = json.loads
+        header["transactions"] = [loads(str(data[start:stop], "utf-8")) for start, stop in spans]
+    return header
+
+
+class MmapBlockStore:
+    """Body block theo index, đọc bằng mmap; một process ghi (chain writer)"""
+
+    def __init__(self, directory, segment_max_bytes=SEGMENT_MAX_BYTES, payload=PAYLOAD_JSON):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.payload = payload
+        self._lock = threading.RLock()
+        self._maps = {}       # segment -> mmap
+        self._index_map = None
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "blocks.idx")
+        # Chỉ tạo file nếu chưa có - mở store (follower, audit worker) không sửa gì
+        open(self._index_path, "ab").close()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment_{segment:06d}.dat")
+
+    def _entry_count(self):
+        """Số entry đầy đủ trong file index (kể cả entry 0)"""
+        return os.path.getsize(self._index_path) // _ENTRY.size
+
+    def __len__(self):
+        """Index block cao nhất đã ghi + 1 (bỏ các entry 0 ở cuối)"""
+        with self._lock:
+            count = self._entry_count()
+            while count and self._entry(count - 1)[2] == 0:
+                count -= 1
+            return count
+
+    # ------------------ mmap ------------------ #
+
+    def _map(self, path, cache_key, needed):
+        """mmap của file, map lại khi file đã lớn hơn lần map trước"""
+        mapped = self._maps.get(cache_key) if cache_key is not None else self._index_map
+        if mapped is None or len(mapped) < needed:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < needed:
+                    raise LookupError(f"{path} ngắn hơn {needed} byte")
+                # mmap cũ không close: memoryview đã trả ra vẫn có thể đang dùng nó
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            if cache_key is not None:
+                self._maps[cache_key] = mapped
+            else:
+                self._index_map = mapped
+        return mapped
+
+    def _entry(self, index):
+        with self._lock:
+            start = index * _ENTRY.size
+            mapped = self._map(self._index_path, None, start + _ENTRY.size)
+            return _ENTRY.unpack_from(mapped, start)
+
+    def entry(self, index):
+        """(segment, offset, length) của block `index`, None nếu chưa ghi"""
+        if not 0 <= index < self._entry_count():
+            return None
+        entry = self._entry(index)
+        return entry if entry[2] else None
+
+    def missing(self, count):
+        """Các index < count chưa có body trong store"""
+        with self._lock:
+            present = min(count, self._entry_count())
+            missing = []
+            if present:
+                mapped = self._map(self._index_path, None, present * _ENTRY.size)
+                missing = [
+                    index for index, (_, _, length)
+                    in enumerate(_ENTRY.iter_unpack(mapped[:present * _ENTRY.size]))
+                    if length == 0
+                ]
+            return missing + list(range(present, count))
+
+    def record(self, index):
+        """memoryview (zero-copy) tới record đã encode của block `index`"""
+        if not 0 <= index < self._entry_count():
+            raise IndexError(f"Block #{index} không có trong block store")
+        segment, offset, length = self._entry(index)
+        if length == 0:
+            raise LookupError(f"Block #{index} chưa được ghi vào block store")
+        with self._lock:
+            mapped = self._map(self._segment_path(segment), segment, offset + length)
+        return memoryview(mapped)[offset:offset + length]
+
+    # ------------------ Đọc ------------------ #
+
+    def get(self, index):
+        """Block dict đầy đủ"""
+        return decode_record(self.record(index))
+
+    def load_range(self, start, stop):
+        """Các block có start <= index < stop (bỏ qua index chưa ghi)"""
+        blocks = []
+        for index in range(max(start, 0), min(stop, len(self))):
+            try:
+                blocks.append(self.get(index))
+            except LookupError:
+                continue
+        return blocks
+
+    def header(self, index):
+        """Header block (không decode transactions) + số giao dịch"""
+        header, tx_count, _ = decode_header(self.record(index), 1)
+        header["tx_count"] = tx_count
+        return header
+
+    def transaction_views(self, index):
+        """
+        (định dạng payload, list memoryview byte của từng giao dịch) - JSON
+        utf-8 với PAYLOAD_JSON, core/codec.decode_transaction với PAYLOAD_BINARY
+        """
+        data = self.record(index)
+        _, spans = _transaction_spans(data)
+        return data[0], [data[start:stop] for start, stop in spans]
+
+    # ------------------ Ghi ------------------ #
+
+    def put(self, block_dict):
+        """
+        Append block vào segment hiện tại, rồi ghi entry index (ghi đè nếu đã có).
+        Trả về entry cũ (None nếu chưa có) để restore() khi commit SQLite lỗi.
+        """
+        record = encode_record(block_dict, self.payload)
+        index = block_dict["index"]
+        with self._lock:
+            previous = self.entry(index)
+            segments = sorted(self._segments())
+            segment = segments[-1] if segments else 0
+            if os.path.exists(self._segment_path(segment)) and \
+                    os.path.getsize(self._segment_path(segment)) + len(record) > self.segment_max_bytes:
+                segment += 1
+            with open(self._segment_path(segment), "ab") as f:
+                offset = f.tell()
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Data đã xuống đĩa mới ghi index -> index không bao giờ trỏ tới byte chưa có
+            self._write_entry(index, _ENTRY.pack(segment, offset, len(record)))
+            return previous
+
+    def _write_entry(self, index, data):
+        with self._lock, open(self._index_path, "r+b") as f:
+            count = self._entry_count()
+            if index > count:
+                # Entry ghi dở ở cuối (nếu có) bị ghi đè luôn
+                f.seek(count * _ENTRY.size)
+                f.write(_EMPTY_ENTRY * (index - count))
+            f.seek(index * _ENTRY.size)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def restore(self, index, entry):
+        """Đặt lại entry của block `index` (giá trị put() trả về; None = bỏ entry)"""
+        with self._lock:
+            if entry is None:
+                if index < self._entry_count():
+                    self._write_entry(index, _EMPTY_ENTRY)
+            else:
+                self._write_entry(index, _ENTRY.pack(*entry))
+
+    def _segments(self):
+        return [
+            int(name[8:14]) for name in os.listdir(self.directory)
+            if name.startswith("segment_") and name.endswith(".dat")
+        ]
+
+    def truncate(self, height):
+        """Bỏ các entry index >= height (ghi entry 0, file không co; data cũ ở lại trong segment)"""
+        with self._lock:
+            count = self._entry_count()
+            if height >= count:
+                return
+            with open(self._index_path, "r+b") as f:
+                f.seek(height * _ENTRY.size)
+                f.write(_EMPTY_ENTRY * (count - height))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        with self._lock:
+            # Segment bị unlink: process khác đang mmap vẫn giữ inode cũ, không SIGBUS
+            self._maps = {}
+            self.truncate(0)
+            for segment in self._segments():
+                os.remove(self._segment_path(segment))
+
+    def disk_usage(self):
+        return os.path.getsize(self._index_path) + sum(
+            os.path.getsize(self._segment_path(s)) for s in self._segments())
@@ -0,0 +1,314 @@
+"""
+Codec nhị phân cho giao dịch và header block (thay JSON khi lưu block).
+
+Định dạng (little-endian, CODEC_VERSION = 1):
+- Giao dịch: u8 version | u8 số field | các field theo đúng thứ tự của dict
+  - field: u8 key id (KEY_IDS) hoặc 0 + u16 độ dài + tên key utf-8, rồi value
+  - value: u8 kiểu + dữ liệu
+    NONE / FALSE / TRUE         không có dữ liệu
+    INT                         i64
+    FLOAT                       f64
+    STR                         u32 độ dài + utf-8
+    HASH32 / HASH64             32 / 64 byte thô (chuỗi hex thường 64 / 128 ký tự)
+    HEX                         u16 độ dài + byte thô (chuỗi hex thường độ dài chẵn khác)
+    JSON                        u32 độ dài + JSON (list, dict, int ngoài i64...)
+- Header block: u8 version | u64 index | f64 timestamp | u64 nonce |
+  u16 block version | u32 số giao dịch | previous_hash, hash, merkle_root (value)
+- Stream: mỗi record = u32 độ dài + payload (encode_stream / iter_stream)
+
+decode(encode(x)) == x với mọi dict JSON hợp lệ (giữ nguyên kiểu int / float /
+bool và thứ tự key), nên hash block / Merkle leaf tính lại không đổi.
+
+Chạy: python -m core.codec migrate   (ghi transaction_blob cho các dòng cũ)
+"""
+import sys
+import json
+import struct
+import argparse
+
+CODEC_VERSION = 1
+
+# Key hay gặp -> 1 byte (0 dành cho key ghi tên đầy đủ). Chỉ được thêm vào cuối.
+KEYS = (
+    None, "id", "from", "to", "sender", "receiver", "from_address", "to_address",
+    "amount", "timestamp", "expires_at", "status", "signature", "nonce",
+    "executed", "message_hash", "type", "fee", "public_key",
+)
+KEY_IDS = {key: i for i, key in enumerate(KEYS) if key is not None}
+
+(T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT, T_STR,
+ T_HASH32, T_HASH64, T_HEX, T_JSON) = range(10)
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_HEADER = struct.Struct("<BQdQHI")
+
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+class CodecError(ValueError):
+    """Dữ liệu nhị phân hỏng / sai version"""
+
+
+# ------------------ Encode ------------------ #
+
+def _is_hex(value):
+    return len(value) % 2 == 0 and value != "" and _HEX_DIGITS.issuperset(value)
+
+
+def _encode_value(value, out):
+    kind = type(value)
+    if value is None:
+        out += b"\x00"
+    elif kind is bool:
+        out += b"\x02" if value else b"\x01"
+    elif kind is int and _INT_MIN <= value <= _INT_MAX:
+        out += b"\x03"
+        out += _I64.pack(value)
+    elif kind is float:
+        out += b"\x04"
+        out += _F64.pack(value)
+    elif kind is str:
+        if _is_hex(value):
+            if len(value) == 64:
+                out += b"\x06"
+                out += bytes.fromhex(value)
+                return
+            if len(value) == 128:
+                out += b"\x07"
+                out += bytes.fromhex(value)
+                return
+            if len(value) < 2 * 65536:
+                out += b"\x08"
+                out += _U16.pack(len(value) // 2)
+                out += bytes.fromhex(value)
+                return
+        data = value.encode("utf-8")
+        out += b"\x05"
+        out += _U32.pack(len(data))
+        out += data
+    else:
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        out += b"\x09"
+        out += _U32.pack(len(data))
+        out += data
+
+
+def encode_transaction(transaction):
+    """dict giao dịch -> bytes"""
+    if len(transaction) > 255:
+        raise CodecError("Giao dịch có quá nhiều field")
+    out = bytearray(_U8.pack(CODEC_VERSION))
+    out += _U8.pack(len(transaction))
+    for key, value in transaction.items():
+        key_id = KEY_IDS.get(key)
+        if key_id is not None:
+            out += _U8.pack(key_id)
+        else:
+            name = key.encode("utf-8")
+            out += b"\x00"
+            out += _U16.pack(len(name))
+            out += name
+        _encode_value(value, out)
+    return bytes(out)
+
+
+def encode_header(block_dict):
+    """Header block (không có transactions) -> bytes"""
+    out = bytearray(_HEADER.pack(
+        CODEC_VERSION,
+        block_dict["index"],
+        block_dict["timestamp"],
+        block_dict["nonce"],
+        block_dict.get("version") or 1,
+        len(block_dict.get("transactions", ())),
+    ))
+    for key in ("previous_hash", "hash", "merkle_root"):
+        _encode_value(block_dict.get(key), out)
+    return bytes(out)
+
+
+def encode_block(block_dict):
+    """Block dict -> bytes: header + các giao dịch (mỗi giao dịch có length prefix)"""
+    out = bytearray(encode_header(block_dict))
+    for tx in block_dict.get("transactions", ()):
+        data = encode_transaction(tx)
+        out += _U32.pack(len(data))
+        out += data
+    return bytes(out)
+
+
+# ------------------ Decode ------------------ #
+
+def _decode_value(data, pos):
+    kind = data[pos]
+    pos += 1
+    if kind == T_STR:
+        (size,) = _U32.unpack_from(data, pos)
+        pos += 4
+        return str(data[pos:pos + size], "utf-8"), pos + size
+    if kind == T_INT:
+        return _I64.unpack_from(data, pos)[0], pos + 8
+    if kind == T_HASH32:
+        return data[pos:pos + 32].hex(), pos + 32
+    if kind == T_HASH64:
+        return data[pos:pos + 64].hex(), pos + 64
+    if kind == T_NONE:
+        return None, pos
+    if kind == T_TRUE:
+        return True, pos
+    if kind == T_FALSE:
+        return False, pos
+    if kind == T_FLOAT:
+        return _F64.unpack_from(data, pos)[0], pos + 8
+    if kind == T_HEX:
+        (size,) = _U16.unpack_from(data, pos)
+        pos += 2
+        return data[pos:pos + size].hex(), pos + size
+    if kind == T_JSON:
+        (size,) = _U32.unpack_from(data, pos)
+        pos += 4
+        return json.loads(str(data[pos:pos + size], "utf-8")), pos + size
+    raise CodecError(f"Kiểu value không hợp lệ: {kind}")
+
+
+def _check_version(version):
+    if version != CODEC_VERSION:
+        raise CodecError(f"Codec version {version} không hỗ trợ")
+
+
+def decode_transaction(data, pos=0):
+    """bytes -> dict giao dịch"""
+    transaction, _ = _decode_transaction(data, pos)
+    return transaction
+
+
+def _decode_transaction(data, pos):
+    # Các kiểu hay gặp (STR / INT / HASH / HEX) giải mã tại chỗ, kiểu khác qua _decode_value
+    unpack_u32 = _U32.unpack_from
+    unpack_i64 = _I64.unpack_from
+    unpack_u16 = _U16.unpack_from
+    try:
+        _check_version(data[pos])
+        count = data[pos + 1]
+        pos += 2
+        transaction = {}
+        for _ in range(count):
+            key_id = data[pos]
+            pos += 1
+            if key_id:
+                key = KEYS[key_id]
+            else:
+                (size,) = _U16.unpack_from(data, pos)
+                pos += 2
+                key = str(data[pos:pos + size], "utf-8")
+                pos += size
+            kind = data[pos]
+            if kind == T_STR:
+                (size,) = unpack_u32(data, pos + 1)
+                pos += 5
+                transaction[key] = str(data[pos:pos + size], "utf-8")
+                pos += size
+            elif kind == T_INT:
+                transaction[key] = unpack_i64(data, pos + 1)[0]
+                pos += 9
+            elif kind == T_HASH32:
+                transaction[key] = data[pos + 1:pos + 33].hex()
+                pos += 33
+            elif kind == T_HASH64:
+                transaction[key] = data[pos + 1:pos + 65].hex()
+                pos += 65
+            elif kind == T_HEX:
+                (size,) = unpack_u16(data, pos + 1)
+                pos += 3
+                transaction[key] = data[pos:pos + size].hex()
+                pos += size
+            else:
+                transaction[key], pos = _decode_value(data, pos)
+        if pos > len(data):
+            raise CodecError("Giao dịch nhị phân bị cắt cụt")
+        return transaction, pos
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise CodecError(f"Giao dịch nhị phân hỏng: {e}")
+
+
+def decode_header(data, pos=0):
+    """bytes -> (header dict không có transactions, số giao dịch, vị trí sau header)"""
+    try:
+        version, index, timestamp, nonce, block_version, tx_count = _HEADER.unpack_from(data, pos)
+        _check_version(version)
+        pos += _HEADER.size
+        header = {"index": index, "timestamp": timestamp, "nonce": nonce, "version": block_version}
+        for key in ("previous_hash", "hash", "merkle_root"):
+            header[key], pos = _decode_value(data, pos)
+        if pos > len(data):
+            raise CodecError("Header nhị phân bị cắt cụt")
+        return header, tx_count, pos
+    except (IndexError, struct.error) as e:
+        raise CodecError(f"Header nhị phân hỏng: {e}")
+
+
+def decode_block(data):
+    """bytes (encode_block) -> block dict"""
+    block, tx_count, pos = decode_header(data)
+    transactions = []
+    for _ in range(tx_count):
+        (size,) = _U32.unpack_from(data, pos)
+        pos += 4
+        transactions.append(_decode_transaction(data, pos)[0])
+        pos += size
+    block["transactions"] = transactions
+    return block
+
+
+# ------------------ Stream ------------------ #
+
+def encode_stream(records, stream):
+    """Ghi các record bytes vào file-like `stream` (u32 length prefix), trả về số record"""
+    count = 0
+    for record in records:
+        stream.write(_U32.pack(len(record)))
+        stream.write(record)
+        count += 1
+    return count
+
+
+def iter_stream(stream):
+    """Đọc lần lượt từng record từ file-like `stream` (không load cả file)"""
+    while True:
+        prefix = stream.read(4)
+        if not prefix:
+            return
+        if len(prefix) != 4:
+            raise CodecError("Stream bị cắt cụt ở length prefix")
+        (size,) = _U32.unpack(prefix)
+        record = stream.read(size)
+        if len(record) != size:
+            raise CodecError("Stream bị cắt cụt giữa record")
+        yield record
+
+
+def iter_transactions(stream):
+    """Đọc stream các giao dịch đã encode -> dict giao dịch"""
+    for record in iter_stream(stream):
+        yield decode_transaction(record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Codec nhị phân cho block / giao dịch")
+    parser.add_argument("command", choices=("migrate",))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from core.database import migrate_transaction_blobs
+    converted = migrate_transaction_blobs(args.batch_size)
+    print(f"✅ Đã ghi transaction_blob cho {converted:,} dòng block_transactions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
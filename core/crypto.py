@@ -0,0 +1,175 @@
+"""
+Crypto backend cho sinh khóa / ký / verify ECDSA SECP256k1.
+
+- "ecdsa": thư viện ecdsa thuần Python
+- "cryptography": OpenSSL qua package cryptography (nhanh hơn nhiều)
+
+Hai backend cho chữ ký giống hệt nhau và verify chéo được:
+- ký tất định theo RFC 6979 (không dùng k ngẫu nhiên)
+- digest ký = SHA-1(message_hash), đúng hashfunc mặc định của ecdsa mà
+  các chữ ký cũ trong DB đã dùng
+- chữ ký raw r||s 64 byte, public key raw x||y 64 byte, private key 32 byte
+
+Chọn bằng biến môi trường ECDSA_CRYPTO_BACKEND=ecdsa|cryptography
+hoặc set_crypto_backend(). Mặc định dùng "cryptography" nếu có.
+"""
+import os
+import hashlib
+import threading
+from functools import lru_cache
+
+from ecdsa import SigningKey, VerifyingKey, SECP256k1, BadSignatureError
+
+
+
+def _sign_digest(message_hash):
+    return hashlib.sha1(message_hash).digest()
+
+
+class CryptoBackend:
+    """Interface chung cho các crypto backend"""
+
+    name = "base"
+
+    def generate_keypair(self):
+        """Trả về (private_key_bytes 32, public_key_bytes 64)"""
+        raise NotImplementedError
+
+    def sign(self, private_key, message_hash):
+        """Ký message_hash (bytes) -> chữ ký raw 64 byte"""
+        raise NotImplementedError
+
+    def verify(self, public_key, signature, message_hash):
+        """True nếu chữ ký hợp lệ"""
+        raise NotImplementedError
+
+
+class EcdsaBackend(CryptoBackend):
+    """Backend thuần Python (package ecdsa)"""
+
+    name = "ecdsa"
+
+    def generate_keypair(self):
+        sk = SigningKey.generate(curve=SECP256k1)
+        return sk.to_string(), sk.get_verifying_key().to_string()
+
+    def sign(self, private_key, message_hash):
+        # Không cache private key object: secret chỉ sống trong lời gọi
+        sk = SigningKey.from_string(private_key, curve=SECP256k1)
+        return sk.sign_digest_deterministic(_sign_digest(message_hash), hashfunc=hashlib.sha1)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _verifying_key(public_key):
+        return VerifyingKey.from_string(public_key, curve=SECP256k1)
+
+    def verify(self, public_key, signature, message_hash):
+        try:
+            return self._verifying_key(public_key).verify_digest(signature, _sign_digest(message_hash))
+        except BadSignatureError:
+            return False
+
+
+class CryptographyBackend(CryptoBackend):
+    """Backend OpenSSL (package cryptography)"""
+
+    name = "cryptography"
+
+    def __init__(self):
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec, utils
+
+        self._ec = ec
+        self._utils = utils
+        self._curve = ec.SECP256K1()
+        self._invalid_signature = InvalidSignature
+        self._verify_algorithm = ec.ECDSA(utils.Prehashed(hashes.SHA1()))
+        # deterministic_signing cần cryptography >= 44 và OpenSSL >= 3.2
+        self._sign_algorithm = ec.ECDSA(utils.Prehashed(hashes.SHA1()), deterministic_signing=True)
+        # Chỉ cache public key; private key không giữ lại sau lời gọi sign()
+        self._public_keys = lru_cache(maxsize=4096)(self._load_public_key)
+
+    def _load_private_key(self, private_key):
+        return self._ec.derive_private_key(int.from_bytes(private_key, "big"), self._curve)
+
+    def _load_public_key(self, public_key):
+        return self._ec.EllipticCurvePublicKey.from_encoded_point(self._curve, b"\x04" + public_key)
+
+    def generate_keypair(self):
+        key = self._ec.generate_private_key(self._curve)
+        numbers = key.public_key().public_numbers()
+        private_key = key.private_numbers().private_value.to_bytes(32, "big")
+        return private_key, numbers.x.to_bytes(32, "big") + numbers.y.to_bytes(32, "big")
+
+    def sign(self, private_key, message_hash):
+        der = self._load_private_key(private_key).sign(_sign_digest(message_hash), self._sign_algorithm)
+        r, s = self._utils.decode_dss_signature(der)
+        return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+    def verify(self, public_key, signature, message_hash):
+        if len(signature) != 64:
+            return False
+        der = self._utils.encode_dss_signature(
+            int.from_bytes(signature[:32], "big"),
+            int.from_bytes(signature[32:], "big")
+        )
+        try:
+            self._public_keys(public_key).verify(der, _sign_digest(message_hash), self._verify_algorithm)
+            return True
+        except self._invalid_signature:
+            return False
+
+
+_BACKENDS = {
+    "ecdsa": EcdsaBackend,
+    "cryptography": CryptographyBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def available_backends():
+    """Tên các backend dùng được trong môi trường hiện tại"""
+    names = []
+    for name, cls in _BACKENDS.items():
+        try:
+            cls()
+            names.append(name)
+        except Exception:
+            continue
+    return names
+
+
+def create_crypto_backend(name):
+    if name not in _BACKENDS:
+        raise ValueError(f"Crypto backend không hợp lệ: {name}")
+    return _BACKENDS[name]()
+
+
+def get_crypto_backend():
+    """Lấy crypto backend hiện tại (singleton)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.environ.get("ECDSA_CRYPTO_BACKEND")
+                if name:
+                    _backend = create_crypto_backend(name)
+                else:
+                    try:
+                        _backend = CryptographyBackend()
+                    except Exception:
+                        _backend = EcdsaBackend()
+    return _backend
+
+
+def set_crypto_backend(backend):
+    """Đổi crypto backend (tên hoặc instance CryptoBackend)"""
+    global _backend
+    if isinstance(backend, str):
+        backend = create_crypto_backend(backend)
+    with _backend_lock:
+        _backend = backend
+    return backend
@@ -2,9 +2,42 @@ import sqlite3
 import threading
 import os
 import json
+from datetime import datetime
+from core.storage import (
+    StorageBackend,
+    get_storage,
+    TX_COLUMNS,
+    WALLET_COLUMNS,
+    pending_limit_error,
+    reservation_deadline,
+    body_size,
+    block_header,
+)
+from core.records import TransactionRecord, as_record
+from core.log import get_logger
+from core.instrumentation import timed
+from core.archive import BlockArchive, encode_body
+from core.codec import encode_transaction, decode_transaction
+from core.blockstore import MmapBlockStore, PAYLOAD_BINARY, PAYLOAD_JSON
+
+logger = get_logger(__name__)
 
 DATA_DIR = "data"
 DB_FILE = os.path.join(DATA_DIR, "system.db")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+ARCHIVE_BATCH_SIZE = 500
+
+# Định dạng lưu transactions của block: "json" (mặc định) hoặc "binary" (core/codec.py,
+# cột transaction_blob - nhỏ hơn ~45%). Đọc luôn hiểu cả hai.
+TX_CODEC = os.environ.get("ECDSA_TX_CODEC", "json")
+
+# Nơi giữ body block: "sqlite" (bảng block_transactions, mặc định) hoặc "mmap"
+# (core/blockstore.py, file segment trong data/blocks - header vẫn ở SQLite)
+BLOCK_STORE = os.environ.get("ECDSA_BLOCK_STORE", "sqlite")
+BLOCK_STORE_DIR = os.path.join(DATA_DIR, "blocks")
+
+# UPDATE ... RETURNING cần SQLite >= 3.35, bản cũ hơn đọc rồi ghi trong BEGIN IMMEDIATE
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
 _lock = threading.Lock()
 
 def get_connection():
@@ -46,7 +79,9 @@ def init_db():
             status TEXT,
             signature TEXT,
             nonce INTEGER,
-            executed INTEGER DEFAULT 0
+            executed INTEGER DEFAULT 0,
+            message_hash TEXT,
+            anchored INTEGER DEFAULT 0
         );
         
         -- ✅ NEW: Blocks table for blockchain
@@ -64,6 +99,7 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             block_index INTEGER NOT NULL,
             transaction_data TEXT NOT NULL,
+            transaction_blob BLOB,
             position INTEGER NOT NULL,
             FOREIGN KEY (block_index) REFERENCES blocks(index_number) ON DELETE CASCADE
         );
@@ -98,6 +134,7 @@ def init_db():
             conn.commit()
 
 
+@timed("db_query_seconds", op="execute")
 def execute(query, params=()):
     """Thực thi câu lệnh (INSERT, UPDATE, DELETE)."""
     with _lock, get_connection() as conn:
@@ -105,6 +142,7 @@ def execute(query, params=()):
         conn.commit()
 
 
+@timed("db_query_seconds", op="fetch")
 def fetch_one(query, params=()):
     """Lấy 1 dòng dữ liệu (trả về dict hoặc None)."""
     with _lock, get_connection() as conn:
@@ -115,6 +153,7 @@ def fetch_one(query, params=()):
         return dict(row)
 
 
+@timed("db_query_seconds", op="fetch")
 def fetch_all(query, params=()):
     """Lấy nhiều dòng dữ liệu (trả về list[dict])."""
     with _lock, get_connection() as conn:
@@ -135,186 +174,1087 @@ def migrate_add_nonce():
             columns = [row[1] for row in cursor.fetchall()]
             
             if "nonce" not in columns:
-                print("🔄 Migrating: Adding nonce column to wallets...")
+                logger.info("🔄 Migrating: Adding nonce column to wallets...")
                 conn.execute("ALTER TABLE wallets ADD COLUMN nonce INTEGER DEFAULT 0")
                 conn.commit()
-                print("✅ Migration completed!")
+                logger.info("✅ Migration completed!")
             
             # Check transactions table
             cursor = conn.execute("PRAGMA table_info(transactions)")
             columns = [row[1] for row in cursor.fetchall()]
             
             if "nonce" not in columns:
-                print("🔄 Migrating: Adding nonce column to transactions...")
+                logger.info("🔄 Migrating: Adding nonce column to transactions...")
                 conn.execute("ALTER TABLE transactions ADD COLUMN nonce INTEGER")
                 conn.commit()
-                print("✅ Migration completed!")
+                logger.info("✅ Migration completed!")
             
             if "expires_at" not in columns:
-                print("🔄 Migrating: Adding expires_at column to transactions...")
+                logger.info("🔄 Migrating: Adding expires_at column to transactions...")
                 conn.execute("ALTER TABLE transactions ADD COLUMN expires_at TEXT")
                 conn.commit()
-                print("✅ Migration completed!")
+                logger.info("✅ Migration completed!")
                 
     except Exception as e:
-        print(f"⚠️ Migration error: {e}")
+        logger.warning("⚠️ Migration error: %s", e)
 
 
-# ============= BLOCKCHAIN DATABASE FUNCTIONS ============= #
+def _ensure_columns(table, columns):
+    """Thêm các cột còn thiếu vào bảng (columns: list[(tên, kiểu SQL)]), trả về tên cột vừa thêm"""
+    added = []
+    with _lock, get_connection() as conn:
+        cursor = conn.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, ddl in columns:
+            if name not in existing:
+                logger.info("🔄 Migrating: Adding %s column to %s...", name, table)
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                added.append(name)
+        conn.commit()
+    return added
 
-def save_block(block_dict):
-    """Lưu block vào database"""
+
+def migrate_add_message_hash():
+    """Thêm cột message_hash (SHA-256 payload ký, lưu lúc ký giao dịch)"""
+    try:
+        _ensure_columns("transactions", [("message_hash", "TEXT")])
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def migrate_add_merkle():
+    """
+    Block version 2: cột version + merkle_root cho blocks, bảng tx_index
+    (tx_id -> block, vị trí) để lấy Merkle proof không phải quét chain.
+    Block cũ giữ version 1; tx_index được backfill từ block_transactions.
+    """
     try:
+        _ensure_columns("blocks", [("version", "INTEGER DEFAULT 1"), ("merkle_root", "TEXT")])
         with _lock, get_connection() as conn:
-            # Insert block
             conn.execute("""
-                INSERT OR REPLACE INTO blocks 
-                (index_number, timestamp, previous_hash, nonce, hash)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                block_dict["index"],
-                block_dict["timestamp"],
-                block_dict["previous_hash"],
-                block_dict["nonce"],
-                block_dict["hash"]
-            ))
-            
-            # Delete old transactions for this block (if replacing)
-            conn.execute("DELETE FROM block_transactions WHERE block_index = ?", 
-                        (block_dict["index"],))
-            
-            # Insert block transactions
-            for position, tx in enumerate(block_dict["transactions"]):
+                CREATE TABLE IF NOT EXISTS tx_index (
+                    tx_id TEXT PRIMARY KEY,
+                    block_index INTEGER NOT NULL,
+                    position INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tx_index_block ON tx_index(block_index)")
+            empty = conn.execute("SELECT 1 FROM tx_index LIMIT 1").fetchone() is None
+            if empty and conn.execute("SELECT 1 FROM block_transactions LIMIT 1").fetchone():
+                logger.info("🔄 Migrating: Building tx_index from block_transactions...")
                 conn.execute("""
-                    INSERT INTO block_transactions (block_index, transaction_data, position)
-                    VALUES (?, ?, ?)
-                """, (block_dict["index"], json.dumps(tx, ensure_ascii=False), position))
-            
+                    INSERT OR REPLACE INTO tx_index (tx_id, block_index, position)
+                    SELECT json_extract(transaction_data, '$.id'), block_index, position
+                    FROM block_transactions
+                    WHERE transaction_data != '' AND json_extract(transaction_data, '$.id') IS NOT NULL
+                    ORDER BY block_index ASC, position ASC
+                """)
             conn.commit()
-            return True
     except Exception as e:
-        print(f"❌ Error saving block: {e}")
-        return False
+        logger.warning("⚠️ Migration error: %s", e)
 
 
-def load_all_blocks():
-    """Load tất cả blocks từ database"""
+def migrate_add_anchored():
+    """
+    Cột anchored: 1 khi giao dịch đã nằm trong một block (save_block đánh dấu).
+    Sync DB -> chain chỉ đọc các dòng verified + executed + anchored = 0
+    qua partial index, không phải quét toàn bộ bảng transactions.
+    DB cũ: đánh dấu các giao dịch đã có trong tx_index.
+    """
     try:
+        added = _ensure_columns("transactions", [("anchored", "INTEGER DEFAULT 0")])
         with _lock, get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT index_number, timestamp, previous_hash, nonce, hash
+            if added:
+                conn.execute("""
+                    UPDATE transactions SET anchored = 1
+                    WHERE id IN (SELECT tx_id FROM tx_index)
+                """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tx_unanchored ON transactions(anchored)
+                WHERE anchored = 0 AND status = 'verified' AND executed = 1
+            """)
+            conn.commit()
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def migrate_add_archive():
+    """Bảng block_archive: offset index của body block đã chuyển sang segment (core/archive.py)"""
+    try:
+        with _lock, get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS block_archive (
+                    block_index INTEGER PRIMARY KEY,
+                    segment INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    codec TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def migrate_add_transaction_blob():
+    """Cột transaction_blob: transactions của block ở dạng nhị phân (core/codec.py)"""
+    try:
+        _ensure_columns("block_transactions", [("transaction_blob", "BLOB")])
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def migrate_transaction_blobs(batch_size=1000):
+    """
+    Chuyển các dòng block_transactions cũ (JSON) sang transaction_blob, theo batch.
+    transaction_data của dòng đã chuyển để rỗng. Trả về số dòng đã chuyển.
+    """
+    converted = 0
+    while True:
+        with _lock, get_connection() as conn:
+            rows = conn.execute("""
+                SELECT id, transaction_data FROM block_transactions
+                WHERE transaction_blob IS NULL
+                LIMIT ?
+            """, (batch_size,)).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                "UPDATE block_transactions SET transaction_blob = ?, transaction_data = '' WHERE id = ?",
+                [(encode_transaction(json.loads(data)), row_id) for row_id, data in rows]
+            )
+            conn.commit()
+        converted += len(rows)
+        logger.info("🔄 Migrating: %s block transactions -> binary", converted)
+    return converted
+
+
+def migrate_add_expiry_indexes():
+    """
+    Index cho sweeper giao dịch hết hạn (status, expires_at) và cho truy vấn
+    pending theo người gửi (sender, status)
+    """
+    try:
+        with _lock, get_connection() as conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tx_status_expires ON transactions(status, expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tx_sender_status ON transactions(sender, status)")
+            conn.commit()
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def migrate_add_block_summary():
+    """
+    Cột tx_count + body_bytes cho blocks: dựng chain lúc khởi động chỉ đọc
+    header (load_block_headers), không giải mã body. Block cũ được điền ở lần
+    load_block_headers đầu tiên.
+    """
+    try:
+        _ensure_columns("blocks", [("tx_count", "INTEGER"), ("body_bytes", "INTEGER")])
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def migrate_add_nonce_reservations():
+    """
+    Bảng nonce_reservations: ví nào vừa đặt trước nonce bằng reserve_nonces()
+    (tới reserved_until) - rewind_nonces() bỏ qua các ví này
+    """
+    try:
+        with _lock, get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS nonce_reservations (
+                    wallet TEXT PRIMARY KEY,
+                    reserved_until TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+    except Exception as e:
+        logger.warning("⚠️ Migration error: %s", e)
+
+
+def _decode_tx(data, blob):
+    """Một dòng block_transactions -> dict giao dịch (blob nhị phân hoặc JSON)"""
+    return decode_transaction(blob) if blob is not None else json.loads(data)
+
+
+# ============= SQLITE STORAGE ENGINE ============= #
+
+_TX_FILTER_STATUS = "status IN ({})"
+
+# SELECT theo đúng thứ tự TX_COLUMNS để TransactionRecord.from_row() unpack trực tiếp
+TX_SELECT_COLUMNS = ", ".join(TX_COLUMNS)
+
+
+@timed("db_query_seconds", op="fetch")
+def _fetch_records(query, params=()):
+    """Lấy các giao dịch dưới dạng TransactionRecord (không qua dict)."""
+    with _lock, get_connection() as conn:
+        cursor = conn.execute(query, params)
+        from_row = TransactionRecord.from_row
+        return [from_row(r) for r in cursor.fetchall()]
+
+
+def _check_pending(conn, name, max_pending):
+    """ValueError nếu ví đã có max_pending giao dịch chờ (max_pending=0: không giới hạn)"""
+    if not max_pending:
+        return
+    row = conn.execute("""
+        SELECT COUNT(*) AS n FROM transactions
+        WHERE sender = ? AND status IN ('pending', 'signed') AND executed = 0
+    """, (name,)).fetchone()
+    if row["n"] >= max_pending:
+        raise pending_limit_error(name, max_pending)
+
+
+def _reserve_nonces(conn, name, count):
+    """Tăng nonce ví trong transaction đang mở của conn, trả về nonce đầu tiên (None nếu không có ví)"""
+    if _HAS_RETURNING:
+        rows = conn.execute("""
+            UPDATE wallets SET nonce = COALESCE(nonce, 0) + ?
+            WHERE name = ? RETURNING nonce
+        """, (count, name)).fetchall()
+        return rows[0]["nonce"] - count if rows else None
+    row = conn.execute("SELECT COALESCE(nonce, 0) AS nonce FROM wallets WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    conn.execute("UPDATE wallets SET nonce = ? WHERE name = ?", (row["nonce"] + count, name))
+    return row["nonce"]
+
+
+class SQLiteStorage(StorageBackend):
+    """Storage engine mặc định - file SQLite data/system.db"""
+
+    name = "sqlite"
+
+    def __init__(self):
+        init_db()
+        migrate_add_nonce()
+        migrate_add_message_hash()
+        migrate_add_merkle()
+        migrate_add_anchored()
+        migrate_add_archive()
+        migrate_add_transaction_blob()
+        migrate_add_expiry_indexes()
+        migrate_add_nonce_reservations()
+        migrate_add_block_summary()
+        self.archive = BlockArchive(ARCHIVE_DIR)
+        self.block_store = None
+        if BLOCK_STORE == "mmap":
+            payload = PAYLOAD_BINARY if TX_CODEC == "binary" else PAYLOAD_JSON
+            self.block_store = MmapBlockStore(BLOCK_STORE_DIR, payload=payload)
+
+        # Auto-migrate từ JSON nếu có
+        if self.get_block_count() == 0:
+            migrate_blockchain_from_json(self)
+        # Block store mmap dùng chung giữa các process: chỉ chain writer đối chiếu
+        # nó với SQLite (sync_block_store, gọi khi lên leader), mở storage thì không
+
+    # ------------------ Wallets ------------------ #
+
+    def insert_wallet(self, wallet):
+        row = {col: wallet.get(col) for col in WALLET_COLUMNS}
+        if row["balance"] is None:
+            row["balance"] = 0
+        if row["nonce"] is None:
+            row["nonce"] = 0
+        execute("""
+            INSERT INTO wallets (name, address, public_key, encrypted_private_key, salt, balance, nonce, created_at)
+            VALUES (:name, :address, :public_key, :encrypted_private_key, :salt, :balance, :nonce, :created_at)
+        """, row)
+
+    def get_wallet(self, name):
+        return fetch_one("SELECT * FROM wallets WHERE name = ?", (name,))
+
+    def get_wallet_by_address(self, address):
+        return fetch_one("SELECT * FROM wallets WHERE address = ?", (address,))
+
+    def list_wallets(self):
+        return fetch_all("SELECT * FROM wallets")
+
+    def update_wallet(self, name, **fields):
+        if not fields:
+            return
+        unknown = set(fields) - set(WALLET_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cột không hợp lệ: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        execute(f"UPDATE wallets SET {assignments} WHERE name = ?",
+                tuple(fields.values()) + (name,))
+
+    def increment_nonce(self, name, count=1):
+        execute("""
+            UPDATE wallets 
+            SET nonce = COALESCE(nonce, 0) + ? 
+            WHERE name = ?
+        """, (count, name))
+
+    def reserve_nonces(self, name, count=1):
+        with _lock, get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            first = _reserve_nonces(conn, name, count)
+            if first is not None:
+                conn.execute("""
+                    INSERT OR REPLACE INTO nonce_reservations (wallet, reserved_until)
+                    VALUES (?, ?)
+                """, (name, reservation_deadline()))
+            conn.commit()
+            return first
+
+    def count_wallets(self):
+        return fetch_one("SELECT COUNT(*) AS n FROM wallets")["n"]
+
+    # ------------------ Transactions ------------------ #
+
+    def insert_transaction(self, tx):
+        tx = as_record(tx)
+        if tx.executed is None:
+            tx = tx.replace(executed=0)
+        execute(f"""
+            INSERT INTO transactions ({TX_SELECT_COLUMNS})
+            VALUES ({", ".join("?" * len(TX_COLUMNS))})
+        """, tx.as_row())
+
+    def insert_transaction_with_nonce(self, name, build, max_pending=0):
+        # Khóa ghi từ đầu: sweeper rewind_nonces (process khác) và các request
+        # cùng người gửi không chen vào giữa lúc đếm / cấp nonce và lúc lưu
+        with _lock, get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _check_pending(conn, name, max_pending)
+            nonce = _reserve_nonces(conn, name, 1)
+            tx = as_record(build(0 if nonce is None else nonce))
+            if tx.executed is None:
+                tx = tx.replace(executed=0)
+            conn.execute(f"""
+                INSERT INTO transactions ({TX_SELECT_COLUMNS})
+                VALUES ({", ".join("?" * len(TX_COLUMNS))})
+            """, tx.as_row())
+            conn.commit()
+            return tx
+
+    @timed("db_query_seconds", op="insert_batch")
+    def insert_transactions(self, txs):
+        rows = []
+        for tx in txs:
+            tx = as_record(tx)
+            if tx.executed is None:
+                tx = tx.replace(executed=0)
+            rows.append(tx.as_row())
+        with _lock, get_connection() as conn:
+            conn.executemany(f"""
+                INSERT INTO transactions ({TX_SELECT_COLUMNS})
+                VALUES ({", ".join("?" * len(TX_COLUMNS))})
+            """, rows)
+            conn.commit()
+
+    def get_transaction(self, tx_id):
+        rows = _fetch_records(f"SELECT {TX_SELECT_COLUMNS} FROM transactions WHERE id = ?", (tx_id,))
+        return rows[0] if rows else None
+
+    def update_transaction(self, tx_id, **fields):
+        if not fields:
+            return
+        unknown = set(fields) - set(TX_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cột không hợp lệ: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        execute(f"UPDATE transactions SET {assignments} WHERE id = ?",
+                tuple(fields.values()) + (tx_id,))
+
+    def list_unanchored_transactions(self, limit=None):
+        query = f"""
+            SELECT {TX_SELECT_COLUMNS} FROM transactions
+            WHERE anchored = 0 AND status = 'verified' AND executed = 1
+            ORDER BY rowid ASC
+        """
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        return _fetch_records(query, params)
+
+    def list_transactions(self, sender=None, party=None, statuses=None,
+                          executed=None, limit=None):
+        where, params = [], []
+        if sender is not None:
+            where.append("sender = ?")
+            params.append(sender)
+        elif party is not None:
+            where.append("(sender = ? OR receiver = ?)")
+            params.extend((party, party))
+        if statuses is not None:
+            where.append(_TX_FILTER_STATUS.format(", ".join("?" * len(statuses))))
+            params.extend(statuses)
+        if executed is not None:
+            where.append("executed = ?")
+            params.append(executed)
+
+        query = f"SELECT {TX_SELECT_COLUMNS} FROM transactions"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY timestamp DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return _fetch_records(query, tuple(params))
+
+    def expire_transactions(self, now, limit):
+        with _lock, get_connection() as conn:
+            rows = conn.execute("""
+                SELECT id, sender FROM transactions
+                WHERE status IN ('pending', 'signed') AND expires_at < ? AND executed = 0
+                LIMIT ?
+            """, (now, limit)).fetchall()
+            if rows:
+                # Điều kiện status lặp lại: giao dịch vừa được verify thì không bị expire
+                conn.executemany("""
+                    UPDATE transactions SET status = 'expired'
+                    WHERE id = ? AND status IN ('pending', 'signed') AND executed = 0
+                """, [(row["id"],) for row in rows])
+                conn.commit()
+            return [(row["id"], row["sender"]) for row in rows]
+
+    def rewind_nonces(self, senders, now=None):
+        now = now or datetime.now().isoformat()
+        rewound = 0
+        with _lock, get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sender in senders:
+                cursor = conn.execute("""
+                    UPDATE wallets SET nonce = (
+                        SELECT COALESCE(MAX(nonce) + 1, 0) FROM transactions
+                        WHERE sender = wallets.name AND status != 'expired'
+                    )
+                    WHERE name = ? AND nonce > (
+                        SELECT COALESCE(MAX(nonce) + 1, 0) FROM transactions
+                        WHERE sender = wallets.name AND status != 'expired'
+                    ) AND NOT EXISTS (
+                        SELECT 1 FROM nonce_reservations
+                        WHERE wallet = wallets.name AND reserved_until > ?
+                    )
+                """, (sender, now))
+                rewound += cursor.rowcount
+            conn.commit()
+        return rewound
+
+    def count_transactions(self, statuses=None):
+        if statuses is None:
+            return fetch_one("SELECT COUNT(*) AS n FROM transactions")["n"]
+        query = "SELECT COUNT(*) AS n FROM transactions WHERE " + \
+            _TX_FILTER_STATUS.format(", ".join("?" * len(statuses)))
+        return fetch_one(query, tuple(statuses))["n"]
+
+    def delete_all_transactions(self):
+        execute("DELETE FROM transactions")
+
+    @timed("db_query_seconds", op="transfer")
+    def execute_transfer(self, tx_id, from_user, to_user, amount):
+        with _lock:
+            conn = get_connection()
+            cursor = conn.cursor()
+
+            try:
+                # Begin transaction
+                cursor.execute("BEGIN EXCLUSIVE")
+
+                # 1. Get current balances (with lock)
+                sender = cursor.execute(
+                    "SELECT balance FROM wallets WHERE name = ?",
+                    (from_user,)
+                ).fetchone()
+
+                receiver = cursor.execute(
+                    "SELECT balance FROM wallets WHERE name = ?",
+                    (to_user,)
+                ).fetchone()
+
+                if not sender or not receiver:
+                    cursor.execute("ROLLBACK")
+                    return False, "Wallet not found", None, None
+
+                sender_balance = sender[0]
+                receiver_balance = receiver[0]
+
+                # 2. Verify balance again (double-check)
+                if sender_balance < amount:
+                    cursor.execute("ROLLBACK")
+                    return False, f"Insufficient balance: {sender_balance} < {amount}", sender_balance, receiver_balance
+
+                # 3. Update balances atomically
+                cursor.execute(
+                    "UPDATE wallets SET balance = balance - ? WHERE name = ?",
+                    (amount, from_user)
+                )
+
+                cursor.execute(
+                    "UPDATE wallets SET balance = balance + ? WHERE name = ?",
+                    (amount, to_user)
+                )
+
+                # 4. Mark transaction as executed
+                cursor.execute(
+                    "UPDATE transactions SET executed = 1, status = 'verified' WHERE id = ?",
+                    (tx_id,)
+                )
+
+                conn.commit()
+                return True, "Transaction executed successfully", sender_balance, receiver_balance
+
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                return False, f"Database error: {str(e)}", None, None
+            finally:
+                conn.close()
+
+    @timed("db_query_seconds", op="transfer_batch")
+    def execute_transfers(self, transfers):
+        with _lock:
+            conn = get_connection()
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute("BEGIN EXCLUSIVE")
+
+                results = []
+                for tx_id, from_user, to_user, amount in transfers:
+                    sender = cursor.execute(
+                        "SELECT balance FROM wallets WHERE name = ?", (from_user,)
+                    ).fetchone()
+                    receiver = cursor.execute(
+                        "SELECT balance FROM wallets WHERE name = ?", (to_user,)
+                    ).fetchone()
+
+                    if not sender or not receiver:
+                        message = "Wallet not found"
+                    elif sender[0] < amount:
+                        message = f"Insufficient balance: {sender[0]} < {amount}"
+                    else:
+                        cursor.execute(
+                            "UPDATE wallets SET balance = balance - ? WHERE name = ?",
+                            (amount, from_user)
+                        )
+                        cursor.execute(
+                            "UPDATE wallets SET balance = balance + ? WHERE name = ?",
+                            (amount, to_user)
+                        )
+                        cursor.execute(
+                            "UPDATE transactions SET executed = 1, status = 'verified' WHERE id = ?",
+                            (tx_id,)
+                        )
+                        results.append((True, "Transaction executed successfully"))
+                        continue
+
+                    cursor.execute(
+                        "UPDATE transactions SET status = 'rejected' WHERE id = ?", (tx_id,)
+                    )
+                    results.append((False, message))
+
+                conn.commit()
+                return results
+
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                return [(False, f"Database error: {str(e)}")] * len(transfers)
+            finally:
+                conn.close()
+
+    # ------------------ Blocks ------------------ #
+
+    def _write_block(self, conn, block_dict, replace):
+        """
+        Ghi block + transactions + tx_index trong transaction `conn` đang mở
+        (chưa commit, chưa ghi block store - xem _commit_block).
+        """
+        verb = "INSERT OR REPLACE" if replace else "INSERT"
+        conn.execute(f"""
+            {verb} INTO blocks 
+            (index_number, timestamp, previous_hash, nonce, hash, version, merkle_root,
+             tx_count, body_bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            block_dict["index"],
+            block_dict["timestamp"],
+            block_dict["previous_hash"],
+            block_dict["nonce"],
+            block_dict["hash"],
+            block_dict.get("version") or 1,
+            block_dict.get("merkle_root"),
+            len(block_dict["transactions"]),
+            body_size(block_dict["transactions"])
+        ))
+
+        # Delete old transactions for this block (if replacing)
+        conn.execute("DELETE FROM block_transactions WHERE block_index = ?", 
+                    (block_dict["index"],))
+        conn.execute("DELETE FROM tx_index WHERE block_index = ?", (block_dict["index"],))
+        conn.execute("DELETE FROM block_archive WHERE block_index = ?", (block_dict["index"],))
+
+        # Insert block transactions
+        binary = TX_CODEC == "binary"
+        for position, tx in enumerate(block_dict["transactions"]):
+            if self.block_store is None:
+                if binary:
+                    data, blob = "", encode_transaction(tx)
+                else:
+                    data, blob = json.dumps(tx, ensure_ascii=False), None
+                conn.execute("""
+                    INSERT INTO block_transactions (block_index, transaction_data, transaction_blob, position)
+                    VALUES (?, ?, ?, ?)
+                """, (block_dict["index"], data, blob, position))
+            if tx.get("id"):
+                conn.execute("""
+                    INSERT OR REPLACE INTO tx_index (tx_id, block_index, position)
+                    VALUES (?, ?, ?)
+                """, (tx["id"], block_dict["index"], position))
+
+        # Giao dịch đã vào block -> không sync lại nữa
+        conn.executemany("UPDATE transactions SET anchored = 1 WHERE id = ?",
+                         [(tx["id"],) for tx in block_dict["transactions"] if tx.get("id")])
+
+    def _commit_block(self, conn, block_dict, replace):
+        """
+        _write_block + commit. Với block store mmap (nơi duy nhất giữ body),
+        body được ghi vào store sau các lệnh SQL (xung đột index đã báo lỗi ở
+        INSERT blocks) và trước commit; commit lỗi thì trả entry index về như cũ.
+        """
+        try:
+            self._write_block(conn, block_dict, replace)
+        except Exception:
+            conn.rollback()
+            raise
+        previous = self.block_store.put(block_dict) if self.block_store is not None else None
+        try:
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            if self.block_store is not None:
+                self.block_store.restore(block_dict["index"], previous)
+            raise
+
+    def sync_block_store(self):
+        """
+        Đối chiếu block store mmap với bảng blocks - CHỈ process chain writer
+        gọi (ChainService khi vừa lấy LeaderLock): process khác có thể đang
+        mmap store, và leader có thể đang ở giữa put() và commit.
+        - bỏ entry của block không có trong SQLite (commit lỗi / crash trước commit)
+        - chép body các block còn trong SQLite / archive mà store chưa có
+          (lần đầu bật ECDSA_BLOCK_STORE=mmap). Trả về số block đã chép.
+        """
+        if self.block_store is None:
+            return 0
+        top = self.get_max_block_index()
+        height = -1 if top is None else top
+        self.block_store.truncate(height + 1)
+
+        missing = self.block_store.missing(height + 1)
+        if missing:
+            logger.info("🔄 Migrating: Copying %s blocks to mmap block store...", len(missing))
+        for i in range(0, len(missing), ARCHIVE_BATCH_SIZE):
+            chunk = set(missing[i:i + ARCHIVE_BATCH_SIZE])
+            for block in self._load_block_range_sql(min(chunk), max(chunk) + 1):
+                if block["index"] in chunk:
+                    self.block_store.put(block)
+        return len(missing)
+
+    @timed("db_query_seconds", op="save_block")
+    def save_block(self, block_dict):
+        """Lưu block vào database"""
+        try:
+            with _lock, get_connection() as conn:
+                self._commit_block(conn, block_dict, replace=True)
+                return True
+        except Exception as e:
+            logger.error("❌ Error saving block: %s", e)
+            return False
+
+    @timed("db_query_seconds", op="insert_block")
+    def insert_block(self, block_dict):
+        """Thêm block mới - lỗi IntegrityError nếu index / hash đã có (không ghi đè)"""
+        with _lock, get_connection() as conn:
+            self._commit_block(conn, block_dict, replace=False)
+
+    @timed("db_query_seconds", op="load_blocks")
+    def load_all_blocks(self):
+        """Load tất cả blocks từ database"""
+        if self.block_store is not None:
+            top = self.get_max_block_index()
+            return [] if top is None else self.load_block_range(0, top + 1)
+        try:
+            with _lock, get_connection() as conn:
+                cursor = conn.execute("""
+                    SELECT index_number, timestamp, previous_hash, nonce, hash, version, merkle_root
+                    FROM blocks
+                    ORDER BY index_number ASC
+                """)
+
+                blocks = []
+                for row in cursor.fetchall():
+                    block_dict = dict(row)
+
+                    # Load transactions for this block
+                    tx_cursor = conn.execute("""
+                        SELECT transaction_data, transaction_blob
+                        FROM block_transactions
+                        WHERE block_index = ?
+                        ORDER BY position ASC
+                    """, (block_dict["index_number"],))
+
+                    transactions = []
+                    for tx_row in tx_cursor.fetchall():
+                        transactions.append(_decode_tx(tx_row[0], tx_row[1]))
+
+                    blocks.append({
+                        "index": block_dict["index_number"],
+                        "timestamp": block_dict["timestamp"],
+                        "previous_hash": block_dict["previous_hash"],
+                        "nonce": block_dict["nonce"],
+                        "hash": block_dict["hash"],
+                        "version": block_dict["version"] or 1,
+                        "merkle_root": block_dict["merkle_root"],
+                        "transactions": transactions
+                    })
+
+                self._attach_archived(conn, {b["index"]: b for b in blocks})
+                return blocks
+        except Exception as e:
+            logger.error("❌ Error loading blocks: %s", e)
+            return []
+
+    @timed("db_query_seconds", op="load_block_range")
+    def load_block_range(self, start, stop):
+        """Các block có start <= index < stop, kèm transactions"""
+        if self.block_store is not None:
+            # Đủ block trong store -> không query SQL. Thiếu (cuối chain, hoặc
+            # writer chưa sync_block_store block cũ) -> phần thiếu đọc từ SQLite
+            blocks = self.block_store.load_range(start, stop)
+            if len(blocks) < stop - max(start, 0):
+                found = {block["index"] for block in blocks}
+                extra = [block for block in self._load_block_range_sql(start, stop)
+                         if block["index"] not in found]
+                if extra:
+                    blocks = sorted(blocks + extra, key=lambda block: block["index"])
+            return blocks
+        return self._load_block_range_sql(start, stop)
+
+    def _load_block_range_sql(self, start, stop):
+        """load_block_range từ bảng blocks + block_transactions / archive (2 query)"""
+        with get_connection() as conn:
+            rows = conn.execute("""
+                SELECT index_number, timestamp, previous_hash, nonce, hash, version, merkle_root
                 FROM blocks
+                WHERE index_number >= ? AND index_number < ?
                 ORDER BY index_number ASC
-            """)
-            
-            blocks = []
-            for row in cursor.fetchall():
-                block_dict = dict(row)
-                
-                # Load transactions for this block
-                tx_cursor = conn.execute("""
-                    SELECT transaction_data
+            """, (start, stop)).fetchall()
+            if not rows:
+                return []
+
+            blocks = {}
+            for row in rows:
+                blocks[row["index_number"]] = {
+                    "index": row["index_number"],
+                    "timestamp": row["timestamp"],
+                    "previous_hash": row["previous_hash"],
+                    "nonce": row["nonce"],
+                    "hash": row["hash"],
+                    "version": row["version"] or 1,
+                    "merkle_root": row["merkle_root"],
+                    "transactions": []
+                }
+
+            tx_cursor = conn.execute("""
+                SELECT block_index, transaction_data, transaction_blob
+                FROM block_transactions
+                WHERE block_index BETWEEN ? AND ?
+                ORDER BY block_index ASC, position ASC
+            """, (rows[0]["index_number"], rows[-1]["index_number"]))
+            for block_index, data, blob in tx_cursor:
+                if block_index in blocks:
+                    blocks[block_index]["transactions"].append(_decode_tx(data, blob))
+
+            self._attach_archived(conn, blocks)
+            return list(blocks.values())
+
+    @timed("db_query_seconds", op="load_block_headers")
+    def load_block_headers(self, start, stop):
+        """Header các block (một query trên bảng blocks, không đọc body)"""
+        rows = fetch_all("""
+            SELECT index_number, timestamp, previous_hash, nonce, hash, version, merkle_root,
+                   tx_count, body_bytes
+            FROM blocks
+            WHERE index_number >= ? AND index_number < ?
+            ORDER BY index_number ASC
+        """, (start, stop))
+        headers = [{
+            "index": row["index_number"],
+            "timestamp": row["timestamp"],
+            "previous_hash": row["previous_hash"],
+            "nonce": row["nonce"],
+            "hash": row["hash"],
+            "version": row["version"] or 1,
+            "merkle_root": row["merkle_root"],
+            "tx_count": row["tx_count"],
+            "body_bytes": row["body_bytes"],
+        } for row in rows]
+
+        missing = [h["index"] for h in headers if h["tx_count"] is None or h["body_bytes"] is None]
+        if missing:
+            filled = self._backfill_block_summary(missing[0], missing[-1] + 1)
+            headers = [filled.get(h["index"], h) for h in headers]
+        return headers
+
+    def _backfill_block_summary(self, start, stop):
+        """Điền tx_count / body_bytes cho block ghi trước migrate_add_block_summary (một lần)"""
+        logger.info("🔄 Migrating: Filling tx_count / body_bytes for blocks #%s-#%s...", start, stop - 1)
+        headers = {block["index"]: block_header(block) for block in self.load_block_range(start, stop)}
+        with _lock, get_connection() as conn:
+            conn.executemany(
+                "UPDATE blocks SET tx_count = ?, body_bytes = ? WHERE index_number = ?",
+                [(h["tx_count"], h["body_bytes"], index) for index, h in headers.items()]
+            )
+            conn.commit()
+        return headers
+
+    def get_max_block_index(self):
+        row = fetch_one("SELECT MAX(index_number) AS top FROM blocks")
+        return row["top"] if row else None
+
+    def get_latest_block(self):
+        """Lấy block mới nhất"""
+        if self.block_store is not None:
+            top = self.get_max_block_index()
+            if top is None:
+                return None
+            if self.block_store.entry(top) is not None:
+                return self.block_store.get(top)
+
+        row = fetch_one("""
+            SELECT index_number, timestamp, previous_hash, nonce, hash, version, merkle_root
+            FROM blocks
+            ORDER BY index_number DESC
+            LIMIT 1
+        """)
+
+        if not row:
+            return None
+
+        block_dict = dict(row)
+
+        # Load transactions
+        with get_connection() as conn:
+            cursor = conn.execute("""
+                SELECT transaction_data, transaction_blob
+                FROM block_transactions
+                WHERE block_index = ?
+                ORDER BY position ASC
+            """, (block_dict["index_number"],))
+
+            transactions = []
+            for tx_row in cursor.fetchall():
+                transactions.append(_decode_tx(tx_row[0], tx_row[1]))
+
+            block = {
+                "index": block_dict["index_number"],
+                "timestamp": block_dict["timestamp"],
+                "previous_hash": block_dict["previous_hash"],
+                "nonce": block_dict["nonce"],
+                "hash": block_dict["hash"],
+                "version": block_dict["version"] or 1,
+                "merkle_root": block_dict["merkle_root"],
+                "transactions": transactions
+            }
+            self._attach_archived(conn, {block["index"]: block})
+
+        return block
+
+    def _attach_archived(self, conn, blocks):
+        """Điền transactions cho các block (index -> dict) có body nằm trong archive"""
+        if not blocks:
+            return
+        rows = conn.execute("""
+            SELECT block_index, segment, offset, length, codec
+            FROM block_archive
+            WHERE block_index BETWEEN ? AND ?
+        """, (min(blocks), max(blocks))).fetchall()
+        for block_index, segment, offset, length, codec in rows:
+            block = blocks.get(block_index)
+            if block is not None and not block["transactions"]:
+                block["transactions"] = self.archive.read(segment, offset, length, codec)
+
+    @timed("db_query_seconds", op="archive_blocks")
+    def archive_blocks(self, depth, batch_size=ARCHIVE_BATCH_SIZE):
+        """
+        Chuyển body các block có index <= tip - depth từ block_transactions
+        sang segment nén (theo batch). Trả về số block đã archive.
+        """
+        top = self.get_max_block_index()
+        if top is None or depth < 0:
+            return 0
+
+        archived = 0
+        while True:
+            with _lock, get_connection() as conn:
+                rows = conn.execute("""
+                    SELECT block_index, transaction_data, transaction_blob
                     FROM block_transactions
-                    WHERE block_index = ?
-                    ORDER BY position ASC
-                """, (block_dict["index_number"],))
-                
-                transactions = []
-                for tx_row in tx_cursor.fetchall():
-                    transactions.append(json.loads(tx_row[0]))
-                
-                blocks.append({
-                    "index": block_dict["index_number"],
-                    "timestamp": block_dict["timestamp"],
-                    "previous_hash": block_dict["previous_hash"],
-                    "nonce": block_dict["nonce"],
-                    "hash": block_dict["hash"],
-                    "transactions": transactions
-                })
-            
-            return blocks
-    except Exception as e:
-        print(f"❌ Error loading blocks: {e}")
-        return []
+                    WHERE block_index IN (
+                        SELECT DISTINCT block_index FROM block_transactions
+                        WHERE block_index <= ?
+                        ORDER BY block_index ASC
+                        LIMIT ?
+                    )
+                    ORDER BY block_index ASC, position ASC
+                """, (top - depth, batch_size)).fetchall()
+                if not rows:
+                    break
+
+                bodies = {}
+                for block_index, data, blob in rows:
+                    if blob is not None:
+                        data = json.dumps(decode_transaction(blob), ensure_ascii=False)
+                    bodies.setdefault(block_index, []).append(data)
+
+                # Ghi segment (fsync) trước, rồi mới xoá khỏi SQLite trong một commit:
+                # crash giữa chừng chỉ để lại byte thừa cuối segment, không mất block
+                locations = self.archive.append([encode_body(txs) for txs in bodies.values()])
+                conn.executemany("""
+                    INSERT OR REPLACE INTO block_archive (block_index, segment, offset, length, codec)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(index, *location) for index, location in zip(bodies, locations)])
+                conn.executemany("DELETE FROM block_transactions WHERE block_index = ?",
+                                 [(index,) for index in bodies])
+                conn.commit()
+            archived += len(bodies)
+
+        if archived:
+            logger.info("📦 Archived %s block bodies (tip #%s, depth %s)", archived, top, depth)
+        return archived
+
+    def find_transaction_location(self, tx_id):
+        row = fetch_one("SELECT block_index, position FROM tx_index WHERE tx_id = ?", (tx_id,))
+        return (row["block_index"], row["position"]) if row else None
+
+    def get_block_count(self):
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT COUNT(*) FROM blocks")
+            return cursor.fetchone()[0]
+
+    def delete_all_blocks(self):
+        with _lock, get_connection() as conn:
+            conn.execute("DELETE FROM block_transactions")
+            conn.execute("DELETE FROM block_archive")
+            conn.execute("DELETE FROM tx_index")
+            conn.execute("DELETE FROM blocks")
+            conn.commit()
+            self.archive.clear()
+            if self.block_store is not None:
+                self.block_store.clear()
+
+    # ------------------ Metadata ------------------ #
+
+    def get_metadata(self, key, default=None):
+        row = fetch_one("SELECT value FROM blockchain_metadata WHERE key = ?", (key,))
+        if row:
+            return row["value"]
+        return default
+
+    def set_metadata(self, key, value):
+        with _lock, get_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO blockchain_metadata (key, value)
+                VALUES (?, ?)
+            """, (key, str(value)))
+            conn.commit()
+
+
+# ============= BLOCKCHAIN DATABASE FUNCTIONS ============= #
+# Các hàm module-level giữ nguyên API cũ, chuyển tiếp sang storage backend hiện tại
+
+def save_block(block_dict):
+    """Lưu block vào database"""
+    return get_storage().save_block(block_dict)
+
+
+def load_all_blocks():
+    """Load tất cả blocks từ database"""
+    return get_storage().load_all_blocks()
+
+
+def insert_block(block_dict):
+    """Thêm block mới, không ghi đè block đã có (sqlite3.IntegrityError)"""
+    return get_storage().insert_block(block_dict)
+
+
+def get_max_block_index():
+    """Index của block cao nhất trong storage (None nếu chưa có)"""
+    return get_storage().get_max_block_index()
+
+
+def since(height, limit=500):
+    """Các block mới có index > height (tối đa `limit`), dùng để tail chain"""
+    return get_storage().load_blocks_since(height, limit)
+
+
+def load_block_range(start, stop):
+    """Các block có start <= index < stop"""
+    return get_storage().load_block_range(start, stop)
+
+
+def iter_blocks(start=0, chunk_size=500):
+    """Đọc block theo chunk (không load cả chain vào RAM)"""
+    return get_storage().iter_blocks(start, chunk_size)
+
+
+def iter_block_headers(start=0):
+    """Header block theo chunk (không đọc transactions) - dựng chain lúc khởi động"""
+    return get_storage().iter_block_headers(start)
+
+
+def archive_blocks(depth):
+    """Chuyển body block sâu hơn `depth` sang archive nén (core/archive.py)"""
+    return get_storage().archive_blocks(depth)
+
+
+def sync_block_store():
+    """Đối chiếu block store mmap với SQLite - chỉ chain writer gọi"""
+    return get_storage().sync_block_store()
 
 
 def get_blockchain_metadata(key, default=None):
     """Lấy metadata của blockchain"""
-    row = fetch_one("SELECT value FROM blockchain_metadata WHERE key = ?", (key,))
-    if row:
-        return row["value"]
-    return default
+    return get_storage().get_metadata(key, default)
 
 
 def set_blockchain_metadata(key, value):
     """Set metadata của blockchain"""
-    with _lock, get_connection() as conn:
-        conn.execute("""
-            INSERT OR REPLACE INTO blockchain_metadata (key, value)
-            VALUES (?, ?)
-        """, (key, str(value)))
-        conn.commit()
+    get_storage().set_metadata(key, value)
 
 
 def delete_all_blocks():
     """Xóa tất cả blocks (for testing/reset)"""
-    with _lock, get_connection() as conn:
-        conn.execute("DELETE FROM block_transactions")
-        conn.execute("DELETE FROM blocks")
-        conn.commit()
+    get_storage().delete_all_blocks()
 
 
 def get_block_count():
     """Đếm số lượng blocks"""
-    with get_connection() as conn:
-        cursor = conn.execute("SELECT COUNT(*) FROM blocks")
-        return cursor.fetchone()[0]
+    return get_storage().get_block_count()
 
 
 def get_latest_block():
     """Lấy block mới nhất"""
-    row = fetch_one("""
-        SELECT index_number, timestamp, previous_hash, nonce, hash
-        FROM blocks
-        ORDER BY index_number DESC
-        LIMIT 1
-    """)
-    
-    if not row:
-        return None
-    
-    block_dict = dict(row)
-    
-    # Load transactions
-    with get_connection() as conn:
-        cursor = conn.execute("""
-            SELECT transaction_data
-            FROM block_transactions
-            WHERE block_index = ?
-            ORDER BY position ASC
-        """, (block_dict["index_number"],))
-        
-        transactions = []
-        for tx_row in cursor.fetchall():
-            transactions.append(json.loads(tx_row[0]))
-    
-    return {
-        "index": block_dict["index_number"],
-        "timestamp": block_dict["timestamp"],
-        "previous_hash": block_dict["previous_hash"],
-        "nonce": block_dict["nonce"],
-        "hash": block_dict["hash"],
-        "transactions": transactions
-    }
+    return get_storage().get_latest_block()
+
 
+def find_transaction_location(tx_id):
+    """(block_index, position) của giao dịch trong chain (qua tx_index)"""
+    return get_storage().find_transaction_location(tx_id)
 
-def migrate_blockchain_from_json():
+
+def migrate_blockchain_from_json(storage=None):
     """Migration: Chuyển blockchain từ JSON sang SQLite"""
-    import os
     json_file = "data/blockchain.json"
     
     if not os.path.exists(json_file):
-        print("ℹ️  No JSON blockchain file found. Skipping migration.")
+        logger.info("ℹ️  No JSON blockchain file found. Skipping migration.")
         return
     
     try:
@@ -323,55 +1263,41 @@ def migrate_blockchain_from_json():
         
         blocks = data.get("chain", [])
         if not blocks:
-            print("ℹ️  No blocks to migrate")
+            logger.info("ℹ️  No blocks to migrate")
             return
         
-        print(f"🔄 Migrating {len(blocks)} blocks from JSON to SQLite...")
+        logger.info("🔄 Migrating %s blocks from JSON to SQLite...", len(blocks))
         
+        storage = storage or get_storage()
         for block in blocks:
-            save_block(block)
+            storage.save_block(block)
         
         # Save metadata
         if "difficulty" in data:
-            set_blockchain_metadata("difficulty", data["difficulty"])
+            storage.set_metadata("difficulty", data["difficulty"])
         if "mining_reward" in data:
-            set_blockchain_metadata("mining_reward", data["mining_reward"])
+            storage.set_metadata("mining_reward", data["mining_reward"])
         
-        print(f"✅ Migrated {len(blocks)} blocks successfully!")
+        logger.info("✅ Migrated %s blocks successfully!", len(blocks))
         
         # Backup and remove old file
         backup_file = json_file + ".backup"
         os.rename(json_file, backup_file)
-        print(f"📦 Old JSON file backed up to: {backup_file}")
+        logger.info("📦 Old JSON file backed up to: %s", backup_file)
         
     except Exception as e:
-        print(f"❌ Migration error: {e}")
+        logger.error("❌ Migration error: %s", e)
         import traceback
         traceback.print_exc()
 
 
 def get_db_stats():
     """Lấy thống kê database tổng quan"""
-    with get_connection() as conn:
-        wallet_count = conn.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
-        tx_count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
-        tx_verified = conn.execute("SELECT COUNT(*) FROM transactions WHERE status = 'verified'").fetchone()[0]
-        tx_pending = conn.execute("SELECT COUNT(*) FROM transactions WHERE status IN ('pending', 'signed')").fetchone()[0]
-        block_count = conn.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
-        
-        return {
-            "total_wallets": wallet_count,
-            "total_transactions": tx_count,
-            "verified_transactions": tx_verified,
-            "pending_transactions": tx_pending,
-            "total_blocks": block_count
-        }
-
-
-# Tự động khởi tạo và migrate khi module được import
-init_db()
-migrate_add_nonce()
-
-# Auto-migrate từ JSON nếu có
-if get_block_count() == 0:
-    migrate_blockchain_from_json()
\ No newline at end of file
+    storage = get_storage()
+    return {
+        "total_wallets": storage.count_wallets(),
+        "total_transactions": storage.count_transactions(),
+        "verified_transactions": storage.count_transactions(("verified",)),
+        "pending_transactions": storage.count_transactions(("pending", "signed")),
+        "total_blocks": storage.get_block_count()
+    }
@@ -1,6 +1,13 @@
+import logging
 from datetime import datetime, timedelta
 from core.transaction import get_pending_transactions, get_transactions_by_wallet
+from core.records import as_record
+from core.log import get_logger
+from core.instrumentation import timed
 
+logger = get_logger(__name__)
+
+@timed("fraud_check_seconds", check="double_spending")
 def check_double_spending(transaction):
     """
     ✅ Kiểm tra chi tiêu kép với nonce
@@ -8,46 +15,46 @@ def check_double_spending(transaction):
     Nếu không có nonce → check theo thời gian (legacy)
     """
     try:
-        current_tx = transaction
-        current_from = current_tx.get("sender") or current_tx.get("from")
-        current_nonce = current_tx.get("nonce")
+        current_tx = as_record(transaction)
+        current_from = current_tx.sender
+        current_nonce = current_tx.nonce
         
         # Nếu có nonce → check nonce trùng
         if current_nonce is not None:
             pending_txs = get_pending_transactions(current_from)
             
             for tx in pending_txs:
-                if tx["id"] == current_tx["id"]:
+                if tx.id == current_tx.id:
                     continue
                 
                 # Kiểm tra nonce trùng
-                if tx.get("nonce") == current_nonce:
+                if tx.nonce == current_nonce:
                     return False, f"⚠️ Double spending detected: Duplicate nonce {current_nonce}"
             
             return True, "✅ No double spending (nonce unique)"
         
         # Legacy check (không có nonce)
-        current_amount = current_tx["amount"]
-        current_id = current_tx["id"]
+        current_amount = current_tx.amount
+        current_id = current_tx.id
         
         pending_txs = get_pending_transactions(current_from)
         
         for tx in pending_txs:
-            if tx["id"] == current_id:
+            if tx.id == current_id:
                 continue
             
             # Kiểm tra cùng người gửi, cùng số tiền
-            if tx["amount"] == current_amount:
+            if tx.amount == current_amount:
                 try:
-                    tx_time = datetime.fromisoformat(tx["timestamp"])
-                    current_time = datetime.fromisoformat(current_tx["timestamp"])
+                    tx_time = datetime.fromisoformat(tx.timestamp)
+                    current_time = datetime.fromisoformat(current_tx.timestamp)
                     
                     time_diff = abs((current_time - tx_time).total_seconds())
                     
                     if time_diff < 120:  # 2 phút
-                        return False, f"⚠️ Phát hiện double spending: Giao dịch tương tự {tx['id'][:8]}... ({time_diff:.0f}s trước)"
+                        return False, f"⚠️ Phát hiện double spending: Giao dịch tương tự {tx.id[:8]}... ({time_diff:.0f}s trước)"
                 except Exception as e:
-                    print(f"Lỗi parse timestamp: {e}")
+                    logger.warning("Lỗi parse timestamp: %s", e)
                     continue
         
         return True, "✅ Không phát hiện double spending"
@@ -56,32 +63,34 @@ def check_double_spending(transaction):
         return False, f"Lỗi kiểm tra double spending: {str(e)}"
 
 
+@timed("fraud_check_seconds", check="replay_attack")
 def check_replay_attack(transaction):
     """
     ✅ Kiểm tra tấn công phát lại với nonce
     """
     try:
-        tx_nonce = transaction.get("nonce")
+        transaction = as_record(transaction)
+        tx_nonce = transaction.nonce
         
         # Nếu có nonce → check nonce đã dùng chưa
         if tx_nonce is not None:
-            from_user = transaction.get("sender") or transaction.get("from")
+            from_user = transaction.sender
             
             # Lấy tất cả transactions của user
             all_txs = get_transactions_by_wallet(from_user, limit=1000)
             
             for tx in all_txs:
-                if tx["id"] == transaction["id"]:
+                if tx.id == transaction.id:
                     continue
                 
                 # Nếu nonce đã được dùng trong transaction verified
-                if tx.get("nonce") == tx_nonce and tx.get("status") == "verified":
+                if tx.nonce == tx_nonce and tx.status == "verified":
                     return False, f"⚠️ Replay attack: Nonce {tx_nonce} đã được sử dụng"
             
             return True, "✅ Không phát hiện replay (nonce chưa dùng)"
         
         # Legacy check (timestamp)
-        tx_time = datetime.fromisoformat(transaction["timestamp"])
+        tx_time = datetime.fromisoformat(transaction.timestamp)
         current_time = datetime.now()
         time_diff = (current_time - tx_time).total_seconds()
         
@@ -92,17 +101,16 @@ def check_replay_attack(transaction):
             return False, "⚠️ Giao dịch có timestamp trong tương lai"
         
         # Check transaction ID có bị replay không
-        from_user = transaction.get("sender") or transaction.get("from")
-        all_txs = get_transactions_by_wallet(from_user, limit=100)
+        all_txs = get_transactions_by_wallet(transaction.sender, limit=100)
         
         count = 0
         for tx in all_txs:
-            if (tx["id"] == transaction["id"] and 
-                tx.get("status") in ["verified", "signed"]):
+            if (tx.id == transaction.id and 
+                tx.status in ["verified", "signed"]):
                 count += 1
         
         if count >= 1:
-            return False, f"⚠️ Transaction ID {transaction['id'][:8]}... bị replay"
+            return False, f"⚠️ Transaction ID {transaction.id[:8]}... bị replay"
         
         return True, "✅ Không phát hiện replay attack"
         
@@ -110,12 +118,13 @@ def check_replay_attack(transaction):
         return False, f"Lỗi kiểm tra replay attack: {str(e)}"
 
 
+@timed("fraud_check_seconds", check="expiry")
 def check_transaction_expiry(transaction):
     """
     ✅ Kiểm tra transaction có hết hạn không
     """
     try:
-        expires_at = transaction.get("expires_at")
+        expires_at = as_record(transaction).expires_at
         if not expires_at:
             return True, "No expiry set"
         
@@ -130,10 +139,11 @@ def check_transaction_expiry(transaction):
         return False, f"Lỗi kiểm tra expiry: {str(e)}"
 
 
+@timed("fraud_check_seconds", check="signature_tampering")
 def check_signature_tampering(transaction):
     """Kiểm tra chữ ký có bị thay đổi không"""
     try:
-        signature = transaction.get("signature", "")
+        signature = as_record(transaction).signature or ""
         
         if not signature:
             return False, "⚠️ Giao dịch không có chữ ký"
@@ -154,10 +164,11 @@ def check_signature_tampering(transaction):
         return False, f"Lỗi kiểm tra signature tampering: {str(e)}"
 
 
+@timed("fraud_check_seconds", check="amount_manipulation")
 def check_amount_manipulation(transaction):
     """Kiểm tra số tiền có bị thao túng không - FIXED for float/int"""
     try:
-        amount = transaction.get("amount", 0)
+        amount = as_record(transaction).amount
         
         if amount <= 0:
             return False, "⚠️ Số tiền phải lớn hơn 0"
@@ -175,12 +186,14 @@ def check_amount_manipulation(transaction):
         return False, f"Lỗi kiểm tra amount manipulation: {str(e)}"
 
 
+@timed("verification_stage_seconds", stage="fraud")
 def check_fraud(transaction):
     """
     Tổng hợp kiểm tra gian lận
     """
     try:
-        print(f"🔒 Kiểm tra bảo mật cho giao dịch {transaction['id'][:8]}...")
+        transaction = as_record(transaction)
+        logger.debug("🔒 Kiểm tra bảo mật cho giao dịch %s...", transaction.id[:8])
         
         fraud_results = []
         
@@ -214,11 +227,11 @@ def check_fraud(transaction):
         if not am_check:
             return False, f"❌ {am_msg}"
         
-        # In kết quả
-        print("📊 Kết quả kiểm tra:")
-        for check_name, passed, msg in fraud_results:
-            status = "✅" if passed else "❌"
-            print(f"  {status} {check_name}: {msg}")
+        # Log kết quả
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 Kết quả kiểm tra:")
+            for check_name, passed, msg in fraud_results:
+                logger.debug("  %s %s: %s", "✅" if passed else "❌", check_name, msg)
         
         return True, "✅ Tất cả kiểm tra bảo mật đều PASS"
         
@@ -226,6 +239,61 @@ def check_fraud(transaction):
         return False, f"Lỗi kiểm tra fraud: {str(e)}"
 
 
+@timed("fraud_batch_seconds")
+def check_fraud_batch(transactions):
+    """
+    Kiểm tra gian lận cho nhiều giao dịch (batch API).
+    Double spending / replay chỉ đọc DB một lần cho mỗi người gửi thay vì
+    mỗi giao dịch; các check còn lại giống check_fraud().
+    Trả về list (passed, message) cùng thứ tự với transactions.
+    """
+    transactions = [as_record(tx) for tx in transactions]
+    pending_nonces = {}
+    verified_nonces = {}
+    for sender in {tx.sender for tx in transactions if tx.nonce is not None}:
+        pending_nonces[sender] = {(tx.id, tx.nonce) for tx in get_pending_transactions(sender)}
+        verified_nonces[sender] = {
+            (tx.id, tx.nonce) for tx in get_transactions_by_wallet(sender, limit=1000)
+            if tx.status == "verified"
+        }
+
+    results = []
+    batch_nonces = set()
+    for transaction in transactions:
+        if transaction.nonce is None:
+            # Legacy (không có nonce) -> check đầy đủ từng giao dịch
+            results.append(check_fraud(transaction))
+            continue
+
+        key = (transaction.sender, transaction.nonce)
+        if key in batch_nonces or any(
+            tx_id != transaction.id and nonce == transaction.nonce
+            for tx_id, nonce in pending_nonces[transaction.sender]
+        ):
+            results.append((False, f"❌ ⚠️ Double spending detected: Duplicate nonce {transaction.nonce}"))
+            continue
+        batch_nonces.add(key)
+
+        if any(
+            tx_id != transaction.id and nonce == transaction.nonce
+            for tx_id, nonce in verified_nonces[transaction.sender]
+        ):
+            results.append((False, f"❌ ⚠️ Replay attack: Nonce {transaction.nonce} đã được sử dụng"))
+            continue
+
+        for check in (check_transaction_expiry, check_signature_tampering, check_amount_manipulation):
+            passed, msg = check(transaction)
+            if not passed:
+                results.append((False, f"❌ {msg}"))
+                break
+        else:
+            results.append((True, "✅ Tất cả kiểm tra bảo mật đều PASS"))
+
+    passed_count = sum(1 for passed, _ in results if passed)
+    logger.info("🔒 Kiểm tra bảo mật batch: %d/%d PASS", passed_count, len(results))
+    return results
+
+
 def get_fraud_statistics():
     """Thống kê các loại tấn công đã phát hiện"""
     try:
@@ -0,0 +1,292 @@
+"""
+Instrumentation - counter, timer và histogram latency cho các đường nóng
+(verification, ký, KDF, DB, mining).
+
+- inc(name, amount=1, **labels)        counter
+- observe(name, seconds, **labels)     ghi một latency vào histogram
+- with timer(name, **labels): ...      đo một đoạn code
+- @timed(name, **labels)               đo cả hàm (cả coroutine function)
+- render_prometheus()                  text format cho route /metrics
+- summary()                            p50/p95/p99 cho CLI
+
+Histogram kiểu HDR: bucket log-linear (16 bucket con mỗi lũy thừa 2, đơn vị
+micro giây) -> sai số tương đối <= ~6% ở mọi dải giá trị, bộ nhớ cố định
+theo số bucket đã dùng.
+
+Tắt bằng ECDSA_METRICS=0 hoặc disable(): timer() trả về context manager
+rỗng dùng chung, @timed gọi thẳng hàm gốc, inc/observe return ngay.
+"""
+import os
+import time
+import inspect
+import threading
+from functools import wraps
+
+_enabled = os.environ.get("ECDSA_METRICS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+_SUB_BUCKETS = 16
+_LINEAR_LIMIT = 2 * _SUB_BUCKETS
+
+_registry_lock = threading.Lock()
+_counters = {}    # (name, labels) -> Counter
+_histograms = {}  # (name, labels) -> Histogram
+
+NAMESPACE = "ecdsa"
+
+
+def _bucket_index(value):
+    """value (int, micro giây) -> index bucket log-linear"""
+    if value < _LINEAR_LIMIT:
+        return value
+    shift = value.bit_length() - 5
+    return _LINEAR_LIMIT + (shift - 1) * _SUB_BUCKETS + ((value >> shift) - _SUB_BUCKETS)
+
+
+def _bucket_bounds(index):
+    """Khoảng [lower, upper] (micro giây) của một bucket"""
+    if index < _LINEAR_LIMIT:
+        return index, index
+    shift = (index - _LINEAR_LIMIT) // _SUB_BUCKETS + 1
+    mantissa = (index - _LINEAR_LIMIT) % _SUB_BUCKETS + _SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Counter:
+    """Counter tăng dần, thread-safe"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Histogram latency kiểu HDR (giá trị tính bằng giây), thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = _bucket_index(max(int(seconds * 1e6), 0))
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+
+    def percentile(self, p):
+        """Giá trị (giây) tại percentile p (0-100)"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = max(self.count * p / 100, 1)
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= target:
+                    lower, upper = _bucket_bounds(index)
+                    value = (lower + upper) / 2 / 1e6
+                    return min(max(value, self.min), self.max)
+            return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _get(store, cls, key):
+    metric = store.get(key)
+    if metric is None:
+        with _registry_lock:
+            metric = store.get(key)
+            if metric is None:
+                metric = store[key] = cls()
+    return metric
+
+
+def histogram(name, **labels):
+    """Lấy (hoặc tạo) histogram trong registry"""
+    return _get(_histograms, Histogram, _key(name, labels))
+
+
+# ------------------ API ghi số liệu ------------------ #
+
+def inc(name, amount=1, **labels):
+    if _enabled:
+        _get(_counters, Counter, _key(name, labels)).inc(amount)
+
+
+def observe(name, seconds, **labels):
+    if _enabled:
+        _get(_histograms, Histogram, _key(name, labels)).record(seconds)
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram_):
+        self._histogram = histogram_
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.record(time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    """Context manager đo thời gian chạy của một đoạn code"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(_get(_histograms, Histogram, _key(name, labels)))
+
+
+def timed(name, **labels):
+    """Decorator đo thời gian chạy của hàm"""
+    key = _key(name, labels)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            # Đo tới khi coroutine xong (gồm thời gian chờ executor), không phải lúc tạo coroutine
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _get(_histograms, Histogram, key).record(time.perf_counter() - start)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _get(_histograms, Histogram, key).record(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# ------------------ Bật / tắt ------------------ #
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Xóa toàn bộ số liệu (dùng giữa các lần benchmark)"""
+    with _registry_lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# ------------------ Xuất số liệu ------------------ #
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    pairs = []
+    for key, value in items:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def summary():
+    """Snapshot dạng dict: counters + histogram (ms) theo tên + labels"""
+    with _registry_lock:
+        counters = dict(_counters)
+        histograms = dict(_histograms)
+    return {
+        "counters": {
+            name + _format_labels(labels): counter.value
+            for (name, labels), counter in sorted(counters.items())
+        },
+        "histograms": {
+            name + _format_labels(labels): hist.summary()
+            for (name, labels), hist in sorted(histograms.items())
+        },
+    }
+
+
+def render_prometheus():
+    """Toàn bộ registry theo Prometheus text exposition format (0.0.4)"""
+    with _registry_lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items())
+
+    lines = []
+    declared = set()
+    for (name, labels), counter in counters:
+        metric = f"{NAMESPACE}_{name}"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_format_labels(labels)} {counter.value}")
+
+    for (name, labels), hist in histograms:
+        metric = f"{NAMESPACE}_{name}"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} summary")
+        for quantile in (0.5, 0.95, 0.99):
+            value = hist.percentile(quantile * 100)
+            lines.append(f"{metric}{_format_labels(labels, [('quantile', quantile)])} {value:.6f}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {hist.total:.6f}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {hist.count}")
+
+    return "\n".join(lines) + "\n"
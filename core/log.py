@@ -0,0 +1,138 @@
+"""
+Logging cho core / blockchain - thay cho print() trên đường xử lý giao dịch.
+
+Mỗi module dùng logger riêng: logger = get_logger(__name__) (nhánh "ecdsa.*").
+Dùng format lười: logger.info("... %s", value) - message chỉ được dựng khi
+level đó thực sự được ghi.
+
+Cấu hình bằng biến môi trường (hoặc gọi configure()):
+- ECDSA_LOG_LEVEL=DEBUG|INFO|WARNING|ERROR   (mặc định INFO)
+- ECDSA_LOG_SILENT=1                          tắt hết log (benchmark)
+- ECDSA_LOG_CONSOLE=0                         không in ra stdout
+- ECDSA_LOG_JSON=data/logs/app.jsonl          ghi thêm JSON lines vào file,
+  qua QueueHandler + QueueListener nên thread xử lý không chờ disk I/O
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT_LOGGER = "ecdsa"
+
+_lock = threading.Lock()
+_configured = False
+_listener = None
+
+# Thuộc tính có sẵn của LogRecord - phần còn lại là extra={...} của người gọi
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class JsonFormatter(logging.Formatter):
+    """Một dòng JSON cho mỗi log record (kèm các field extra)"""
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class Amount:
+    """Số tiền định dạng 1,000,000 - chỉ format khi log record được ghi"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return f"{self.value:,}"
+
+
+def shutdown():
+    """Dừng QueueListener (flush hết log JSON còn trong queue)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def configure(level=None, silent=None, json_file=None, console=None):
+    """(Re)cấu hình logger gốc "ecdsa"; tham số None -> lấy từ biến môi trường"""
+    global _configured
+    with _lock:
+        shutdown()
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.propagate = False
+        _configured = True
+
+        if silent is None:
+            silent = _env_flag("ECDSA_LOG_SILENT")
+        if silent:
+            root.setLevel(logging.CRITICAL + 1)
+            root.addHandler(logging.NullHandler())
+            return root
+
+        root.setLevel((level or os.environ.get("ECDSA_LOG_LEVEL", "INFO")).upper())
+
+        if console is None:
+            console = _env_flag("ECDSA_LOG_CONSOLE", True)
+        if console:
+            stream = logging.StreamHandler(sys.stdout)
+            stream.setFormatter(logging.Formatter("%(message)s"))
+            root.addHandler(stream)
+
+        json_file = json_file or os.environ.get("ECDSA_LOG_JSON")
+        if json_file:
+            global _listener
+            directory = os.path.dirname(json_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_handler = logging.FileHandler(json_file, encoding="utf-8")
+            file_handler.setFormatter(JsonFormatter())
+            log_queue = queue.SimpleQueue()
+            root.addHandler(QueueHandler(log_queue))
+            _listener = QueueListener(log_queue, file_handler)
+            _listener.start()
+
+        if not root.handlers:
+            root.addHandler(logging.NullHandler())
+        return root
+
+
+def set_silent(silent=True):
+    """Bật / tắt chế độ im lặng (benchmark, mass test)"""
+    return configure(silent=silent)
+
+
+def get_logger(name):
+    """Logger cho một module, vd. get_logger(__name__) -> "ecdsa.core.verification" """
+    if not _configured:
+        configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+atexit.register(shutdown)
@@ -0,0 +1,381 @@
+"""
+In-memory storage engine - bảng dict/list trong RAM.
+
+Cùng ngữ nghĩa với SQLiteStorage nhưng không có disk I/O,
+dùng để benchmark / chạy mô phỏng lớn và tách chi phí thuật toán khỏi I/O.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from core.storage import (
+    StorageBackend,
+    TX_COLUMNS,
+    WALLET_COLUMNS,
+    DEFAULT_METADATA,
+    PENDING_STATUSES,
+    pending_limit_error,
+    reservation_deadline,
+    block_header,
+)
+from core.records import as_record
+
+
+class MemoryStorage(StorageBackend):
+    """Storage engine thuần Python, dữ liệu mất khi process kết thúc"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._wallets = {}            # name -> row
+        self._wallet_by_address = {}  # address -> name
+        self._transactions = {}       # id -> TransactionRecord (bất biến, không cần copy)
+        self._tx_by_sender = {}       # sender -> [id]
+        self._tx_by_receiver = {}     # receiver -> [id]
+        self._unanchored = {}         # id -> None, theo thứ tự insert; bỏ ra khi vào block
+        self._pending = {}            # id -> None: pending / signed chưa execute (sweeper chỉ quét ở đây)
+        self._blocks = []             # index -> block dict
+        self._block_headers = []      # index -> block_header() của block đó
+        self._tx_locations = {}       # tx id -> (block index, position)
+        self._metadata = dict(DEFAULT_METADATA)
+        self._nonce_reservations = {}  # wallet name -> reserved_until (ISO)
+
+    # ------------------ Wallets ------------------ #
+
+    def insert_wallet(self, wallet):
+        with self._lock:
+            name = wallet["name"]
+            address = wallet.get("address")
+            if name in self._wallets:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: wallets.name")
+            if address is not None and address in self._wallet_by_address:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: wallets.address")
+
+            row = {col: wallet.get(col) for col in WALLET_COLUMNS}
+            if row["balance"] is None:
+                row["balance"] = 0
+            if row["nonce"] is None:
+                row["nonce"] = 0
+            self._wallets[name] = row
+            if address is not None:
+                self._wallet_by_address[address] = name
+
+    def get_wallet(self, name):
+        with self._lock:
+            row = self._wallets.get(name)
+            return dict(row) if row else None
+
+    def get_wallet_by_address(self, address):
+        with self._lock:
+            name = self._wallet_by_address.get(address)
+            return self.get_wallet(name) if name is not None else None
+
+    def list_wallets(self):
+        with self._lock:
+            return [dict(row) for row in self._wallets.values()]
+
+    def update_wallet(self, name, **fields):
+        unknown = set(fields) - set(WALLET_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cột không hợp lệ: {', '.join(sorted(unknown))}")
+        with self._lock:
+            row = self._wallets.get(name)
+            if row:
+                row.update(fields)
+
+    def increment_nonce(self, name, count=1):
+        with self._lock:
+            row = self._wallets.get(name)
+            if row:
+                row["nonce"] = (row["nonce"] or 0) + count
+
+    def _check_pending(self, name, max_pending):
+        if max_pending and sum(
+            1 for tx_id in self._tx_by_sender.get(name, ())
+            if self._transactions[tx_id].status in PENDING_STATUSES
+            and not self._transactions[tx_id].executed
+        ) >= max_pending:
+            raise pending_limit_error(name, max_pending)
+
+    def reserve_nonces(self, name, count=1):
+        with self._lock:
+            row = self._wallets.get(name)
+            if not row:
+                return None
+            first = row["nonce"] or 0
+            row["nonce"] = first + count
+            self._nonce_reservations[name] = reservation_deadline()
+            return first
+
+    def count_wallets(self):
+        with self._lock:
+            return len(self._wallets)
+
+    # ------------------ Transactions ------------------ #
+
+    def _put_transaction(self, tx):
+        """Ghi record + cập nhật index giao dịch chờ (mọi thay đổi giao dịch đi qua đây)"""
+        self._transactions[tx.id] = tx
+        if tx.status in PENDING_STATUSES and not tx.executed:
+            self._pending[tx.id] = None
+        else:
+            self._pending.pop(tx.id, None)
+
+    def insert_transaction(self, tx):
+        with self._lock:
+            tx = as_record(tx)
+            if tx.id in self._transactions:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: transactions.id")
+
+            if tx.executed is None:
+                tx = tx.replace(executed=0)
+            self._put_transaction(tx)
+            self._unanchored[tx.id] = None
+            self._tx_by_sender.setdefault(tx.sender, []).append(tx.id)
+            self._tx_by_receiver.setdefault(tx.receiver, []).append(tx.id)
+
+    def insert_transaction_with_nonce(self, name, build, max_pending=0):
+        with self._lock:
+            self._check_pending(name, max_pending)
+            row = self._wallets.get(name)
+            nonce = None
+            if row:
+                nonce = row["nonce"] or 0
+                row["nonce"] = nonce + 1
+            try:
+                transaction = build(nonce or 0)
+                self.insert_transaction(transaction)
+            except Exception:
+                if row:
+                    row["nonce"] = nonce
+                raise
+            return transaction
+
+    def insert_transactions(self, txs):
+        with self._lock:
+            txs = [as_record(tx) for tx in txs]
+            ids = [tx.id for tx in txs]
+            if len(set(ids)) != len(ids) or any(i in self._transactions for i in ids):
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: transactions.id")
+            for tx in txs:
+                self.insert_transaction(tx)
+
+    def get_transaction(self, tx_id):
+        with self._lock:
+            return self._transactions.get(tx_id)
+
+    def update_transaction(self, tx_id, **fields):
+        unknown = set(fields) - set(TX_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cột không hợp lệ: {', '.join(sorted(unknown))}")
+        with self._lock:
+            tx = self._transactions.get(tx_id)
+            if tx:
+                self._put_transaction(tx.replace(**fields))
+
+    def list_unanchored_transactions(self, limit=None):
+        with self._lock:
+            rows = []
+            for tx_id in self._unanchored:
+                tx = self._transactions[tx_id]
+                if tx.status == "verified" and tx.executed == 1:
+                    rows.append(tx)
+                    if limit is not None and len(rows) >= limit:
+                        break
+            return rows
+
+    def list_transactions(self, sender=None, party=None, statuses=None,
+                          executed=None, limit=None):
+        with self._lock:
+            if sender is not None:
+                ids = self._tx_by_sender.get(sender, [])
+            elif party is not None:
+                ids = self._tx_by_sender.get(party, []) + [
+                    i for i in self._tx_by_receiver.get(party, [])
+                    if self._transactions[i].sender != party
+                ]
+            else:
+                ids = self._transactions.keys()
+
+            rows = []
+            for tx_id in ids:
+                tx = self._transactions[tx_id]
+                if statuses is not None and tx.status not in statuses:
+                    continue
+                if executed is not None and tx.executed != executed:
+                    continue
+                rows.append(tx)
+
+            rows.sort(key=lambda r: r.timestamp or "", reverse=True)
+            if limit is not None:
+                rows = rows[:limit]
+            return rows
+
+    def expire_transactions(self, now, limit):
+        with self._lock:
+            expired = []
+            for tx_id in self._pending:
+                if len(expired) >= limit:
+                    break
+                tx = self._transactions[tx_id]
+                if tx.expires_at is not None and tx.expires_at < now:
+                    expired.append(tx)
+            for tx in expired:
+                self._put_transaction(tx.replace(status="expired"))
+            return [(tx.id, tx.sender) for tx in expired]
+
+    def rewind_nonces(self, senders, now=None):
+        now = now or datetime.now().isoformat()
+        rewound = 0
+        with self._lock:
+            for sender in senders:
+                row = self._wallets.get(sender)
+                if not row or self._nonce_reservations.get(sender, "") > now:
+                    continue
+                nonces = [
+                    self._transactions[tx_id].nonce for tx_id in self._tx_by_sender.get(sender, [])
+                    if self._transactions[tx_id].status != "expired"
+                    and self._transactions[tx_id].nonce is not None
+                ]
+                target = max(nonces) + 1 if nonces else 0
+                if (row["nonce"] or 0) > target:
+                    row["nonce"] = target
+                    rewound += 1
+        return rewound
+
+    def count_transactions(self, statuses=None):
+        with self._lock:
+            if statuses is None:
+                return len(self._transactions)
+            return sum(1 for r in self._transactions.values() if r.status in statuses)
+
+    def delete_all_transactions(self):
+        with self._lock:
+            self._transactions.clear()
+            self._unanchored.clear()
+            self._pending.clear()
+            self._tx_by_sender.clear()
+            self._tx_by_receiver.clear()
+
+    def execute_transfer(self, tx_id, from_user, to_user, amount):
+        with self._lock:
+            sender = self._wallets.get(from_user)
+            receiver = self._wallets.get(to_user)
+
+            if not sender or not receiver:
+                return False, "Wallet not found", None, None
+
+            sender_balance = sender["balance"]
+            receiver_balance = receiver["balance"]
+
+            if sender_balance < amount:
+                return False, f"Insufficient balance: {sender_balance} < {amount}", sender_balance, receiver_balance
+
+            sender["balance"] = sender_balance - amount
+            receiver["balance"] = receiver["balance"] + amount
+
+            tx = self._transactions.get(tx_id)
+            if tx:
+                self._put_transaction(tx.replace(executed=1, status="verified"))
+
+            return True, "Transaction executed successfully", sender_balance, receiver_balance
+
+    def execute_transfers(self, transfers):
+        with self._lock:
+            results = []
+            for tx_id, from_user, to_user, amount in transfers:
+                success, message, _, _ = self.execute_transfer(tx_id, from_user, to_user, amount)
+                if not success:
+                    tx = self._transactions.get(tx_id)
+                    if tx:
+                        self._put_transaction(tx.replace(status="rejected"))
+                results.append((success, message))
+            return results
+
+    # ------------------ Blocks ------------------ #
+
+    @staticmethod
+    def _copy_block(block_dict):
+        block = dict(block_dict)
+        block["transactions"] = [dict(tx) for tx in block_dict["transactions"]]
+        return block
+
+    def save_block(self, block_dict):
+        with self._lock:
+            index = block_dict["index"]
+            block = self._copy_block(block_dict)
+            if index < len(self._blocks):
+                old = self._blocks[index]
+                for tx in (old["transactions"] if old else []):
+                    if self._tx_locations.get(tx.get("id"), (None,))[0] == index:
+                        del self._tx_locations[tx["id"]]
+                self._blocks[index] = block
+                self._block_headers[index] = block_header(block)
+            else:
+                gap = [None] * (index - len(self._blocks))
+                self._blocks.extend(gap)
+                self._blocks.append(block)
+                self._block_headers.extend(gap)
+                self._block_headers.append(block_header(block))
+            for position, tx in enumerate(block["transactions"]):
+                if tx.get("id"):
+                    self._tx_locations[tx["id"]] = (index, position)
+                    self._unanchored.pop(tx["id"], None)
+            return True
+
+    def insert_block(self, block_dict):
+        with self._lock:
+            index = block_dict["index"]
+            if index < len(self._blocks) and self._blocks[index] is not None:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: blocks.index_number")
+            return self.save_block(block_dict)
+
+    def load_all_blocks(self):
+        with self._lock:
+            return [self._copy_block(b) for b in self._blocks if b is not None]
+
+    def load_block_range(self, start, stop):
+        with self._lock:
+            return [self._copy_block(b) for b in self._blocks[start:stop] if b is not None]
+
+    def load_block_headers(self, start, stop):
+        with self._lock:
+            return [dict(h) for h in self._block_headers[start:stop] if h is not None]
+
+    def get_max_block_index(self):
+        with self._lock:
+            for block in reversed(self._blocks):
+                if block is not None:
+                    return block["index"]
+            return None
+
+    def get_latest_block(self):
+        with self._lock:
+            for block in reversed(self._blocks):
+                if block is not None:
+                    return self._copy_block(block)
+            return None
+
+    def find_transaction_location(self, tx_id):
+        with self._lock:
+            return self._tx_locations.get(tx_id)
+
+    def get_block_count(self):
+        with self._lock:
+            return sum(1 for b in self._blocks if b is not None)
+
+    def delete_all_blocks(self):
+        with self._lock:
+            self._blocks = []
+            self._block_headers = []
+            self._tx_locations = {}
+
+    # ------------------ Metadata ------------------ #
+
+    def get_metadata(self, key, default=None):
+        with self._lock:
+            return self._metadata.get(key, default)
+
+    def set_metadata(self, key, value):
+        with self._lock:
+            self._metadata[key] = str(value)
@@ -0,0 +1,327 @@
+"""
+Verification pipeline - xác thực hàng loạt giao dịch theo từng stage.
+
+    submit() -> [intake] -> [signature] -> [checks] -> [writer]
+                 load +      ECDSA verify   số dư +     execute / reject
+                 format      (process pool) fraud       theo đúng thứ tự
+                 (thread)                   (threads)   submit (1 thread)
+
+- Mỗi stage có queue giới hạn kích thước: stage sau chậm thì put() của stage
+  trước bị chặn, submit() cũng bị chặn (back-pressure) thay vì dồn RAM.
+- Chỉ stage writer ghi DB, áp dụng kết quả theo số thứ tự submit. Stage checks
+  đọc trạng thái trước khi các giao dịch phía trước được ghi, nên nếu từ lúc
+  intake writer đã ghi một giao dịch chạm tới người gửi (gửi / nhận / bị
+  reject), writer đọc lại giao dịch và chạy lại check số dư + fraud trên trạng
+  thái hiện tại -> kết quả giống gọi full_verification_flow() tuần tự.
+- Mỗi stage đo latency vào Histogram riêng của pipeline (stats()) và vào
+  registry chung core.instrumentation (pipeline_stage_seconds, /metrics).
+
+Dùng:
+    with VerificationPipeline() as pipeline:
+        results = pipeline.verify_many(tx_ids)
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from core.crypto import get_crypto_backend, set_crypto_backend
+from core.instrumentation import Histogram, observe, inc
+from core.verification import (
+    load_for_verification,
+    reject_early,
+    prepare_signature_check,
+    signature_failure,
+    check_transaction_state,
+    apply_verification,
+    error_result,
+)
+
+_STOP = object()
+
+
+class _Item:
+    """Một giao dịch đang chạy qua pipeline"""
+
+    __slots__ = ("seq", "tx_id", "future", "submitted", "transaction", "state_version",
+                 "signature_job", "signature_check", "state_check", "result")
+
+    def __init__(self, seq, tx_id, future):
+        self.seq = seq
+        self.tx_id = tx_id
+        self.future = future
+        self.submitted = time.perf_counter()
+        self.transaction = None
+        self.state_version = 0
+        self.signature_job = None
+        self.signature_check = None
+        self.state_check = None
+        self.result = None
+
+
+def _verify_job(public_key, signature, message_hash):
+    """Chạy trong worker process: chỉ phép toán ECDSA"""
+    return get_crypto_backend().verify(public_key, signature, message_hash)
+
+
+class _Stage:
+    """N worker thread đọc từ inbox, xử lý, đẩy sang outbox (blocking put)"""
+
+    def __init__(self, name, handler, workers, inbox, outbox, histogram):
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.histogram = histogram
+        self.downstream_workers = 1
+        self._alive = workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"pipeline-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP:
+                with self._lock:
+                    self._alive -= 1
+                    last = self._alive == 0
+                if last:
+                    for _ in range(self.downstream_workers):
+                        self.outbox.put(_STOP)
+                return
+
+            if item.result is None:
+                started = time.perf_counter()
+                try:
+                    self.handler(item)
+                except Exception as e:
+                    item.result = error_result(item.tx_id, e)
+                elapsed = time.perf_counter() - started
+                self.histogram.record(elapsed)
+                observe("pipeline_stage_seconds", elapsed, stage=self.name)
+
+            self.outbox.put(item)
+
+
+class VerificationPipeline:
+    """
+    Pipeline xác thực nhiều giao dịch song song.
+    - signature_workers: số process verify ECDSA (mặc định = số CPU)
+    - check_workers: số thread kiểm tra số dư / fraud
+    - queue_size: kích thước mỗi queue giữa các stage
+    - use_processes=False: verify chữ ký bằng thread pool (vd. môi trường
+      không fork được, hoặc backend nhả GIL như cryptography)
+    """
+
+    def __init__(self, signature_workers=None, check_workers=4, queue_size=256,
+                 use_processes=True, hash_policy=None):
+        self.signature_workers = signature_workers or os.cpu_count() or 1
+        self.check_workers = check_workers
+        self.queue_size = queue_size
+        self.use_processes = use_processes
+        self.hash_policy = hash_policy
+
+        self.histograms = {
+            name: Histogram()
+            for name in ("intake", "signature", "checks", "writer", "end_to_end")
+        }
+
+        self._intake_q = queue.Queue(queue_size)
+        self._signature_q = queue.Queue(queue_size)
+        self._check_q = queue.Queue(queue_size)
+        self._write_q = queue.Queue(queue_size)
+
+        self._stages = [
+            _Stage("intake", self._intake, 1, self._intake_q, self._signature_q,
+                   self.histograms["intake"]),
+            _Stage("signature", self._signature, self.signature_workers, self._signature_q,
+                   self._check_q, self.histograms["signature"]),
+            _Stage("checks", self._checks, check_workers, self._check_q, self._write_q,
+                   self.histograms["checks"]),
+        ]
+        for stage, downstream in zip(self._stages, (self.signature_workers, check_workers, 1)):
+            stage.downstream_workers = downstream
+
+        self._writer = threading.Thread(target=self._write_loop, name="pipeline-writer", daemon=True)
+        self._pool = None
+        self._seq = 0
+        # Writer: số giao dịch đã ghi + seq cuối cùng chạm tới từng ví
+        self._applied = 0
+        self._last_touch = {}
+        self._submit_lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+    # ------------------ Lifecycle ------------------ #
+
+    def start(self):
+        if self._started:
+            return self
+        if self.use_processes:
+            backend = get_crypto_backend()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.signature_workers,
+                initializer=set_crypto_backend,
+                initargs=(backend.name,)
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.signature_workers)
+        for stage in self._stages:
+            stage.start()
+        self._writer.start()
+        self._started = True
+        return self
+
+    def close(self):
+        """Chờ xử lý hết các giao dịch đã submit rồi dừng các stage"""
+        if not self._started or self._closed:
+            return
+        self._closed = True
+        self._intake_q.put(_STOP)
+        for stage in self._stages:
+            stage.join()
+        self._writer.join()
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ------------------ API ------------------ #
+
+    def submit(self, tx_id, timeout=None):
+        """
+        Đưa giao dịch vào pipeline, trả về Future chứa result dict như
+        full_verification_flow(). Chặn khi intake queue đầy (back-pressure);
+        timeout hết hạn -> queue.Full.
+        """
+        if not self._started or self._closed:
+            raise RuntimeError("Pipeline chưa start hoặc đã đóng")
+        future = Future()
+        with self._submit_lock:
+            # Giữ lock khi put để số thứ tự không bị hở nếu put timeout
+            item = _Item(self._seq, tx_id, future)
+            self._intake_q.put(item, timeout=timeout)
+            self._seq += 1
+        return future
+
+    def verify_many(self, tx_ids):
+        """Xác thực danh sách giao dịch, trả kết quả theo đúng thứ tự"""
+        futures = [self.submit(tx_id) for tx_id in tx_ids]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        """Latency từng stage + độ sâu các queue hiện tại"""
+        return {
+            "stages": {name: hist.summary() for name, hist in self.histograms.items()},
+            "queue_depth": {
+                "intake": self._intake_q.qsize(),
+                "signature": self._signature_q.qsize(),
+                "checks": self._check_q.qsize(),
+                "writer": self._write_q.qsize(),
+            }
+        }
+
+    # ------------------ Stages ------------------ #
+
+    def _intake(self, item):
+        # Đọc trước khi load: giao dịch ghi từ seq này trở đi có thể chưa thấy
+        item.state_version = self._applied
+        transaction, early_result = load_for_verification(item.tx_id)
+        item.transaction = transaction
+        if early_result:
+            item.result = early_result
+            return
+
+        ok, job = prepare_signature_check(transaction, self.hash_policy)
+        if ok:
+            item.signature_job = job
+        else:
+            item.signature_check = (False, job)
+
+    def _signature(self, item):
+        if item.signature_check is not None:
+            return
+        try:
+            valid = self._pool.submit(_verify_job, *item.signature_job).result()
+        except Exception as e:
+            item.signature_check = (False, f"Lỗi xác minh chữ ký: {str(e)}")
+            return
+        if valid:
+            item.signature_check = (True, "Chữ ký hợp lệ")
+        else:
+            item.signature_check = (False, signature_failure(item.transaction))
+
+    def _checks(self, item):
+        item.state_check = check_transaction_state(item.transaction)
+
+    def _is_stale(self, item):
+        """Writer đã ghi giao dịch chạm tới người gửi sau khi item được load"""
+        if item.transaction is None:
+            return False
+        return self._last_touch.get(item.transaction.sender, -1) >= item.state_version
+
+    def _recheck(self, item):
+        """Đọc lại giao dịch + check trạng thái trên writer (giống chạy tuần tự)"""
+        inc("pipeline_rechecks_total")
+        transaction, early_result = load_for_verification(item.tx_id)
+        item.transaction = transaction
+        if early_result:
+            item.result = early_result
+        elif item.result is None:
+            item.state_check = check_transaction_state(transaction)
+
+    def _apply(self, item):
+        started = time.perf_counter()
+        try:
+            if self._is_stale(item):
+                self._recheck(item)
+            if item.result is not None:
+                result = reject_early(item.transaction, item.result)
+            else:
+                result = apply_verification(item.transaction, item.signature_check, item.state_check)
+        except Exception as e:
+            result = error_result(item.tx_id, e)
+        if item.transaction is not None:
+            self._last_touch[item.transaction.sender] = item.seq
+            self._last_touch[item.transaction.receiver] = item.seq
+        self._applied = item.seq + 1
+        now = time.perf_counter()
+        self.histograms["writer"].record(now - started)
+        self.histograms["end_to_end"].record(now - item.submitted)
+        observe("pipeline_stage_seconds", now - started, stage="writer")
+        observe("pipeline_stage_seconds", now - item.submitted, stage="end_to_end")
+        item.future.set_result(result)
+
+    def _write_loop(self):
+        # Kết quả về không theo thứ tự (nhiều worker) -> đệm lại, ghi theo seq
+        pending = {}
+        next_seq = 0
+        while True:
+            item = self._write_q.get()
+            if item is _STOP:
+                break
+            pending[item.seq] = item
+            while next_seq in pending:
+                self._apply(pending.pop(next_seq))
+                next_seq += 1
+
+
+def verify_many(tx_ids, **options):
+    """Tiện ích: xác thực hàng loạt bằng một pipeline tạm"""
+    with VerificationPipeline(**options) as pipeline:
+        return pipeline.verify_many(tx_ids)
@@ -0,0 +1,303 @@
+"""
+Profiling - bật khi cần, không phải sửa code để chèn cProfile.
+
+- @profiled(name)                 bọc một hàm (verification, mining, create_wallets)
+- with Profiler(name): ...        profile một đoạn code, ghi file ngay khi ra
+- enable() / disable() / flush()
+
+Hai loại profiler (chọn một hoặc cả hai):
+- "cprofile": deterministic, ghi <name>.prof (mở bằng pstats / snakeviz)
+- "sample":   một thread lấy mẫu stack (sys._current_frames) theo chu kỳ,
+              ghi <name>.collapsed - định dạng collapsed stacks cho
+              flamegraph.pl / speedscope
+
+Bật bằng ECDSA_PROFILE=1 (cả hai), ECDSA_PROFILE=cprofile hoặc =sample,
+hoặc cờ --profile của main.py / app.py / benchmarks.harness.
+Số liệu của @profiled được gộp theo tên trong suốt một lần chạy và ghi vào
+data/reports/profiles/<run_id>/ khi flush() (tự gọi lúc thoát).
+Khi tắt, @profiled chỉ tốn một phép kiểm tra biến global.
+"""
+import os
+import sys
+import time
+import atexit
+import pstats
+import cProfile
+import threading
+import itertools
+from datetime import datetime
+from functools import wraps
+
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_DIR = os.path.abspath(os.path.join("data", "reports", "profiles"))
+MODES = ("cprofile", "sample")
+DEFAULT_INTERVAL = 0.001
+
+_lock = threading.Lock()
+_local = threading.local()
+_modes = ()
+_interval = DEFAULT_INTERVAL
+_run_id = None
+_aggregates = {}  # name -> _Aggregate
+_sequence = itertools.count(1)
+
+
+def _parse_modes(value):
+    value = (value or "").strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return ()
+    if value in ("1", "true", "yes", "on", "all"):
+        return MODES
+    modes = tuple(mode.strip() for mode in value.split(",") if mode.strip())
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise ValueError(f"Profiler không hợp lệ: {', '.join(unknown)}")
+    return modes
+
+
+# ------------------ Sampling profiler ------------------ #
+
+def _collapse(frame):
+    """Frame -> "module:func;module:func;..." (gốc trước, lá sau)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler:
+    """Một thread lấy mẫu dùng chung cho mọi session đang chạy"""
+
+    def __init__(self):
+        self._sessions = {}  # thread id -> [session]
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def register(self, session):
+        with self._cond:
+            self._sessions.setdefault(session.thread_id, []).append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def unregister(self, session):
+        with self._cond:
+            sessions = self._sessions.get(session.thread_id, [])
+            if session in sessions:
+                sessions.remove(session)
+            if not sessions:
+                self._sessions.pop(session.thread_id, None)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            # Giữ lock khi ghi mẫu: unregister() trả về thì session không còn bị ghi nữa
+            with self._cond:
+                while not self._sessions:
+                    self._cond.wait()
+                frames = sys._current_frames()
+                for thread_id, sessions in self._sessions.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == me:
+                        continue
+                    stack = _collapse(frame)
+                    for session in sessions:
+                        session.stacks[stack] = session.stacks.get(stack, 0) + 1
+                del frames
+            time.sleep(_interval)
+
+
+_sampler = _Sampler()
+
+
+# ------------------ Session / aggregate ------------------ #
+
+class _Session:
+    """Profile một lần gọi trên thread hiện tại"""
+
+    def __init__(self, modes):
+        self.modes = modes
+        self.thread_id = threading.get_ident()
+        self.profile = None
+        self.stacks = {}
+
+    def start(self):
+        _local.active = True
+        if "sample" in self.modes:
+            _sampler.register(self)
+        if "cprofile" in self.modes:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+        if "sample" in self.modes:
+            _sampler.unregister(self)
+        _local.active = False
+
+
+class _Aggregate:
+    """Gộp các session cùng tên trong một lần chạy"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.stats = None
+        self.stacks = {}
+
+    def add(self, session):
+        with self.lock:
+            self.calls += 1
+            if session.profile is not None:
+                if self.stats is None:
+                    self.stats = pstats.Stats(session.profile)
+                else:
+                    self.stats.add(session.profile)
+            for stack, count in session.stacks.items():
+                self.stacks[stack] = self.stacks.get(stack, 0) + count
+
+
+def _write(directory, name, stats, stacks):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    if stats is not None:
+        path = os.path.join(directory, f"{name}.prof")
+        stats.dump_stats(path)
+        paths.append(path)
+    if stacks:
+        path = os.path.join(directory, f"{name}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        paths.append(path)
+    return paths
+
+
+def _new_run_id():
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+
+# ------------------ API ------------------ #
+
+def is_enabled():
+    return bool(_modes)
+
+
+def enable(modes=MODES, interval=DEFAULT_INTERVAL):
+    """Bật profiling cho @profiled (modes: "cprofile", "sample" hoặc cả hai)"""
+    global _modes, _interval, _run_id
+    if isinstance(modes, str):
+        modes = _parse_modes(modes)
+    _modes = tuple(modes)
+    _interval = interval
+    if _run_id is None:
+        _run_id = _new_run_id()
+
+
+def disable():
+    global _modes
+    _modes = ()
+
+
+def run_directory():
+    """Thư mục chứa file profile của lần chạy hiện tại"""
+    return os.path.join(PROFILE_DIR, _run_id or _new_run_id())
+
+
+def profiled(name):
+    """Decorator: profile mỗi lần gọi khi profiling bật, gộp theo `name`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _modes or getattr(_local, "active", False):
+                return fn(*args, **kwargs)
+            session = _Session(_modes)
+            session.start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                session.stop()
+                with _lock:
+                    aggregate = _aggregates.setdefault(name, _Aggregate())
+                aggregate.add(session)
+        return wrapper
+    return decorator
+
+
+class Profiler:
+    """
+    Profile một đoạn code (vd. một API request), ghi file ngay khi stop().
+        with Profiler("request") as p: ...
+        p.paths  -> file đã ghi
+    Nếu thread đang nằm trong một session khác thì không profile lồng.
+    """
+
+    def __init__(self, name, modes=MODES, directory=None):
+        self.name = name
+        self.modes = _parse_modes(modes) if isinstance(modes, str) else tuple(modes)
+        self.directory = directory or os.path.join(PROFILE_DIR, f"{_new_run_id()}_{next(_sequence)}")
+        self.paths = []
+        self._session = None
+
+    def start(self):
+        if self.modes and not getattr(_local, "active", False):
+            self._session = _Session(self.modes)
+            self._session.start()
+        return self
+
+    def stop(self):
+        session, self._session = self._session, None
+        if session is None:
+            return self.paths
+        session.stop()
+        stats = pstats.Stats(session.profile) if session.profile is not None else None
+        self.paths = _write(self.directory, self.name, stats, session.stacks)
+        logger.info("🔬 Profile '%s': %s", self.name, self.directory)
+        return self.paths
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def flush():
+    """Ghi số liệu đã gộp của @profiled ra file, trả về list đường dẫn"""
+    with _lock:
+        aggregates = dict(_aggregates)
+        _aggregates.clear()
+    paths = []
+    directory = run_directory()
+    for name, aggregate in sorted(aggregates.items()):
+        with aggregate.lock:
+            paths += _write(directory, name, aggregate.stats, aggregate.stacks)
+    if paths:
+        logger.info("🔬 Profiles (%d file): %s", len(paths), directory)
+    return paths
+
+
+def enable_from_argv(argv=None):
+    """Bật profiling nếu có cờ --profile[=cprofile|sample] trong argv"""
+    for arg in (sys.argv if argv is None else argv):
+        if arg == "--profile":
+            enable()
+            return True
+        if arg.startswith("--profile="):
+            enable(arg.split("=", 1)[1])
+            return True
+    return False
+
+
+if os.environ.get("ECDSA_PROFILE"):
+    enable(os.environ["ECDSA_PROFILE"])
+
+atexit.register(flush)
@@ -0,0 +1,202 @@
+"""
+TransactionRecord - bản ghi giao dịch gọn (__slots__), bất biến.
+
+Thay cho dict giao dịch trong toàn bộ core: một bộ field chuẩn duy nhất
+(sender/receiver), không copy / alias from-to ở mỗi lần đọc.
+Dict chỉ được tạo ở biên API bằng to_dict().
+"""
+import json
+import hashlib
+from core.storage import TX_COLUMNS
+
+# Tên field cũ (from/to) -> field chuẩn
+_ALIASES = {"from": "sender", "to": "receiver"}
+
+# Các field nằm trong payload ký
+SIGNED_COLUMNS = frozenset(("id", "sender", "receiver", "amount", "timestamp",
+                            "from_address", "to_address", "nonce"))
+
+_set = object.__setattr__
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+def _json_value(value):
+    if value is None:
+        return "null"
+    if type(value) is str:
+        return _encode_str(value)
+    if type(value) is int:
+        return str(value)
+    return json.dumps(value)
+
+
+def canonical_payload(transaction):
+    """
+    Payload chuẩn được ký: JSON compact, key sort, ASCII.
+    Byte-for-byte giống json.dumps(fields, sort_keys=True, separators=(',', ':'))
+    đã dùng từ trước (chữ ký cũ vẫn hợp lệ) nhưng không cần dựng dict / sort key.
+    """
+    return (
+        '{"amount":' + str(int(transaction.amount)) +
+        ',"from":' + _json_value(transaction.sender) +
+        ',"from_address":' + _json_value(transaction.from_address) +
+        ',"id":' + _json_value(transaction.id) +
+        ',"nonce":' + _json_value(transaction.nonce) +
+        ',"timestamp":' + _json_value(transaction.timestamp) +
+        ',"to":' + _json_value(transaction.receiver) +
+        ',"to_address":' + _json_value(transaction.to_address) +
+        '}'
+    ).encode('ascii')
+
+
+class TransactionRecord:
+    """Giao dịch bất biến - dùng replace() để tạo bản ghi mới"""
+
+    __slots__ = TX_COLUMNS + ("_signing_bytes", "_digest")
+
+    def __init__(self, id, sender, receiver, from_address=None, to_address=None,
+                 amount=0, timestamp=None, expires_at=None, status="pending",
+                 signature=None, nonce=None, executed=0, message_hash=None):
+        _set(self, "id", id)
+        _set(self, "sender", sender)
+        _set(self, "receiver", receiver)
+        _set(self, "from_address", from_address)
+        _set(self, "to_address", to_address)
+        _set(self, "amount", amount)
+        _set(self, "timestamp", timestamp)
+        _set(self, "expires_at", expires_at)
+        _set(self, "status", status)
+        _set(self, "signature", signature)
+        _set(self, "nonce", nonce)
+        _set(self, "executed", executed)
+        _set(self, "message_hash", message_hash)
+        _set(self, "_signing_bytes", None)
+        _set(self, "_digest", None)
+
+    # ------------------ Constructors ------------------ #
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Tạo record từ sqlite3.Row / tuple theo đúng thứ tự TX_COLUMNS
+        (query SQLite phải SELECT theo database.TX_SELECT_COLUMNS).
+        """
+        return cls(*row)
+
+    @classmethod
+    def from_mapping(cls, data):
+        """Tạo record từ dict (chấp nhận cả from/to lẫn sender/receiver)"""
+        return cls(
+            data["id"],
+            data.get("sender") or data.get("from"),
+            data.get("receiver") or data.get("to"),
+            data.get("from_address"),
+            data.get("to_address"),
+            data.get("amount", 0),
+            data.get("timestamp"),
+            data.get("expires_at"),
+            data.get("status", "pending"),
+            data.get("signature"),
+            data.get("nonce"),
+            data.get("executed", 0),
+            data.get("message_hash")
+        )
+
+    def replace(self, **changes):
+        """Trả về record mới với các field thay đổi"""
+        values = {col: getattr(self, col) for col in TX_COLUMNS}
+        changed = set()
+        for key, value in changes.items():
+            key = _ALIASES.get(key, key)
+            if key not in values:
+                raise AttributeError(f"TransactionRecord không có field '{key}'")
+            values[key] = value
+            changed.add(key)
+        record = TransactionRecord(**values)
+        if not changed & SIGNED_COLUMNS:
+            # Payload ký không đổi -> giữ cache
+            _set(record, "_signing_bytes", self._signing_bytes)
+            _set(record, "_digest", self._digest)
+        return record
+
+    # ------------------ Views ------------------ #
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TransactionRecord là bất biến, dùng replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError("TransactionRecord là bất biến")
+
+    def as_row(self):
+        """Tuple theo thứ tự TX_COLUMNS (dùng cho INSERT)"""
+        return tuple(getattr(self, col) for col in TX_COLUMNS)
+
+    def to_dict(self):
+        """Dict view cho biên API / lưu block (kèm alias from/to như trước)"""
+        data = {col: getattr(self, col) for col in TX_COLUMNS}
+        data["from"] = self.sender
+        data["to"] = self.receiver
+        return data
+
+    @property
+    def signing_bytes(self):
+        """Payload chuẩn được ký (cache sau lần tính đầu)"""
+        payload = self._signing_bytes
+        if payload is None:
+            payload = canonical_payload(self)
+            _set(self, "_signing_bytes", payload)
+        return payload
+
+    def message_digest(self, trust_stored=False):
+        """
+        SHA-256 của payload ký.
+        - Đã tính trong process này -> dùng lại (cùng field, không thể lệch)
+        - trust_stored=True -> dùng message_hash lưu lúc ký, không tính lại
+        - Ngược lại tính lại từ các field và cache trên record
+        """
+        digest = self._digest
+        if digest is not None:
+            return digest
+        if trust_stored and self.message_hash:
+            return bytes.fromhex(self.message_hash)
+        digest = hashlib.sha256(self.signing_bytes).digest()
+        _set(self, "_digest", digest)
+        return digest
+
+    # Truy cập kiểu dict cho code cũ (CLI, demo, tests)
+    def __getitem__(self, key):
+        key = _ALIASES.get(key, key)
+        if key not in TX_COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        key = _ALIASES.get(key, key)
+        if key not in TX_COLUMNS:
+            return default
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return _ALIASES.get(key, key) in TX_COLUMNS
+
+    def keys(self):
+        return TX_COLUMNS + tuple(_ALIASES)
+
+    def __eq__(self, other):
+        if not isinstance(other, TransactionRecord):
+            return NotImplemented
+        return self.as_row() == other.as_row()
+
+    def __hash__(self):
+        return hash(self.as_row())
+
+    def __repr__(self):
+        return (f"TransactionRecord(id={self.id!r}, sender={self.sender!r}, "
+                f"receiver={self.receiver!r}, amount={self.amount!r}, status={self.status!r})")
+
+
+def as_record(transaction):
+    """Chuyển dict giao dịch (code cũ) thành TransactionRecord nếu cần"""
+    if isinstance(transaction, TransactionRecord):
+        return transaction
+    return TransactionRecord.from_mapping(transaction)
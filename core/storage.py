@@ -0,0 +1,345 @@
+"""
+Storage backend - tách lớp lưu trữ khỏi logic nghiệp vụ.
+
+Mọi truy cập wallets / transactions / blocks / metadata đi qua một
+StorageBackend. Có 2 engine:
+
+- "sqlite": file data/system.db (mặc định, xem core/database.py)
+- "memory": bảng dict/list trong RAM, cùng ngữ nghĩa (core/memory_storage.py)
+
+Chọn engine bằng biến môi trường ECDSA_STORAGE=sqlite|memory
+hoặc gọi set_storage("memory") trước khi dùng các module core.
+"""
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+# Các cột của bảng transactions (thứ tự giống schema SQLite)
+TX_COLUMNS = (
+    "id", "sender", "receiver", "from_address", "to_address", "amount",
+    "timestamp", "expires_at", "status", "signature", "nonce", "executed",
+    "message_hash"
+)
+
+# Các cột của bảng wallets
+WALLET_COLUMNS = (
+    "name", "address", "public_key", "encrypted_private_key", "salt",
+    "balance", "nonce", "created_at"
+)
+
+# Nonce đặt trước bằng reserve_nonces() (batch: ký trước, lưu sau) được coi là
+# đang dùng trong khoảng này - rewind_nonces() không hạ nonce của ví đó
+NONCE_RESERVATION_TTL = 600  # giây
+
+PENDING_STATUSES = ("pending", "signed")
+
+
+def reservation_deadline(ttl=NONCE_RESERVATION_TTL):
+    """Thời điểm (chuỗi ISO, so sánh được với expires_at) reservation mới hết hiệu lực"""
+    return (datetime.now() + timedelta(seconds=ttl)).isoformat()
+
+
+def pending_limit_error(name, limit):
+    return ValueError(f"'{name}' đã có {limit} giao dịch chờ xử lý")
+
+
+# Các field header block (không có transactions) - load_block_headers()
+BLOCK_HEADER_FIELDS = (
+    "index", "timestamp", "previous_hash", "nonce", "hash",
+    "version", "merkle_root", "tx_count", "body_bytes"
+)
+HEADER_CHUNK_SIZE = 5000
+
+
+def body_size(transactions):
+    """Kích thước body block (độ dài JSON của transactions) - lưu cùng header"""
+    return len(json.dumps(transactions, ensure_ascii=False))
+
+
+def block_header(block_dict):
+    """Header của block dict: các field BLOCK_HEADER_FIELDS, không có transactions"""
+    return {
+        "index": block_dict["index"],
+        "timestamp": block_dict["timestamp"],
+        "previous_hash": block_dict["previous_hash"],
+        "nonce": block_dict["nonce"],
+        "hash": block_dict["hash"],
+        "version": block_dict.get("version") or 1,
+        "merkle_root": block_dict.get("merkle_root"),
+        "tx_count": len(block_dict["transactions"]),
+        "body_bytes": body_size(block_dict["transactions"]),
+    }
+
+
+DEFAULT_METADATA = {
+    "difficulty": "2",
+    "mining_reward": "100"
+}
+
+
+class StorageBackend:
+    """Interface chung cho các engine lưu trữ"""
+
+    name = "base"
+
+    # ------------------ Wallets ------------------ #
+
+    def insert_wallet(self, wallet):
+        raise NotImplementedError
+
+    def get_wallet(self, name):
+        raise NotImplementedError
+
+    def get_wallet_by_address(self, address):
+        raise NotImplementedError
+
+    def list_wallets(self):
+        raise NotImplementedError
+
+    def update_wallet(self, name, **fields):
+        raise NotImplementedError
+
+    def increment_nonce(self, name, count=1):
+        raise NotImplementedError
+
+    def reserve_nonces(self, name, count=1):
+        """
+        Đặt trước `count` nonce liên tiếp của ví (đọc + tăng atomic) và ghi
+        nhận reservation trong NONCE_RESERVATION_TTL giây (xem rewind_nonces).
+        Trả về nonce đầu tiên được cấp, None nếu không có ví.
+        """
+        raise NotImplementedError
+
+    def count_wallets(self):
+        raise NotImplementedError
+
+    # ------------------ Transactions ------------------ #
+
+    def insert_transaction(self, tx):
+        """Lưu giao dịch mới (TransactionRecord hoặc dict)"""
+        raise NotImplementedError
+
+    def insert_transactions(self, txs):
+        """Lưu nhiều giao dịch trong một commit"""
+        raise NotImplementedError
+
+    def insert_transaction_with_nonce(self, name, build, max_pending=0):
+        """
+        Đặt trước một nonce của ví `name`, build(nonce) -> giao dịch rồi lưu,
+        tất cả trong một transaction (ví không tồn tại -> nonce 0, không tăng).
+        Lưu lỗi thì nonce không bị tiêu. max_pending > 0: ValueError nếu ví đã
+        có từng ấy giao dịch pending/signed chưa executed (đếm trong cùng
+        transaction). Trả về giao dịch đã lưu.
+        """
+        raise NotImplementedError
+
+    def get_transaction(self, tx_id):
+        """Trả về TransactionRecord hoặc None"""
+        raise NotImplementedError
+
+    def update_transaction(self, tx_id, **fields):
+        raise NotImplementedError
+
+    def list_transactions(self, sender=None, party=None, statuses=None,
+                          executed=None, limit=None):
+        """
+        Lấy danh sách TransactionRecord theo bộ lọc, sắp xếp timestamp giảm dần.
+        - sender: chỉ giao dịch do ví này gửi
+        - party: giao dịch mà ví này là người gửi hoặc người nhận
+        - statuses: tuple các status chấp nhận
+        - executed: 0/1 hoặc None (không lọc)
+        """
+        raise NotImplementedError
+
+    def list_unanchored_transactions(self, limit=None):
+        """
+        Giao dịch verified + executed chưa nằm trong block nào,
+        theo thứ tự thêm vào (cũ trước)
+        """
+        raise NotImplementedError
+
+    def latest_transaction(self):
+        rows = self.list_transactions(limit=1)
+        return rows[0] if rows else None
+
+    def count_transactions(self, statuses=None):
+        raise NotImplementedError
+
+    def expire_transactions(self, now, limit):
+        """
+        Đánh dấu "expired" tối đa `limit` giao dịch pending/signed chưa executed
+        có expires_at < now (chuỗi ISO), không theo thứ tự nào (lặp tới khi
+        trả về ít hơn `limit`). Trả về list (id, sender) vừa expire.
+        """
+        raise NotImplementedError
+
+    def rewind_nonces(self, senders, now=None):
+        """
+        Hạ nonce của các ví về 1 + nonce lớn nhất trong giao dịch chưa expired
+        (chỉ khi nhỏ hơn nonce hiện tại): nonce của các giao dịch hết hạn ở cuối
+        được cấp lại. Bỏ qua ví có reservation còn hiệu lực tại `now` (chuỗi
+        ISO): nonce đã đặt trước có thể đã được ký mà chưa lưu. Trả về số ví đã rewind.
+        """
+        raise NotImplementedError
+
+    def delete_all_transactions(self):
+        raise NotImplementedError
+
+    def execute_transfer(self, tx_id, from_user, to_user, amount):
+        """
+        Chuyển tiền ATOMIC: trừ người gửi, cộng người nhận, đánh dấu
+        giao dịch executed/verified.
+        Trả về (success, message, sender_balance_cu, receiver_balance_cu)
+        """
+        raise NotImplementedError
+
+    def execute_transfers(self, transfers):
+        """
+        Chuyển tiền hàng loạt trong MỘT transaction DB, theo đúng thứ tự.
+        transfers: list (tx_id, from_user, to_user, amount).
+        Chuyển khoản không đủ số dư bị bỏ qua và giao dịch đánh dấu rejected.
+        Trả về list (success, message) cùng thứ tự.
+        """
+        raise NotImplementedError
+
+    # ------------------ Blocks ------------------ #
+
+    def save_block(self, block_dict):
+        raise NotImplementedError
+
+    def insert_block(self, block_dict):
+        """Thêm block mới; sqlite3.IntegrityError nếu index đã có - không bao giờ ghi đè"""
+        raise NotImplementedError
+
+    def load_all_blocks(self):
+        raise NotImplementedError
+
+    def iter_blocks(self, start=0, chunk_size=500):
+        """
+        Đọc block theo thứ tự index, mỗi lần một chunk (list block dict) -
+        không load cả chain vào RAM cùng lúc.
+        """
+        top = self.get_max_block_index()
+        while top is not None and start <= top:
+            chunk = self.load_block_range(start, start + chunk_size)
+            if chunk:
+                yield chunk
+            start += chunk_size
+
+    def load_block_range(self, start, stop):
+        """Các block có start <= index < stop (theo thứ tự index)"""
+        raise NotImplementedError
+
+    def load_block_headers(self, start, stop):
+        """
+        Header (BLOCK_HEADER_FIELDS) các block có start <= index < stop, không
+        đọc / giải mã transactions - để dựng chain lúc khởi động.
+        """
+        raise NotImplementedError
+
+    def iter_block_headers(self, start=0, chunk_size=HEADER_CHUNK_SIZE):
+        """Header block theo thứ tự index, mỗi lần một chunk (list dict)"""
+        top = self.get_max_block_index()
+        while top is not None and start <= top:
+            chunk = self.load_block_headers(start, start + chunk_size)
+            if chunk:
+                yield chunk
+            start += chunk_size
+
+    def load_blocks_since(self, height, limit=500):
+        """
+        Tối đa `limit` block có index > height (theo thứ tự index) - để
+        follower / dashboard nối tail mà không đọc lại cả chain.
+        """
+        return self.load_block_range(height + 1, height + 1 + limit)
+
+    def get_max_block_index(self):
+        """Index lớn nhất trong bảng blocks (None nếu chưa có block)"""
+        raise NotImplementedError
+
+    def get_latest_block(self):
+        raise NotImplementedError
+
+    def find_transaction_location(self, tx_id):
+        """(block_index, position) của giao dịch đã vào block, None nếu chưa có"""
+        raise NotImplementedError
+
+    def get_block_count(self):
+        raise NotImplementedError
+
+    def sync_block_store(self):
+        """
+        Đối chiếu block store ngoài (nếu có) với block đã commit - chỉ chain
+        writer gọi. Trả về số block đã chép vào store; mặc định không làm gì.
+        """
+        return 0
+
+    def archive_blocks(self, depth):
+        """
+        Chuyển body các block sâu hơn `depth` so với tip sang cold archive,
+        trả về số block đã chuyển. Engine không có archive: không làm gì.
+        """
+        return 0
+
+    def delete_all_blocks(self):
+        raise NotImplementedError
+
+    # ------------------ Metadata ------------------ #
+
+    def get_metadata(self, key, default=None):
+        raise NotImplementedError
+
+    def set_metadata(self, key, value):
+        raise NotImplementedError
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def _create_storage(name):
+    if name == "sqlite":
+        from core.database import SQLiteStorage
+        return SQLiteStorage()
+    if name == "memory":
+        from core.memory_storage import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Storage backend không hợp lệ: {name}")
+
+
+def get_storage():
+    """Lấy storage backend hiện tại (singleton)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _create_storage(os.environ.get("ECDSA_STORAGE", "sqlite"))
+    return _storage
+
+
+def set_storage(backend):
+    """
+    Đổi storage backend (tên "sqlite"/"memory" hoặc một instance StorageBackend).
+    Gọi trước khi tạo Blockchain để chain được load từ backend mới.
+    """
+    global _storage
+    if isinstance(backend, str):
+        backend = _create_storage(backend)
+    with _storage_lock:
+        _storage = backend
+    return backend
+
+
+@contextmanager
+def use_storage(backend):
+    """Tạm thời đổi storage backend trong khối with, trả lại backend cũ khi ra (benchmark)"""
+    global _storage
+    with _storage_lock:
+        previous = _storage
+    try:
+        yield set_storage(backend)
+    finally:
+        with _storage_lock:
+            _storage = previous
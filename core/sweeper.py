@@ -0,0 +1,120 @@
+"""
+Sweeper giao dịch hết hạn.
+
+create_transaction đặt expires_at = now + 10 phút nhưng hạn chỉ được kiểm
+tra lúc verify (check_transaction_expiry) -> giao dịch pending/signed bị bỏ
+dở nằm lại mãi và mọi get_pending_transactions() đều phải quét qua chúng.
+
+- sweep_expired(): đánh dấu "expired" theo batch qua index (status, expires_at)
+- Chính sách nonce (ECDSA_NONCE_RELEASE):
+  - "none" (mặc định): nonce đã cấp không dùng lại (có khoảng trống, vô hại)
+  - "rewind": nonce của ví hạ về sau giao dịch còn hiệu lực cuối cùng, nonce
+    của các giao dịch hết hạn ở cuối được cấp lại; ví vừa reserve_nonces (batch
+    đang ký, NONCE_RESERVATION_TTL) không bị rewind
+- ExpirySweeper: thread nền chạy mỗi ECDSA_SWEEP_INTERVAL giây (0 = tắt),
+  được app.py / asgi.py / main.py khởi động qua start_sweeper()
+- Metrics: transactions_expired_total, nonces_rewound_total
+"""
+import os
+import threading
+from datetime import datetime
+
+from core.storage import get_storage
+from core.instrumentation import inc
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+SWEEP_INTERVAL = float(os.environ.get("ECDSA_SWEEP_INTERVAL", 30))
+SWEEP_BATCH_SIZE = 500
+NONCE_POLICIES = ("none", "rewind")
+NONCE_RELEASE = os.environ.get("ECDSA_NONCE_RELEASE", "none")
+
+
+def sweep_expired(batch_size=SWEEP_BATCH_SIZE, policy=None, now=None):
+    """Đánh dấu expired mọi giao dịch pending/signed đã quá hạn, trả về số giao dịch"""
+    policy = policy or NONCE_RELEASE
+    if policy not in NONCE_POLICIES:
+        raise ValueError(f"Chính sách nonce không hợp lệ: {policy}")
+    now = now or datetime.now().isoformat()
+    storage = get_storage()
+
+    total = 0
+    senders = set()
+    while True:
+        expired = storage.expire_transactions(now, batch_size)
+        total += len(expired)
+        senders.update(sender for _, sender in expired)
+        if len(expired) < batch_size:
+            break
+
+    if total:
+        inc("transactions_expired_total", total)
+        rewound = 0
+        if policy == "rewind":
+            rewound = storage.rewind_nonces(sorted(s for s in senders if s is not None), now)
+            if rewound:
+                inc("nonces_rewound_total", rewound)
+        logger.info("🧹 Expired %s transactions (%s senders, %s nonces rewound)",
+                    total, len(senders), rewound)
+    return total
+
+
+class ExpirySweeper:
+    """Thread nền gọi sweep_expired() định kỳ"""
+
+    def __init__(self, interval=None, batch_size=SWEEP_BATCH_SIZE, policy=None):
+        self.interval = SWEEP_INTERVAL if interval is None else interval
+        self.batch_size = batch_size
+        self.policy = policy
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                sweep_expired(self.batch_size, self.policy)
+            except Exception as e:
+                logger.warning("⚠️  Expiry sweep error: %s", e)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def get_sweeper():
+    """ExpirySweeper của process (singleton, chưa chạy)"""
+    global _sweeper
+    if _sweeper is None:
+        with _sweeper_lock:
+            if _sweeper is None:
+                _sweeper = ExpirySweeper()
+    return _sweeper
+
+
+def start_sweeper():
+    """Khởi động sweeper nền (không làm gì nếu đã chạy hoặc ECDSA_SWEEP_INTERVAL=0)"""
+    return get_sweeper().start()
+
+
+def stop_sweeper():
+    if _sweeper is not None:
+        _sweeper.stop()
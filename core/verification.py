@@ -1,75 +1,84 @@
 # core/verification.py - FIXED VERSION
 
-from ecdsa import VerifyingKey, SECP256k1
-import json
-import hashlib
+import os
 from core.wallet import get_wallet_info
-from core.database import  _lock
+from core.storage import get_storage
+from core.records import as_record
+from core.crypto import get_crypto_backend
 from core.transaction import (
     get_transaction_by_id, 
     get_latest_transaction,
     update_transaction_status,
 )
 from core.fraud_detection import check_fraud
+from core.log import get_logger, Amount
+from core.instrumentation import timed, timer, inc
+from core.profiling import profiled
 
-def verify_signature(transaction):
-    """Xác minh chữ ký ECDSA - Database compatible"""
-    try:
-        signature_hex = transaction.get("signature")
-        
-        # ✅ Handle both 'from' and 'sender'
-        from_user = transaction.get("sender") or transaction.get("from")
+logger = get_logger(__name__)
 
-        if not signature_hex:
-            return False, "Giao dịch chưa có chữ ký"
-        if not from_user:
-            return False, "Giao dịch thiếu thông tin người gửi"
+# Chính sách message hash khi verify:
+# - "strict": tính lại hash từ các field, từ chối nếu lệch message_hash đã lưu lúc ký
+# - "cached": tin message_hash đã lưu (chỉ dùng khi storage tin cậy, vd. benchmark in-memory)
+# Record vừa ký/verify trong cùng process luôn dùng lại hash đã tính.
+HASH_POLICY_STRICT = "strict"
+HASH_POLICY_CACHED = "cached"
+HASH_POLICY = os.environ.get("ECDSA_HASH_POLICY", HASH_POLICY_STRICT)
 
-        sender_wallet = get_wallet_info(from_user)
-        if not sender_wallet:
-            return False, f"Không tìm thấy ví của {from_user}"
+def prepare_signature_check(transaction, hash_policy=None):
+    """
+    Phần I/O + hash của bước verify chữ ký (không gồm phép toán ECDSA).
+    Trả về (True, (public_key, signature, message_hash)) - bytes, picklable
+    để verify ở process khác - hoặc (False, lý do).
+    """
+    policy = hash_policy or HASH_POLICY
+    transaction = as_record(transaction)
+    from_user = transaction.sender
 
-        public_key_hex = sender_wallet["public_key"]
-        public_key = VerifyingKey.from_string(bytes.fromhex(public_key_hex), curve=SECP256k1)
+    if not transaction.signature:
+        return False, "Giao dịch chưa có chữ ký"
+    if not from_user:
+        return False, "Giao dịch thiếu thông tin người gửi"
 
-        # ✅ CRITICAL FIX: Use ORIGINAL field names from transaction
-        # Get the field names exactly as they were when signing
-        to_user = transaction.get("receiver") or transaction.get("to")
-        
-        # Build fields with EXACT same structure as in transaction.sign_transaction()
-        fields_to_sign = {
-            "id": transaction["id"],
-            "from": from_user,  # Use the normalized value
-            "to": to_user,      # Use the normalized value
-            "amount": int(transaction["amount"]),  # ✅ FIX: Cast to int để tránh float mismatch
-            "timestamp": transaction["timestamp"],
-            "from_address": transaction.get("from_address", ""),
-            "to_address": transaction.get("to_address", ""),
-            "nonce": transaction.get("nonce", 0)
-        }
-
-        # Create the exact same JSON string as when signing
-        json_string = json.dumps(fields_to_sign, sort_keys=True, separators=(',', ':'))
-        message_hash = hashlib.sha256(json_string.encode('utf-8')).digest()
-
-        signature_bytes = bytes.fromhex(signature_hex)
-        
-        try:
-            public_key.verify(signature_bytes, message_hash)
+    sender_wallet = get_wallet_info(from_user)
+    if not sender_wallet:
+        return False, f"Không tìm thấy ví của {from_user}"
+
+    public_key = bytes.fromhex(sender_wallet["public_key"])
+
+    # Hash payload chuẩn (dùng lại hash đã có theo policy)
+    message_hash = transaction.message_digest(trust_stored=(policy == HASH_POLICY_CACHED))
+    if transaction.message_hash and message_hash.hex() != transaction.message_hash:
+        return False, "Chữ ký không hợp lệ: nội dung giao dịch đã bị thay đổi sau khi ký"
+
+    return True, (public_key, bytes.fromhex(transaction.signature), message_hash)
+
+
+def signature_failure(transaction):
+    """In thông tin debug khi chữ ký sai, trả về message lỗi"""
+    logger.warning("❌ Signature verification failed! %s -> %s", transaction.sender, transaction.receiver)
+    logger.debug("   Expected to sign: %s...", transaction.signing_bytes[:100].decode('ascii'))
+    return "Chữ ký không hợp lệ"
+
+
+@timed("verification_stage_seconds", stage="signature")
+def verify_signature(transaction, hash_policy=None):
+    """Xác minh chữ ký ECDSA - Database compatible"""
+    try:
+        transaction = as_record(transaction)
+        ok, job = prepare_signature_check(transaction, hash_policy)
+        if not ok:
+            return False, job
+
+        if get_crypto_backend().verify(*job):
             return True, "Chữ ký hợp lệ"
-        except Exception as verify_error:
-            # Debug: print what we're verifying
-            print(f"❌ Signature verification failed!")
-            print(f"   Expected to sign: {json_string[:100]}...")
-            print(f"   From user: {from_user}")
-            print(f"   To user: {to_user}")
-            return False, f"Chữ ký không hợp lệ: {str(verify_error)}"
+        return False, signature_failure(transaction)
 
     except Exception as e:
         return False, f"Lỗi xác minh chữ ký: {str(e)}"
 
 
-
+@timed("verification_stage_seconds", stage="balance")
 def check_balance(from_user, amount):
     """Kiểm tra số dư đủ không"""
     try:
@@ -90,12 +99,12 @@ def check_balance(from_user, amount):
 
 def validate_transaction_format(transaction):
     """Kiểm tra format giao dịch - Database compatible"""
-    # ✅ Check for both 'from'/'to' and 'sender'/'receiver'
-    from_field = transaction.get("from") or transaction.get("sender")
-    to_field = transaction.get("to") or transaction.get("receiver")
+    transaction = as_record(transaction)
+    from_field = transaction.sender
+    to_field = transaction.receiver
     
     # Required fields
-    if not transaction.get("id"):
+    if not transaction.id:
         return False, "Thiếu trường id"
     
     if not from_field:
@@ -104,17 +113,17 @@ def validate_transaction_format(transaction):
     if not to_field:
         return False, "Thiếu trường to/receiver"
     
-    if "amount" not in transaction:
+    if transaction.amount is None:
         return False, "Thiếu trường amount"
     
-    if not transaction.get("timestamp"):
+    if not transaction.timestamp:
         return False, "Thiếu trường timestamp"
     
-    if not transaction.get("signature"):
+    if not transaction.signature:
         return False, "Thiếu trường signature"
     
     # Validate amount
-    amount = transaction.get("amount")
+    amount = transaction.amount
     if not isinstance(amount, (int, float)) or amount <= 0:
         return False, "Số tiền phải lớn hơn 0 (không chấp nhận số âm hoặc 0)"
     
@@ -125,215 +134,180 @@ def validate_transaction_format(transaction):
     return True, "Format hợp lệ"
 
 
+@timed("verification_stage_seconds", stage="execute")
 def execute_transaction_atomic(transaction):
     """
     Thực hiện giao dịch ATOMIC với database transaction
     Đảm bảo balance update là atomic operation
     """
-    # ✅ Handle both field names
-    from_user = transaction.get("sender") or transaction.get("from")
-    to_user = transaction.get("receiver") or transaction.get("to")
-    amount = transaction["amount"]
-    tx_id = transaction["id"]
+    transaction = as_record(transaction)
+    from_user = transaction.sender
+    to_user = transaction.receiver
+    amount = transaction.amount
+    tx_id = transaction.id
     
     try:
-        with _lock:
-            from core.database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            try:
-                # Begin transaction
-                cursor.execute("BEGIN EXCLUSIVE")
-                
-                # 1. Get current balances (with lock)
-                sender = cursor.execute(
-                    "SELECT balance FROM wallets WHERE name = ?",
-                    (from_user,)
-                ).fetchone()
-                
-                receiver = cursor.execute(
-                    "SELECT balance FROM wallets WHERE name = ?",
-                    (to_user,)
-                ).fetchone()
-                
-                if not sender or not receiver:
-                    cursor.execute("ROLLBACK")
-                    return False, "Wallet not found"
-                
-                sender_balance = sender[0]
-                receiver_balance = receiver[0]
-                
-                # 2. Verify balance again (double-check)
-                if sender_balance < amount:
-                    cursor.execute("ROLLBACK")
-                    return False, f"Insufficient balance: {sender_balance} < {amount}"
-                
-                # 3. Update balances atomically
-                cursor.execute(
-                    "UPDATE wallets SET balance = balance - ? WHERE name = ?",
-                    (amount, from_user)
-                )
-                
-                cursor.execute(
-                    "UPDATE wallets SET balance = balance + ? WHERE name = ?",
-                    (amount, to_user)
-                )
-                
-                # 4. Mark transaction as executed
-                cursor.execute(
-                    "UPDATE transactions SET executed = 1, status = 'verified' WHERE id = ?",
-                    (tx_id,)
-                )
-                
-                # Commit transaction
-                conn.commit()
-                
-                print(f"✅ Transaction executed: {amount:,} VND from {from_user} to {to_user}")
-                
-                # Print updated balances
-                new_sender_balance = sender_balance - amount
-                new_receiver_balance = receiver_balance + amount
-                print(f"   {from_user}: {sender_balance:,} → {new_sender_balance:,} VND")
-                print(f"   {to_user}: {receiver_balance:,} → {new_receiver_balance:,} VND")
-                
-                return True, "Transaction executed successfully"
-                
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                return False, f"Database error: {str(e)}"
+        success, message, sender_balance, receiver_balance = get_storage().execute_transfer(
+            tx_id, from_user, to_user, amount
+        )
+        if not success:
+            return False, message
+        
+        logger.info("✅ Transaction executed: %s VND from %s to %s", Amount(amount), from_user, to_user)
+        
+        # Log updated balances
+        logger.debug("   %s: %s → %s VND", from_user, Amount(sender_balance), Amount(sender_balance - amount))
+        logger.debug("   %s: %s → %s VND", to_user, Amount(receiver_balance), Amount(receiver_balance + amount))
+        
+        return True, message
             
     except Exception as e:
         return False, f"Atomic execution error: {str(e)}"
 
 
+def _verification_result(transaction_id, status, message, signature_valid=False,
+                         balance_valid=False, fraud_check=False, valid=False):
+    return {
+        "valid": valid,
+        "signature_valid": signature_valid,
+        "balance_valid": balance_valid,
+        "fraud_check": fraud_check,
+        "message": message,
+        "transaction_id": transaction_id,
+        "transaction_status": status
+    }
+
+
+def error_result(tx_id, error):
+    """Kết quả khi có exception trong quá trình xác thực"""
+    return _verification_result(tx_id or "unknown", "error", f"Lỗi trong quá trình xác thực: {str(error)}")
+
+
+def load_for_verification(tx_id=None):
+    """
+    Stage 1 - lấy giao dịch và kiểm tra format.
+    Trả về (transaction, None) nếu đi tiếp được, hoặc (transaction | None, result)
+    khi dừng sớm. result có transaction_status "rejected" thì bên ghi phải
+    cập nhật status (xem reject_early()).
+    """
+    if tx_id:
+        transaction = get_transaction_by_id(tx_id)
+        if not transaction:
+            return None, _verification_result(tx_id, "not_found", f"Không tìm thấy giao dịch {tx_id}")
+    else:
+        transaction = get_latest_transaction()
+        if not transaction:
+            return None, _verification_result(None, "no_transaction", "Không có giao dịch nào để xác thực")
+
+    logger.debug("🔍 Đang xác thực giao dịch: %s...", transaction.id[:8])
+
+    # ✅ Check if already executed
+    if transaction.executed:
+        logger.warning("⚠️  Transaction %s already executed", transaction.id[:8])
+        return transaction, _verification_result(transaction.id, "executed", "Transaction already executed")
+
+    # Đã bị sweeper đánh dấu hết hạn (core/sweeper.py) - giữ nguyên status
+    if transaction.status == "expired":
+        return transaction, _verification_result(
+            transaction.id, "expired", f"Transaction expired at {transaction.expires_at}"
+        )
+
+    with timer("verification_stage_seconds", stage="format"):
+        format_valid, format_msg = validate_transaction_format(transaction)
+    if not format_valid:
+        return transaction, _verification_result(
+            transaction.id, "rejected", f"Format không hợp lệ: {format_msg}"
+        )
+
+    return transaction, None
+
+
+def reject_early(transaction, result):
+    """Ghi status cho kết quả dừng sớm của load_for_verification()"""
+    inc("verifications_total", result=result["transaction_status"])
+    if transaction is not None and result["transaction_status"] == "rejected":
+        update_transaction_status(transaction.id, "rejected")
+    return result
+
+
+def check_transaction_state(transaction):
+    """
+    Stage 3 - kiểm tra số dư + fraud (chỉ đọc DB).
+    Trả về (balance_valid, balance_msg, fraud_check_passed, fraud_msg)
+    """
+    balance_valid, balance_msg = check_balance(transaction.sender, transaction.amount)
+    fraud_check_passed, fraud_msg = check_fraud(transaction)
+    return balance_valid, balance_msg, fraud_check_passed, fraud_msg
+
+
+def apply_verification(transaction, signature_check, state_check):
+    """
+    Stage 4 - tổng hợp kết quả và ghi: execute ATOMIC nếu mọi check PASS,
+    ngược lại đánh dấu rejected. Đây là bước duy nhất ghi vào DB.
+    """
+    signature_valid, sig_msg = signature_check
+    balance_valid, balance_msg, fraud_check_passed, fraud_msg = state_check
+
+    all_checks_passed = signature_valid and balance_valid and fraud_check_passed
+    execution_msg = ""
+
+    if all_checks_passed:
+        logger.debug("✅ All checks passed. Executing transaction...")
+        success, exec_msg = execute_transaction_atomic(transaction)
+
+        if success:
+            execution_msg = f" | {exec_msg}"
+            final_status = "verified"
+            logger.debug("✅ Transaction executed successfully")
+        else:
+            execution_msg = f" | Execution failed: {exec_msg}"
+            final_status = "rejected"
+            all_checks_passed = False
+            logger.warning("❌ Execution failed: %s", exec_msg)
+    else:
+        update_transaction_status(transaction.id, "rejected")
+        execution_msg = " | Giao dịch bị từ chối"
+        final_status = "rejected"
+        logger.info("❌ Verification failed: %s", transaction.id[:8])
+
+    inc("verifications_total", result=final_status)
+    logger.info("%s Xác thực hoàn tất %s: %s", "✅" if all_checks_passed else "❌",
+                transaction.id[:8], "PASS" if all_checks_passed else "FAIL")
+
+    return _verification_result(
+        transaction.id,
+        final_status,
+        f"{sig_msg} | {balance_msg} | {fraud_msg}{execution_msg}",
+        signature_valid=signature_valid,
+        balance_valid=balance_valid,
+        fraud_check=fraud_check_passed,
+        valid=all_checks_passed
+    )
+
+
+@profiled("verification")
+@timed("verification_seconds")
 def full_verification_flow(tx_id=None):
     """
     Flow xác thực hoàn chỉnh - DATABASE VERSION
+    Chạy tuần tự các stage cho một giao dịch; xử lý hàng loạt dùng
+    core.pipeline.VerificationPipeline.
     """
     try:
-        # Lấy giao dịch cần xác thực
-        if tx_id:
-            transaction = get_transaction_by_id(tx_id)
-            if not transaction:
-                return {
-                    "valid": False,
-                    "signature_valid": False,
-                    "balance_valid": False,
-                    "fraud_check": False,
-                    "message": f"Không tìm thấy giao dịch {tx_id}",
-                    "transaction_id": tx_id,
-                    "transaction_status": "not_found"
-                }
-        else:
-            transaction = get_latest_transaction()
-            if not transaction:
-                return {
-                    "valid": False,
-                    "signature_valid": False,
-                    "balance_valid": False,
-                    "fraud_check": False,
-                    "message": "Không có giao dịch nào để xác thực",
-                    "transaction_id": None,
-                    "transaction_status": "no_transaction"
-                }
-        
-        print(f"🔍 Đang xác thực giao dịch: {transaction['id'][:8]}...")
-        
-        # ✅ Normalize transaction fields for verification
-        if "sender" in transaction and "from" not in transaction:
-            transaction["from"] = transaction["sender"]
-        if "receiver" in transaction and "to" not in transaction:
-            transaction["to"] = transaction["receiver"]
-        
-        # ✅ Check if already executed
-        if transaction.get("executed"):
-            print(f"⚠️  Transaction already executed")
-            return {
-                "valid": False,
-                "signature_valid": False,
-                "balance_valid": False,
-                "fraud_check": False,
-                "message": "Transaction already executed",
-                "transaction_id": transaction["id"],
-                "transaction_status": "executed"
-            }
-        
-        # 1. Kiểm tra format transaction
-        format_valid, format_msg = validate_transaction_format(transaction)
-        if not format_valid:
-            update_transaction_status(transaction["id"], "rejected")
-            return {
-                "valid": False,
-                "signature_valid": False,
-                "balance_valid": False,
-                "fraud_check": False,
-                "message": f"Format không hợp lệ: {format_msg}",
-                "transaction_id": transaction["id"],
-                "transaction_status": "rejected"
-            }
-        
+        # 1. Lấy giao dịch + kiểm tra format
+        transaction, early_result = load_for_verification(tx_id)
+        if early_result:
+            return reject_early(transaction, early_result)
+
         # 2. Verify chữ ký ECDSA
-        signature_valid, sig_msg = verify_signature(transaction)
-        
-        # 3. Check số dư
-        from_user = transaction.get("from") or transaction.get("sender")
-        balance_valid, balance_msg = check_balance(from_user, transaction["amount"])
-        
-        # 4. Check fraud
-        fraud_check_passed, fraud_msg = check_fraud(transaction)
-        
-        # 5. Tổng hợp kết quả
-        all_checks_passed = signature_valid and balance_valid and fraud_check_passed
-        
-        # 6. Execute transaction ATOMICALLY if all checks pass
-        execution_msg = ""
-        
-        if all_checks_passed:
-            print(f"✅ All checks passed. Executing transaction...")
-            success, exec_msg = execute_transaction_atomic(transaction)
-            
-            if success:
-                execution_msg = f" | {exec_msg}"
-                final_status = "verified"
-                print(f"✅ Transaction executed successfully")
-            else:
-                execution_msg = f" | Execution failed: {exec_msg}"
-                final_status = "rejected"
-                all_checks_passed = False
-                print(f"❌ Execution failed: {exec_msg}")
-        else:
-            update_transaction_status(transaction["id"], "rejected")
-            execution_msg = " | Giao dịch bị từ chối"
-            final_status = "rejected"
-            print(f"❌ Verification failed")
-        
-        # 7. Return kết quả chi tiết
-        result = {
-            "valid": all_checks_passed,
-            "signature_valid": signature_valid,
-            "balance_valid": balance_valid,
-            "fraud_check": fraud_check_passed,
-            "message": f"{sig_msg} | {balance_msg} | {fraud_msg}{execution_msg}",
-            "transaction_id": transaction["id"],
-            "transaction_status": final_status
-        }
-        
-        status_icon = "✅" if all_checks_passed else "❌"
-        print(f"{status_icon} Xác thực hoàn tất: {'PASS' if all_checks_passed else 'FAIL'}")
-        
-        return result
-        
+        signature_check = verify_signature(transaction)
+
+        # 3. Check số dư + fraud
+        state_check = check_transaction_state(transaction)
+
+        # 4. Execute / reject và trả kết quả chi tiết
+        return apply_verification(transaction, signature_check, state_check)
+
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return {
-            "valid": False,
-            "signature_valid": False,
-            "balance_valid": False,
-            "fraud_check": False,
-            "message": f"Lỗi trong quá trình xác thực: {str(e)}",
-            "transaction_id": tx_id or "unknown",
-            "transaction_status": "error"
-        }
\ No newline at end of file
+        logger.exception("Lỗi trong quá trình xác thực %s", tx_id)
+        return error_result(tx_id, e)
@@ -3,15 +3,20 @@ import hashlib
 from datetime import datetime
 import os
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.fernet import Fernet
-from core.database import init_db, execute, fetch_one, fetch_all
+from core.storage import get_storage
+from core.crypto import get_crypto_backend
+from core.log import get_logger, Amount
+from core.instrumentation import timed
+from core.profiling import profiled
 
-
-init_db()
+logger = get_logger(__name__)
 
 
+@timed("kdf_seconds")
 def _derive_fernet_key(passphrase: str, salt: bytes) -> bytes:
     """Sinh key Fernet từ passphrase + salt."""
     kdf = PBKDF2HMAC(
@@ -39,58 +44,99 @@ def _decrypt_private_key_hex(ciphertext_hex: str, passphrase: str, salt_hex: str
     return plaintext.decode()
 
 
-def create_wallet(name, passphrase, initial_balance=1000000):
-    """Tạo ví mới, lưu vào SQLite."""
-    # Kiểm tra trùng tên
-    existing = get_wallet_info(name)
-    if existing:
-        print(f"⚠️  Wallet '{name}' already exists")
-        return existing
-
-    private_key = SigningKey.generate(curve=SECP256k1)
-    public_key = private_key.get_verifying_key()
-    public_key_hex = public_key.to_string().hex()
+def build_wallet(name, passphrase, initial_balance=1000000):
+    """Sinh khóa + mã hóa private key (phần CPU của create_wallet, không ghi DB)."""
+    private_key_bytes, public_key_bytes = get_crypto_backend().generate_keypair()
+    public_key_hex = public_key_bytes.hex()
 
     address_hash = hashlib.sha256(public_key_hex.encode()).hexdigest()
     address = f"wallet_{address_hash[:16]}"
 
-    private_key_hex = private_key.to_string().hex()
+    private_key_hex = private_key_bytes.hex()
     enc_key, salt = _encrypt_private_key_hex(private_key_hex, passphrase)
 
-    created_at = str(datetime.now())
-
-   
-    execute("""
-        INSERT INTO wallets (name, address, public_key, encrypted_private_key, salt, balance, nonce, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (name, address, public_key_hex, enc_key, salt, initial_balance, 0, created_at))
-
-    print(f"✅ Created wallet '{name}' with balance {initial_balance:,} VND")
-
     return {
         "name": name,
         "address": address,
         "public_key": public_key_hex,
+        "encrypted_private_key": enc_key,
+        "salt": salt,
         "balance": initial_balance,
         "nonce": 0,
-        "created_at": created_at
+        "created_at": str(datetime.now())
+    }
+
+
+def store_wallet(wallet):
+    """Lưu ví đã build vào storage, trả về thông tin công khai."""
+    get_storage().insert_wallet(wallet)
+
+    logger.info("✅ Created wallet '%s' with balance %s VND", wallet["name"], Amount(wallet["balance"]))
+
+    return {
+        "name": wallet["name"],
+        "address": wallet["address"],
+        "public_key": wallet["public_key"],
+        "balance": wallet["balance"],
+        "nonce": 0,
+        "created_at": wallet["created_at"]
     }
 
 
+def create_wallet(name, passphrase, initial_balance=1000000):
+    """Tạo ví mới, lưu vào SQLite."""
+    # Kiểm tra trùng tên
+    existing = get_wallet_info(name)
+    if existing:
+        logger.warning("⚠️  Wallet '%s' already exists", name)
+        return existing
+
+    return store_wallet(build_wallet(name, passphrase, initial_balance))
+
+
+@profiled("build_wallet")
+def _build_from_spec(spec):
+    return build_wallet(*spec)
+
+
+@profiled("create_wallets")
+def create_wallets(specs, workers=None):
+    """
+    Tạo nhiều ví: specs là list (name, passphrase, initial_balance).
+    Sinh khóa + PBKDF2 chạy song song trên thread pool (PBKDF2 nhả GIL),
+    ghi DB tuần tự theo thứ tự specs. Ví đã tồn tại được trả về nguyên trạng.
+    """
+    results = {}
+    pending = []
+    for name, passphrase, initial_balance in specs:
+        existing = get_wallet_info(name)
+        if existing:
+            results[name] = existing
+        else:
+            pending.append((name, passphrase, initial_balance))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        built = list(executor.map(_build_from_spec, pending))
+
+    for wallet in built:
+        results[wallet["name"]] = store_wallet(wallet)
+
+    return [results[name] for name, _, _ in specs]
+
+
 def get_wallet_info(name, safe=False):
     """Lấy thông tin ví từ SQLite."""
-    row = fetch_one("SELECT * FROM wallets WHERE name = ?", (name,))
-    if not row:
+    wallet = get_storage().get_wallet(name)
+    if not wallet:
         return None
 
-    wallet = dict(row)
     
     # Đảm bảo có nonce (backward compatible)
     if "nonce" not in wallet or wallet["nonce"] is None:
         wallet["nonce"] = 0
         # Update database
         try:
-            execute("UPDATE wallets SET nonce = 0 WHERE name = ?", (name,))
+            get_storage().update_wallet(name, nonce=0)
         except:
             pass
     
@@ -107,10 +153,8 @@ def get_wallet_info(name, safe=False):
 
 def get_all_wallets():
     """Lấy tất cả wallets (dành cho admin)."""
-    rows = fetch_all("SELECT * FROM wallets")
     wallets = []
-    for row in rows:
-        wallet = dict(row)
+    for wallet in get_storage().list_wallets():
         if "nonce" not in wallet or wallet["nonce"] is None:
             wallet["nonce"] = 0
         wallets.append(wallet)
@@ -119,12 +163,17 @@ def get_all_wallets():
 
 def update_balance(name, new_balance):
     """Cập nhật số dư ví."""
-    execute("UPDATE wallets SET balance = ? WHERE name = ?", (new_balance, name))
+    get_storage().update_wallet(name, balance=new_balance)
     return True
 
 
 def get_private_key(name, passphrase):
-    """Giải mã private key từ database."""
+    """Giải mã private key từ database (ecdsa SigningKey)."""
+    return SigningKey.from_string(get_private_key_bytes(name, passphrase), curve=SECP256k1)
+
+
+def get_private_key_bytes(name, passphrase):
+    """Giải mã private key từ database (32 byte raw, dùng với crypto backend)."""
     wallet = get_wallet_info(name)
     if not wallet:
         raise Exception(f"Không tìm thấy ví {name}")
@@ -136,18 +185,17 @@ def get_private_key(name, passphrase):
 
     try:
         private_key_hex = _decrypt_private_key_hex(enc, passphrase, salt)
-        return SigningKey.from_string(bytes.fromhex(private_key_hex), curve=SECP256k1)
+        return bytes.fromhex(private_key_hex)
     except Exception as e:
         raise Exception(f"Sai passphrase hoặc ví bị lỗi: {str(e)}")
 
 
 def get_wallet_by_address(address):
     """Lấy thông tin ví từ địa chỉ."""
-    row = fetch_one("SELECT * FROM wallets WHERE address = ?", (address,))
-    if not row:
+    wallet = get_storage().get_wallet_by_address(address)
+    if not wallet:
         return None
     
-    wallet = dict(row)
     if "nonce" not in wallet or wallet["nonce"] is None:
         wallet["nonce"] = 0
     return wallet
@@ -156,14 +204,10 @@ def get_wallet_by_address(address):
 def increment_nonce(wallet_name):
     """ Tăng nonce lên 1 Hàm này được gọi từ transaction.py khi tạo giao dịch mới """
     try:
-        execute("""
-            UPDATE wallets 
-            SET nonce = COALESCE(nonce, 0) + 1 
-            WHERE name = ?
-        """, (wallet_name,))
+        get_storage().increment_nonce(wallet_name)
         return True
     except Exception as e:
-        print(f"⚠️  Error incrementing nonce: {e}")
+        logger.warning("⚠️  Error incrementing nonce: %s", e)
         return False
 
 
@@ -178,22 +222,20 @@ def get_wallet_nonce(wallet_name):
 def reset_wallet_nonce(wallet_name):
     """ Reset nonce về 0 (dành cho admin, test)"""
     try:
-        execute("UPDATE wallets SET nonce = 0 WHERE name = ?", (wallet_name,))
-        print(f"✅ Reset nonce for wallet '{wallet_name}'")
+        get_storage().update_wallet(wallet_name, nonce=0)
+        logger.info("✅ Reset nonce for wallet '%s'", wallet_name)
         return True
     except Exception as e:
-        print(f"❌ Error resetting nonce: {e}")
+        logger.error("❌ Error resetting nonce: %s", e)
         return False
 
 
 def load_wallets_from_file():
     """ Chỉ để backward compatibility  , Giờ dùng database thay vì file JSON
     """
-    print("⚠️  load_wallets_from_file() is deprecated. Using database instead.")
-    rows = fetch_all("SELECT * FROM wallets")
+    logger.warning("⚠️  load_wallets_from_file() is deprecated. Using database instead.")
     wallets = {}
-    for row in rows:
-        wallet = dict(row)
+    for wallet in get_storage().list_wallets():
         if "nonce" not in wallet or wallet["nonce"] is None:
             wallet["nonce"] = 0
         wallets[wallet["name"]] = wallet
@@ -203,7 +245,7 @@ def load_wallets_from_file():
 def get_wallet_stats():
     """ Lấy thống kê tổng quan về wallets """
     try:
-        rows = fetch_all("SELECT balance, nonce FROM wallets")
+        rows = get_storage().list_wallets()
         
         if not rows:
             return {
@@ -225,7 +267,7 @@ def get_wallet_stats():
             "max_nonce": max_nonce
         }
     except Exception as e:
-        print(f"⚠️  Error getting wallet stats: {e}")
+        logger.warning("⚠️  Error getting wallet stats: %s", e)
         return {
             "total_wallets": 0,
             "total_balance": 0,
@@ -308,7 +308,7 @@ Press Ctrl+C anytime to stop.
         
         print("\n🎯 Next Steps:")
         print("   1. Run security_tests.py for comprehensive testing")
-        print("   2. Run run_1000_accounts.py for scalability test")
+        print("   2. Run python -m benchmarks.harness for performance benchmarks")
         print("   3. Deploy to Ganache with deploy.py")
         
         print("\n🚀 System is production-ready!")
@@ -8,6 +8,8 @@ from core.transaction import (
 from core.verification import full_verification_flow
 from blockchain.blockchain import get_blockchain
 from core.fraud_detection import get_fraud_statistics
+from core import instrumentation, profiling
+from core.sweeper import start_sweeper
 
 def xoa_man_hinh():
     """Xóa màn hình terminal"""
@@ -29,7 +31,7 @@ def menu_chinh():
     print("8.  Thống kê hệ thống")
     print("9.  Thống kê bảo mật")
     print("10. Chạy kiểm tra bảo mật (Security Tests)")
-    print("11. Chạy kiểm tra giao dịch hàng loạt (Mass Test)")
+    print("11. Chạy benchmark hiệu năng")
     print("0.  Thoát chương trình")
     print("─"*70)
     return input(" Mời bạn chọn chức năng: ").strip()
@@ -327,13 +329,15 @@ def hien_thi_blockchain():
     print("="*70)
     
     blockchain = get_blockchain()
+    blockchain.refresh()  # block mới do process khác ghi
     
     if len(blockchain.chain) == 0:
         print(" Blockchain hiện đang trống.")
         return
     
     print(f"\n Tổng số khối: {len(blockchain.chain)}")
-    print(f" Tính hợp lệ của chuỗi: {'✓ HỢP LỆ' if blockchain.is_chain_valid() else '✗ KHÔNG HỢP LỆ'}")
+    print(f" Tính hợp lệ của chuỗi: {'✓ HỢP LỆ' if blockchain.is_chain_valid() else '✗ KHÔNG HỢP LỆ'}"
+          f" (đã kiểm tra đến khối #{blockchain.validated_height})")
     
     # Hiển thị các khối
     print(f"\n{'='*70}")
@@ -364,6 +368,14 @@ def hien_thi_blockchain():
     # Giao dịch đang chờ
     if len(blockchain.pending_transactions) > 0:
         print(f"\n⏳ Giao dịch đang chờ xử lý: {len(blockchain.pending_transactions)}")
+    
+    # Kiểm tra lại toàn bộ chuỗi (bỏ qua checkpoint) khi cần
+    if input("\n Kiểm tra toàn bộ chuỗi từ genesis? (y/N): ").strip().lower() == 'y':
+        ket_qua = blockchain.audit_chain()
+        if ket_qua['valid']:
+            print(f" ✓ HỢP LỆ - {ket_qua['blocks_checked']} khối trong {ket_qua['seconds']:.3f}s")
+        else:
+            print(f" ✗ KHÔNG HỢP LỆ - khối lỗi đầu tiên: #{ket_qua['first_invalid_height']}")
 
 def hien_thi_thong_ke_he_thong():
     """Hiển thị các số liệu thống kê của hệ thống"""
@@ -373,6 +385,7 @@ def hien_thi_thong_ke_he_thong():
     
     # Thống kê Blockchain
     blockchain = get_blockchain()
+    blockchain.refresh()
     thong_ke_bc = blockchain.get_blockchain_stats()
     
     print(f"\n⛓️  BLOCKCHAIN:")
@@ -413,6 +426,18 @@ def hien_thi_thong_ke_he_thong():
         for i, vi in enumerate(vi_da_sap_xep[:5], 1):
             print(f"   {i}. {vi['name']}: {vi['balance']:,} VND")
 
+    # Latency từng stage (instrumentation)
+    if instrumentation.is_enabled():
+        so_lieu = instrumentation.summary()
+        print(f"\n⏱️  LATENCY (ms):")
+        if not so_lieu['histograms']:
+            print("   - Chưa có số liệu")
+        for ten, h in so_lieu['histograms'].items():
+            print(f"   - {ten}: n={h['count']:,} p50={h['p50_ms']:.2f} "
+                  f"p95={h['p95_ms']:.2f} p99={h['p99_ms']:.2f}")
+        for ten, gia_tri in so_lieu['counters'].items():
+            print(f"   - {ten}: {gia_tri:,}")
+
 def hien_thi_thong_ke_bao_mat():
     """Hiển thị các thống kê liên quan đến bảo mật"""
     print("\n" + "="*70)
@@ -469,77 +494,38 @@ def chay_kiem_tra_bao_mat():
         print(f" Lỗi khi chạy kiểm tra: {e}")
         traceback.print_exc()
 
-def chay_kiem_tra_giao_dich_hang_loat():
-    """Chạy kiểm tra hiệu năng với số lượng lớn giao dịch"""
+def chay_benchmark():
+    """Chạy benchmark harness (các scenario có tên, workload theo seed)"""
     print("\n" + "="*70)
-    print(" KIỂM TRA GIAO DỊCH HÀNG LOẠT")
+    print(" BENCHMARK HIỆU NĂNG")
     print("="*70)
     
-    print("\nChọn chế độ kiểm tra:")
-    print("1. Nhanh (100 tài khoản, 1,000 giao dịch)")
-    print("2. Vừa (1,000 tài khoản, 10,000 giao dịch)")
-    print("3. Nặng (5,000 tài khoản, 50,000 giao dịch)")
-    print("4. Tùy chỉnh")
+    print("\nChọn chế độ:")
+    print("1. Nhanh (scale 0.2, 2 lần lặp)")
+    print("2. Chuẩn (scale 1.0, 3 lần lặp)")
+    print("3. Chuẩn + so sánh với baseline")
+    print("4. Chuẩn + lưu làm baseline")
     
     lua_chon = input("\n Nhập lựa chọn: ").strip()
     
-    if lua_chon not in ['1', '2', '3', '4']:
+    tham_so = {
+        '1': ["--scale", "0.2", "--repeats", "2"],
+        '2': [],
+        '3': ["--compare"],
+        '4': ["--save-baseline"],
+    }.get(lua_chon)
+    if tham_so is None:
         print(" Lựa chọn không hợp lệ.")
         return
     
     try:
-        from tests.run_1000_accounts import MassTransactionTester
-        
-        # Lấy tham số kiểm tra
-        if lua_chon == '1':
-            so_tai_khoan, so_giao_dich = 100, 1000
-        elif lua_chon == '2':
-            so_tai_khoan, so_giao_dich = 1000, 10000
-        elif lua_chon == '3':
-            so_tai_khoan, so_giao_dich = 5000, 50000
-        else:  # Tùy chỉnh
-            try:
-                so_tai_khoan = int(input("Nhập số lượng tài khoản: "))
-                so_giao_dich = int(input("Nhập số lượng giao dịch: "))
-            except ValueError:
-                print(" Dữ liệu nhập không hợp lệ!")
-                return
-        
-        print(f"\n Bắt đầu kiểm tra với {so_tai_khoan} tài khoản và {so_giao_dich} giao dịch...")
-        
-        # Khởi tạo bộ kiểm tra
-        bo_kiem_tra = MassTransactionTester(so_tai_khoan)
-        bo_kiem_tra.create_mass_accounts()
+        from benchmarks.harness import main as chay_harness
         
-        # Chạy kiểm tra
-        if so_giao_dich > 0:
-            print("\n" + "="*70)
-            print("GIAI ĐOẠN 1: KIỂM TRA TUẦN TỰ")
-            print("="*70)
-            bo_kiem_tra.run_sequential_test(so_giao_dich // 2)
-            
-            print("\n" + "="*70)
-            print("GIAI ĐOẠN 2: KIỂM TRA ĐỒNG THỜI")
-            print("="*70)
-            bo_kiem_tra.run_concurrent_test(so_giao_dich // 2, max_workers=20)
-        
-        print("\n" + "="*70)
-        print("GIAI ĐOẠN 3: MÔ PHỎNG TẤN CÔNG BẢO MẬT")
-        print("="*70)
-        bo_kiem_tra.simulate_double_spending_attack(100)
-        bo_kiem_tra.simulate_replay_attacks(50)
-        
-        print("\n" + "="*70)
-        print("KẾT QUẢ CUỐI CÙNG")
-        print("="*70)
-        bo_kiem_tra.print_stats()
-        bo_kiem_tra.save_report()
-        
-        print("\n✅ Kiểm tra hàng loạt hoàn tất!")
+        if chay_harness(tham_so) == 1:
+            print("\n⚠️  Phát hiện regression so với baseline!")
+        else:
+            print("\n✅ Benchmark hoàn tất!")
         
-    except ImportError:
-        print(" Lỗi: Không thể nhập mô-đun 'run_1000_accounts.py'!")
-        print(" Vui lòng đảm bảo file run_1000_accounts.py nằm trong thư mục hiện tại.")
     except Exception as e:
         print(f" Lỗi: {e}")
         traceback.print_exc()
@@ -573,7 +559,7 @@ def ham_chinh():
         elif lua_chon == "10":
             chay_kiem_tra_bao_mat()
         elif lua_chon == "11":
-            chay_kiem_tra_giao_dich_hang_loat()
+            chay_benchmark()
         elif lua_chon == "0":
             print("\n👋 Tạm biệt!")
             break
@@ -583,6 +569,9 @@ def ham_chinh():
         input("\n⏎ Nhấn Enter để tiếp tục...")
 
 if __name__ == "__main__":
+    # python main.py --profile[=cprofile|sample]
+    profiling.enable_from_argv()
+    start_sweeper()
     try:
         ham_chinh()
     except KeyboardInterrupt:
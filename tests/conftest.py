@@ -0,0 +1,38 @@
+"""
+Fixture dùng chung: mỗi test chạy trong thư mục tạm riêng (data/system.db,
+data/archive, data/blocks... đều là đường dẫn tương đối) với storage riêng.
+"""
+import os
+
+# Trước khi import core / blockchain: không log ra console, không thread poll chain / sweeper
+os.environ.setdefault("ECDSA_LOG_SILENT", "1")
+os.environ.setdefault("ECDSA_CHAIN_POLL_INTERVAL", "0")
+os.environ.setdefault("ECDSA_SWEEP_INTERVAL", "0")
+
+import pytest
+
+from core.storage import use_storage
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sqlite_storage(workdir):
+    with use_storage("sqlite") as storage:
+        yield storage
+
+
+@pytest.fixture
+def memory_storage(workdir):
+    with use_storage("memory") as storage:
+        yield storage
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request, workdir):
+    with use_storage(request.param) as backend:
+        yield backend
@@ -11,19 +11,24 @@ try:
     from core.transaction import create_transaction, sign_transaction
     from core.verification import full_verification_flow
     from core.fraud_detection import check_fraud
+    from core.storage import set_storage
     from blockchain.blockchain import get_blockchain
 except ImportError:
     from core.wallet import create_wallet, get_wallet_info
     from core.transaction import create_transaction, sign_transaction
     from core.verification import full_verification_flow
     from core.fraud_detection import check_fraud
+    from core.storage import set_storage
     from blockchain.blockchain import get_blockchain
 
 
 class SecurityTestSuite:
     """Bộ test bảo mật chuyên sâu"""
     
-    def __init__(self):
+    def __init__(self, storage=None):
+        # storage: "sqlite" | "memory" - chọn engine trước khi load blockchain
+        if storage:
+            set_storage(storage)
         self.blockchain = get_blockchain()
         self.test_results = []
         self.test_wallets = {}
@@ -185,8 +190,7 @@ class SecurityTestSuite:
         time.sleep(2)
         
         # Thử replay cùng transaction (thay đổi timestamp để fake)
-        tx_replayed = tx.copy()
-        tx_replayed["timestamp"] = datetime.now().isoformat()
+        tx_replayed = tx.replace(timestamp=datetime.now().isoformat())
         
         # Save transaction replay
         from core.transaction import save_transaction
@@ -229,7 +233,7 @@ class SecurityTestSuite:
         
         # Tamper with signature
         tampered_signature = original_signature[:-10] + "deadbeef12"
-        tx["signature"] = tampered_signature
+        tx = tx.replace(signature=tampered_signature)
         
         print(f"🔧 Tampered signature: {tampered_signature[:20]}...")
         
@@ -365,7 +369,7 @@ class SecurityTestSuite:
                                from_wallet["address"], to_wallet["address"])
         
         # Override timestamp
-        tx["timestamp"] = old_time.isoformat()
+        tx = tx.replace(timestamp=old_time.isoformat())
         
         tx = sign_transaction(tx, from_user, passphrase)
         
@@ -401,7 +405,7 @@ class SecurityTestSuite:
         
         tx = create_transaction(from_user, to_user, amount,
                                from_wallet["address"], to_wallet["address"])
-        tx["timestamp"] = future_time.isoformat()
+        tx = tx.replace(timestamp=future_time.isoformat())
         
         tx = sign_transaction(tx, from_user, passphrase)
         
@@ -495,5 +499,7 @@ class SecurityTestSuite:
 
 
 if __name__ == "__main__":
-    suite = SecurityTestSuite()
+    import sys
+    # python -m tests.security_tests [sqlite|memory]
+    suite = SecurityTestSuite(storage=sys.argv[1] if len(sys.argv) > 1 else None)
     suite.run_all_tests()
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Test archive body block (core/archive.py + SQLiteStorage.archive_blocks):
+body đã archive đọc lại qua _attach_archived giống hệt bản trong SQLite.
+
+Chạy: python -m pytest tests/test_archive.py
+"""
+import pytest
+
+import core.database as database
+from core.archive import BlockArchive, encode_body
+from core.database import get_connection
+from blockchain.blockchain import Block
+
+
+def _blocks(count, start=0):
+    blocks = []
+    previous_hash = "0"
+    for index in range(start, start + count):
+        transactions = [
+            {"id": f"tx_{index}_{i}", "from": "alice", "to": "bob", "amount": 100 * index + i,
+             "nonce": i, "status": "verified", "note": "Chuyển tiền 💸", "executed": 1}
+            for i in range(index % 4)
+        ]
+        block = Block(index, transactions, 1760868000.0 + index, previous_hash)
+        previous_hash = block.hash
+        blocks.append(block.to_dict())
+    return blocks
+
+
+def _body_rows(block_index):
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM block_transactions WHERE block_index = ?",
+                            (block_index,)).fetchone()[0]
+
+
+@pytest.mark.parametrize("codec", ["json", "binary"])
+def test_archived_body_round_trips_through_load_paths(sqlite_storage, monkeypatch, codec):
+    monkeypatch.setattr(database, "TX_CODEC", codec)
+    blocks = _blocks(12)
+    for block in blocks:
+        sqlite_storage.insert_block(block)
+
+    # Block 0..8 sâu hơn depth 3 (block rỗng không có dòng nào để archive)
+    archived = sqlite_storage.archive_blocks(3)
+    assert archived == sum(1 for b in blocks[:9] if b["transactions"])
+    assert all(_body_rows(b["index"]) == 0 for b in blocks[:9])
+    assert _body_rows(11) == 3
+    assert sqlite_storage.archive.disk_usage() > 0
+
+    assert sqlite_storage.load_block_range(0, 12) == blocks
+    assert sqlite_storage.load_block_range(5, 7) == blocks[5:7]
+    assert sqlite_storage.load_all_blocks() == blocks
+    assert [b for chunk in sqlite_storage.iter_blocks(0, chunk_size=5) for b in chunk] == blocks
+
+    # Tip cũng archive được (depth 0) và get_latest_block vẫn trả body
+    sqlite_storage.archive_blocks(0)
+    assert _body_rows(11) == 0
+    assert sqlite_storage.get_latest_block() == blocks[-1]
+    assert sqlite_storage.archive_blocks(0) == 0
+
+
+def test_save_block_replaces_archived_body(sqlite_storage):
+    blocks = _blocks(4)
+    for block in blocks:
+        sqlite_storage.insert_block(block)
+    sqlite_storage.archive_blocks(0)
+
+    replaced = dict(blocks[3], transactions=[{"id": "tx_new", "amount": 1}])
+    assert sqlite_storage.save_block(replaced)
+    assert sqlite_storage.load_block_range(3, 4) == [replaced]
+    assert sqlite_storage.load_block_range(0, 3) == blocks[:3]
+
+
+def test_segment_rollover_and_truncated_record(workdir):
+    archive = BlockArchive(str(workdir / "archive"), segment_max_bytes=64, codec="zlib")
+    bodies = [encode_body(['{"id": "tx_%d", "pad": "%s"}' % (i, "x" * 100)]) for i in range(4)]
+    locations = archive.append(bodies[:2]) + archive.append(bodies[2:])
+    assert {location[0] for location in locations} == {0, 1}
+    for i, location in enumerate(locations):
+        assert archive.read(*location) == [{"id": f"tx_{i}", "pad": "x" * 100}]
+
+    segment, offset, length, codec = locations[-1]
+    with pytest.raises(LookupError):
+        archive.read(segment, offset, length + 1, codec)
@@ -0,0 +1,131 @@
+"""
+Test ASGI app (asgi.py) + AsyncTransactionService (core/async_api.py): các
+route JSON chạy qua executor, body không phải JSON object / thiếu field trả
+400 thay vì 500, lifespan startup / shutdown.
+
+Chạy: python -m pytest tests/test_asgi.py
+"""
+import json
+import asyncio
+
+import pytest
+
+import asgi
+from core.async_api import get_async_service, close_async_service
+
+
+@pytest.fixture
+def service(storage):
+    yield get_async_service()
+    close_async_service()
+
+
+async def _request(method, path, body=None, query=b""):
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    messages = [{"type": "http.request", "body": body or b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query}
+    await asgi.app(scope, receive, send)
+    start, response = sent
+    headers = dict(start["headers"])
+    if headers[b"content-type"] == b"application/json":
+        return start["status"], json.loads(response["body"])
+    return start["status"], response["body"]
+
+
+def call(method, path, body=None, query=b""):
+    return asyncio.run(_request(method, path, body, query))
+
+
+@pytest.mark.parametrize("path", [
+    "/api/create-wallet", "/api/create-transaction",
+    "/api/transactions/batch", "/api/verify-transaction",
+])
+@pytest.mark.parametrize("body", [[], 1, "x", None, b"{not json"])
+def test_non_object_body_is_400(service, path, body):
+    status, payload = call("POST", path, json.dumps(body).encode() if not isinstance(body, bytes) else body)
+    assert status == 400 and "error" in payload
+
+
+def test_missing_fields_are_400(service):
+    assert call("POST", "/api/create-wallet", {"name": "alice"})[0] == 400
+    assert call("POST", "/api/verify-transaction", {})[0] == 400
+    assert call("POST", "/api/verify-transaction", {"tx_id": 5})[0] == 400
+    assert call("POST", "/api/transactions/batch", {"transfers": []})[0] == 400
+    assert call("POST", "/api/create-transaction", {
+        "from_user": "a", "to_user": "b", "amount": "abc", "passphrase": "p",
+    }) == (400, {"error": "Số tiền không hợp lệ"})
+    assert call("GET", "/api/wallet-info")[0] == 400
+    assert call("GET", "/api/transaction-proof")[0] == 400
+    assert call("GET", "/api/nope") == (404, {"error": "Not found"})
+
+
+def test_wallet_transaction_verify_round_trip(service):
+    for name in ("alice", "bob"):
+        status, wallet = call("POST", "/api/create-wallet", {"name": name, "passphrase": "pw"})
+        assert status == 200 and wallet["name"] == name
+
+    status, wallets = call("GET", "/api/wallets")
+    assert status == 200 and set(wallets) == {"alice", "bob"}
+    assert "encrypted_private_key" not in wallets["alice"]
+
+    assert call("POST", "/api/create-transaction", {
+        "from_user": "alice", "to_user": "carol", "amount": 5, "passphrase": "pw",
+    })[0] == 404
+    status, tx = call("POST", "/api/create-transaction", {
+        "from_user": "alice", "to_user": "bob", "amount": 250, "passphrase": "pw",
+    })
+    assert status == 200 and tx["status"] == "signed"
+
+    status, result = call("POST", "/api/verify-transaction", {"tx_id": tx["id"]})
+    assert status == 200 and result["valid"] and result["transaction_status"] == "verified"
+    status, result = call("POST", "/api/verify-transaction", {"tx_id": "missing"})
+    assert status == 200 and result["transaction_status"] == "not_found"
+
+    status, info = call("GET", "/api/wallet-info", query=b"name=bob")
+    assert status == 200 and info["balance"] == 1000000 + 250
+    status, listed = call("GET", "/api/transactions")
+    assert [(t["id"], t["status"], t["executed"]) for t in listed] == [(tx["id"], "verified", 1)]
+    status, stats = call("GET", "/api/fraud-statistics")
+    assert status == 200 and stats["verified_transactions"] == 1 and stats["total_wallets"] == 2
+
+    status, body = call("GET", "/metrics")
+    assert status == 200 and b"ecdsa_verification_seconds" in body
+    status, body = call("GET", "/")
+    assert status == 200 and body.lstrip().lower().startswith(b"<!doctype html")
+
+
+def test_async_service_verify_and_existing_wallet(service):
+    async def scenario():
+        first = await service.create_wallet("alice", "pw")
+        again = await service.create_wallet("alice", "other")
+        early = await service.verify_transaction("missing")
+        return first, again, early
+
+    first, again, early = asyncio.run(scenario())
+    assert again["address"] == first["address"]
+    assert early["transaction_status"] == "not_found" and not early["valid"]
+
+
+def test_lifespan_startup_and_shutdown(storage, monkeypatch):
+    monkeypatch.setattr(asgi, "_index_html", None)
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(asgi.app({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert asgi._index_html is not None
@@ -0,0 +1,71 @@
+"""
+Test audit song song (blockchain/audit.py): chain hợp lệ qua process pool và
+trong process, dừng ở block lỗi đầu tiên (bị sửa, thiếu block, proof of work
+không đạt), mã thoát CLI.
+
+Chạy: python -m pytest tests/test_audit.py
+"""
+import pytest
+
+import core.database as database
+from blockchain.audit import audit_chain, main
+from blockchain.blockchain import Blockchain
+
+
+def _mine_chain(count=12):
+    chain = Blockchain(difficulty=1)
+    for b in range(count):
+        chain.add_transaction({
+            "id": f"tx_{b}", "from": "alice", "to": "bob", "sender": "alice",
+            "receiver": "bob", "amount": 10 + b, "nonce": b, "status": "verified",
+        })
+        assert chain.mine_pending_transactions("miner") is not None
+
+
+@pytest.fixture
+def mined(storage):
+    _mine_chain()
+    return storage
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_valid_chain(mined, workers):
+    report = audit_chain(workers=workers, chunk_size=5)
+    assert report["valid"] and report["error"] is None
+    assert report["blocks_checked"] == 13
+    assert report["first_invalid_height"] is None
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_stops_at_first_tampered_block(mined, workers):
+    for index in (7, 11):
+        block = mined.load_block_range(index, index + 1)[0]
+        block["transactions"][0]["amount"] = 10 ** 6
+        assert mined.save_block(block)
+
+    report = audit_chain(workers=workers, chunk_size=3)
+    assert not report["valid"]
+    assert (report["first_invalid_height"], report["error"]) == (7, "invalid hash")
+    assert report["blocks_checked"] == 8
+
+
+def test_missing_block(sqlite_storage):
+    _mine_chain()
+    database.execute("DELETE FROM blocks WHERE index_number = 5")
+    report = audit_chain(workers=2, chunk_size=4)
+    assert (report["first_invalid_height"], report["error"]) == (5, "missing block")
+
+
+def test_proof_of_work_checked_against_difficulty(mined):
+    # Difficulty cao hơn lúc mine -> proof of work không đạt
+    report = audit_chain(workers=0, difficulty=64)
+    assert (report["first_invalid_height"], report["error"]) == (1, "invalid proof of work")
+
+
+def test_cli_exit_code(mined, capsys):
+    assert main(["--workers", "0"]) == 0
+    block = mined.load_block_range(2, 3)[0]
+    block["timestamp"] += 1
+    mined.save_block(block)
+    assert main(["--workers", "0", "--chunk-size", "2"]) == 1
+    assert "#2" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+"""
+Test batch transfer (core/batch.py): prepare / commit, số dư mô phỏng theo
+thứ tự batch, nonce liên tiếp, item lỗi không ảnh hưởng item khác, rollback
+khi ghi chuyển khoản lỗi giữa chừng, async API chạy từng bước đúng executor.
+
+Chạy: python -m pytest tests/test_batch.py
+"""
+import asyncio
+import threading
+
+import pytest
+
+from core.async_api import get_async_service, close_async_service
+from core.batch import prepare_batch, commit_batch, submit_batch
+from core.database import get_connection
+from core.wallet import create_wallet
+
+
+@pytest.fixture
+def wallets(storage):
+    create_wallet("alice", "pw-a", 100)
+    create_wallet("bob", "pw-b", 50)
+    create_wallet("carol", "pw-c", 0)
+    return storage
+
+
+def _balances(storage):
+    return {name: storage.get_wallet(name)["balance"] for name in ("alice", "bob", "carol")}
+
+
+def test_prepare_commit_mixed_batch(wallets):
+    transfers = [
+        {"from_user": "alice", "to_user": "bob", "amount": 60},
+        {"from_user": "alice", "to_user": "carol", "amount": 60},       # không đủ sau item 0
+        {"from_user": "bob", "to_user": "carol", "amount": 100},        # đủ nhờ item 0
+        {"from_user": "alice", "to_user": "carol", "amount": "abc"},
+        {"from_user": "alice", "to_user": "dave", "amount": 1},
+        {"from_user": "carol", "to_user": "alice", "amount": 1, "passphrase": "sai"},
+        "not an object",
+        {"from_user": "alice", "to_user": "carol", "amount": 40},
+    ]
+    plan = prepare_batch(transfers, {"alice": "pw-a", "bob": "pw-b"})
+    # Chưa ghi gì ngoài nonce đặt trước
+    assert wallets.count_transactions() == 0
+    assert _balances(wallets) == {"alice": 100, "bob": 50, "carol": 0}
+
+    summary = commit_batch(plan)
+    assert [r["status"] for r in summary["results"]] == [
+        "verified", "rejected", "verified", "invalid", "invalid", "invalid", "invalid", "verified",
+    ]
+    assert (summary["total"], summary["verified"], summary["rejected"], summary["invalid"]) == (8, 3, 1, 4)
+    assert _balances(wallets) == {"alice": 0, "bob": 10, "carol": 140}
+
+    # Nonce liên tiếp theo thứ tự batch; item invalid không được cấp nonce
+    alice = sorted(tx.nonce for tx in wallets.list_transactions(sender="alice"))
+    assert alice == [0, 1, 2]
+    assert wallets.get_wallet("alice")["nonce"] == 3
+    assert wallets.get_wallet("carol")["nonce"] == 0
+
+
+def test_execution_failure_only_rejects_that_item(wallets):
+    plan = prepare_batch([
+        {"from_user": "alice", "to_user": "bob", "amount": 30},
+        {"from_user": "bob", "to_user": "carol", "amount": 50},
+    ], {"alice": "pw-a", "bob": "pw-b"})
+    # bob tiêu tiền giữa lúc prepare và commit
+    wallets.execute_transfer("external", "bob", "carol", 40)
+
+    summary = commit_batch(plan)
+    assert [r["status"] for r in summary["results"]] == ["verified", "rejected"]
+    assert summary["results"][1]["message"].startswith("Execution failed")
+    assert _balances(wallets) == {"alice": 70, "bob": 40, "carol": 40}
+    statuses = {tx.id: tx.status for tx in wallets.list_transactions()}
+    assert sorted(statuses.values()) == ["rejected", "verified"]
+
+
+def test_database_error_rolls_back_whole_transfer_set(sqlite_storage):
+    create_wallet("alice", "pw-a", 100)
+    create_wallet("bob", "pw-b", 0)
+    create_wallet("carol", "pw-c", 0)
+    with get_connection() as conn:
+        conn.execute("""
+            CREATE TRIGGER fail_carol BEFORE UPDATE OF balance ON wallets
+            WHEN NEW.name = 'carol' BEGIN SELECT RAISE(ABORT, 'disk full'); END
+        """)
+
+    summary = submit_batch([
+        {"from_user": "alice", "to_user": "bob", "amount": 10},
+        {"from_user": "alice", "to_user": "carol", "amount": 10},
+    ], {"alice": "pw-a"})
+    assert [r["status"] for r in summary["results"]] == ["rejected", "rejected"]
+    assert all("Database error" in r["message"] for r in summary["results"])
+    # Chuyển khoản đầu tiên đã chạy trong transaction cũng bị rollback
+    assert _balances(sqlite_storage) == {"alice": 100, "bob": 0, "carol": 0}
+
+
+def test_async_batch_reserves_nonces_on_writer(wallets, monkeypatch):
+    threads = {}
+    reserve_nonces = wallets.reserve_nonces
+
+    def spy(name, count=1):
+        threads[name] = threading.current_thread().name
+        return reserve_nonces(name, count)
+
+    monkeypatch.setattr(wallets, "reserve_nonces", spy)
+    service = get_async_service()
+    try:
+        summary = asyncio.run(service.submit_batch([
+            {"from_user": "alice", "to_user": "bob", "amount": 10},
+            {"from_user": "bob", "to_user": "carol", "amount": 10},
+        ], {"alice": "pw-a", "bob": "pw-b"}))
+    finally:
+        close_async_service()
+
+    assert summary["verified"] == 2
+    assert set(threads) == {"alice", "bob"}
+    assert all(name.startswith("db-writer") for name in threads.values())
+
+
+def test_batch_size_limit(wallets):
+    with pytest.raises(ValueError):
+        prepare_batch([{}] * 1001)
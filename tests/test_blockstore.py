@@ -0,0 +1,233 @@
+"""
+Test block store mmap (core/blockstore.py) và chế độ ECDSA_BLOCK_STORE=mmap
+của SQLiteStorage: round-trip, entry ghi dở, segment mới, ghi đè / commit lỗi,
+đối chiếu với SQLite chỉ ở chain writer.
+
+Chạy: python -m pytest tests/test_blockstore.py
+"""
+import os
+import json
+import sqlite3
+
+import pytest
+
+import core.database as database
+from core.blockstore import MmapBlockStore, PAYLOAD_BINARY, PAYLOAD_JSON
+from core.database import SQLiteStorage, BLOCK_STORE_DIR
+from core.storage import use_storage
+from blockchain.blockchain import Block
+from blockchain.leader import LeaderLock
+from blockchain.service import ChainService
+
+
+def _blocks(count, start=0, tag="a"):
+    blocks = []
+    previous_hash = "0"
+    for index in range(start, start + count):
+        transactions = [
+            {"id": f"tx_{tag}_{index}_{i}", "from": "alice", "to": "bob",
+             "amount": 100 * index + i, "nonce": i, "status": "verified", "executed": 1}
+            for i in range(index % 3 + 1)
+        ]
+        block = Block(index, transactions, 1760868000.0 + index, previous_hash)
+        previous_hash = block.hash
+        blocks.append(block.to_dict())
+    return blocks
+
+
+def _json(value):
+    return json.loads(json.dumps(value))
+
+
+def _index_bytes(directory):
+    with open(os.path.join(directory, "blocks.idx"), "rb") as f:
+        return f.read()
+
+
+# ------------------ MmapBlockStore ------------------ #
+
+@pytest.mark.parametrize("payload", [PAYLOAD_JSON, PAYLOAD_BINARY])
+def test_put_record_truncate_round_trip(workdir, payload):
+    store = MmapBlockStore(str(workdir / "blocks"), payload=payload)
+    blocks = _blocks(5)
+    for block in blocks:
+        assert store.put(block) is None
+
+    assert len(store) == 5
+    assert [store.get(i) for i in range(5)] == _json(blocks)
+    assert store.load_range(1, 4) == _json(blocks[1:4])
+    header = store.header(2)
+    assert header["hash"] == blocks[2]["hash"] and header["tx_count"] == 3
+    kind, views = store.transaction_views(2)
+    assert kind == payload and len(views) == 3
+
+    size = len(_index_bytes(store.directory))
+    store.truncate(3)
+    assert len(store) == 3
+    # Không co file index (process khác có thể đang mmap nó)
+    assert len(_index_bytes(store.directory)) == size
+    assert store.entry(3) is None
+    with pytest.raises(LookupError):
+        store.get(4)
+    assert store.load_range(0, 5) == _json(blocks[:3])
+    assert store.missing(5) == [3, 4]
+
+    store.put(blocks[3])
+    assert len(store) == 4 and store.get(3) == _json(blocks[3])
+
+
+def test_torn_index_entry_ignored_and_overwritten(workdir):
+    directory = str(workdir / "blocks")
+    store = MmapBlockStore(directory)
+    blocks = _blocks(4)
+    for block in blocks[:3]:
+        store.put(block)
+    with open(os.path.join(directory, "blocks.idx"), "ab") as f:
+        f.write(b"\x01\x02\x03\x04\x05")  # crash giữa lúc ghi entry
+
+    before = _index_bytes(directory)
+    reopened = MmapBlockStore(directory)
+    assert _index_bytes(directory) == before  # mở store không sửa file
+    assert len(reopened) == 3
+    assert reopened.load_range(0, 10) == _json(blocks[:3])
+
+    reopened.put(blocks[3])
+    assert len(_index_bytes(directory)) == 4 * 16
+    assert reopened.load_range(0, 10) == _json(blocks)
+
+
+def test_segment_rollover(workdir):
+    store = MmapBlockStore(str(workdir / "blocks"), segment_max_bytes=600)
+    blocks = _blocks(12)
+    for block in blocks:
+        store.put(block)
+    segments = sorted(name for name in os.listdir(store.directory) if name.startswith("segment_"))
+    assert len(segments) > 2
+    assert len({store.entry(i)[0] for i in range(12)}) == len(segments)
+    assert store.load_range(0, 12) == _json(blocks)
+    assert store.disk_usage() > 0
+
+
+def test_overwrite_and_restore_entry(workdir):
+    store = MmapBlockStore(str(workdir / "blocks"))
+    original, replacement = _blocks(1)[0], _blocks(1, tag="b")[0]
+    assert store.put(original) is None
+    previous = store.put(replacement)
+    assert previous is not None and store.get(0) == _json(replacement)
+    store.restore(0, previous)
+    assert store.get(0) == _json(original)
+    store.restore(0, None)
+    assert len(store) == 0
+
+
+# ------------------ SQLiteStorage, ECDSA_BLOCK_STORE=mmap ------------------ #
+
+@pytest.fixture
+def mmap_storage(workdir, monkeypatch):
+    monkeypatch.setattr(database, "BLOCK_STORE", "mmap")
+    with use_storage("sqlite") as storage:
+        yield storage
+
+
+class _FailingCommit:
+    """Connection có commit() lỗi (vd. disk I/O) - các lệnh khác chạy thật"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def commit(self):
+        raise sqlite3.OperationalError("disk I/O error")
+
+
+def test_save_block_overwrite(mmap_storage):
+    blocks = _blocks(3)
+    for block in blocks:
+        mmap_storage.insert_block(block)
+    # Body chỉ nằm trong store
+    assert database.fetch_one("SELECT COUNT(*) AS n FROM block_transactions")["n"] == 0
+
+    replaced = dict(_blocks(3, tag="b")[2], hash=blocks[2]["hash"])
+    assert mmap_storage.save_block(replaced)
+    assert mmap_storage.load_block_range(0, 3) == _json(blocks[:2] + [replaced])
+    assert mmap_storage.get_latest_block() == _json(replaced)
+    assert mmap_storage.load_all_blocks() == _json(blocks[:2] + [replaced])
+
+
+def test_failed_commit_restores_store_entry(mmap_storage, monkeypatch):
+    blocks = _blocks(3)
+    for block in blocks[:2]:
+        mmap_storage.insert_block(block)
+    entry = mmap_storage.block_store.entry(1)
+
+    real_connection = database.get_connection
+    monkeypatch.setattr(database, "get_connection", lambda: _FailingCommit(real_connection()))
+
+    # save_block ghi đè: entry cũ được trả lại, body cũ vẫn đọc được
+    assert not mmap_storage.save_block(dict(_blocks(2, tag="b")[1], hash=blocks[1]["hash"]))
+    assert mmap_storage.block_store.entry(1) == entry
+    # insert_block block mới: entry bị bỏ
+    with pytest.raises(sqlite3.OperationalError):
+        mmap_storage.insert_block(blocks[2])
+    assert mmap_storage.block_store.entry(2) is None
+
+    monkeypatch.setattr(database, "get_connection", real_connection)
+    assert mmap_storage.get_max_block_index() == 1
+    assert mmap_storage.load_block_range(0, 3) == _json(blocks[:2])
+
+
+def test_opening_storage_never_mutates_store(mmap_storage):
+    blocks = _blocks(3)
+    for block in blocks[:2]:
+        mmap_storage.insert_block(block)
+    # Leader đang ở giữa put() và commit của block #2
+    mmap_storage.block_store.put(blocks[2])
+    before = _index_bytes(BLOCK_STORE_DIR)
+
+    follower = SQLiteStorage()  # web worker / CLI / audit worker
+    assert _index_bytes(BLOCK_STORE_DIR) == before
+    assert follower.block_store.entry(2) is not None
+
+
+def test_writer_sync_reconciles_store_with_sqlite(workdir, monkeypatch):
+    # Block ghi khi chưa bật mmap: body nằm trong block_transactions
+    blocks = _blocks(5)
+    with use_storage("sqlite") as storage:
+        for block in blocks:
+            storage.insert_block(block)
+
+    monkeypatch.setattr(database, "BLOCK_STORE", "mmap")
+    with use_storage("sqlite") as storage:
+        store = storage.block_store
+        # Entry mồ côi: block #7 vào store nhưng commit SQLite lỗi (crash)
+        store.put(_blocks(1, start=7, tag="x")[0])
+        assert store.missing(5) == [0, 1, 2, 3, 4]
+
+        # Trước khi writer sync: đọc vẫn đủ (phần thiếu lấy từ SQLite)
+        assert storage.load_block_range(0, 5) == blocks
+        assert storage.get_latest_block() == blocks[-1]
+
+        # Follower (writer lock đang bị process khác giữ) không đụng tới store
+        lock_path = str(workdir / "data" / "chain.lock")
+        holder = LeaderLock(lock_path)
+        assert holder.try_acquire()
+        follower = ChainService(leader_lock=LeaderLock(lock_path, retry_interval=0), poll_interval=0)
+        assert not follower.is_leader()
+        assert store.missing(5) == [0, 1, 2, 3, 4] and store.entry(7) is not None
+
+        # Lên writer -> sync một lần trước khi được ghi
+        holder.release()
+        assert follower.is_leader()
+        assert store.missing(8) == [5, 6, 7]
+        assert len(store) == 5
+        assert store.load_range(0, 5) == _json(blocks)
+        assert storage.sync_block_store() == 0
+        follower.close()
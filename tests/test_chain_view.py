@@ -0,0 +1,121 @@
+"""
+Test chain lazy (blockchain/chain_view.py + Blockchain.load_blockchain):
+khởi động chỉ đọc header, body đọc khi cần, cửa sổ LRU theo số block / byte,
+quét cả chain không đẩy block mới ra khỏi cache.
+
+Chạy: python -m pytest tests/test_chain_view.py
+"""
+import pytest
+
+import core.database as database
+from blockchain.blockchain import Block, Blockchain
+from core.storage import body_size
+
+
+def _mine_blocks(chain, count, offset=0):
+    for b in range(count):
+        for i in range(b % 3 + 1):
+            n = offset + b * 10 + i
+            chain.add_transaction({
+                "id": f"tx_{n}", "from": "alice", "to": "bob", "sender": "alice",
+                "receiver": "bob", "amount": 10 + n, "nonce": n, "status": "verified",
+            })
+        assert chain.mine_pending_transactions("miner") is not None
+
+
+@pytest.fixture
+def mined(storage):
+    chain = Blockchain(difficulty=1)
+    _mine_blocks(chain, 12)
+    return storage, chain
+
+
+def test_cold_start_reads_headers_only(mined, monkeypatch):
+    storage, original = mined
+    calls = {"bodies": 0, "hashes": 0}
+    load_block_range = storage.load_block_range
+    pow_hash = Block._pow_hash
+
+    def count_bodies(start, stop):
+        calls["bodies"] += 1
+        return load_block_range(start, stop)
+
+    def count_hashes(block):
+        calls["hashes"] += 1
+        return pow_hash(block)
+
+    monkeypatch.setattr(storage, "load_block_range", count_bodies)
+    monkeypatch.setattr(Block, "_pow_hash", count_hashes)
+
+    chain = Blockchain(difficulty=1)
+    assert calls == {"bodies": 0, "hashes": 0}
+    assert chain.chain.cache_info()["cached_blocks"] == 0
+    assert len(chain.chain) == len(original.chain) == 13
+    assert chain.total_transactions == original.total_transactions
+    assert chain.chain.header(-1).hash == original.chain[-1].hash
+    assert chain.is_chain_valid()
+
+    # Body đọc khi cần, hash giữ đúng giá trị đã lưu (không hash lại)
+    assert chain.get_latest_block().to_dict() == original.chain[-1].to_dict()
+    assert calls["bodies"] == 1 and calls["hashes"] == 0
+
+    # Reward cần body -> chỉ tính ở lần đầu được hỏi, sau đó cộng dồn
+    assert chain.total_mining_rewards == original.total_mining_rewards
+    assert chain.mining_rewards_count == 12
+    _mine_blocks(chain, 1, offset=500)
+    assert chain.mining_rewards_count == 13
+
+
+def test_window_eviction_and_reload(mined):
+    _, original = mined
+    chain = Blockchain(difficulty=1, cache_blocks=3)
+    for index in (2, 4, 6, 8):
+        chain.chain[index]
+    info = chain.chain.cache_info()
+    assert info["cached_blocks"] == 3
+    assert info["cached_bytes"] == sum(chain.chain.header(i).body_bytes for i in (4, 6, 8))
+
+    # Block đã bị đẩy ra đọc lại từ storage, giống hệt bản gốc
+    assert chain.chain[2].to_dict() == original.chain[2].to_dict()
+    assert [b.index for b in chain.chain[5:8]] == [5, 6, 7]
+    assert chain.chain.cache_info()["cached_blocks"] == 3
+
+    # Quét cả chain không thay cửa sổ hiện tại
+    before = list(chain.chain._cache)
+    assert [b.hash for b in chain.chain] == [b.hash for b in original.chain]
+    assert list(chain.chain._cache) == before
+
+
+def test_byte_budget_keeps_tip(mined):
+    _, original = mined
+    tip_size = original.chain.header(-1).body_bytes
+    chain = Blockchain(difficulty=1, cache_bytes=tip_size)
+    chain.get_latest_block()
+    chain.chain[1]
+    chain.chain[2]
+    info = chain.chain.cache_info()
+    assert info["cached_bytes"] <= tip_size
+    assert len(chain.chain) - 1 in chain.chain._cache
+
+
+def test_header_body_bytes_match_stored_body(mined):
+    storage, chain = mined
+    headers = storage.load_block_headers(0, 100)
+    assert [h["index"] for h in headers] == list(range(13))
+    for header, block in zip(headers, storage.load_block_range(0, 100)):
+        assert header["tx_count"] == len(block["transactions"])
+        assert header["body_bytes"] == body_size(block["transactions"])
+        assert header["hash"] == block["hash"]
+
+
+def test_sqlite_backfills_summary_of_old_blocks(sqlite_storage):
+    chain = Blockchain(difficulty=1)
+    _mine_blocks(chain, 4)
+    # DB cũ: block ghi trước khi có cột tx_count / body_bytes
+    database.execute("UPDATE blocks SET tx_count = NULL, body_bytes = NULL WHERE index_number >= 2")
+
+    reloaded = Blockchain(difficulty=1)
+    assert reloaded.total_transactions == chain.total_transactions
+    assert database.fetch_one("SELECT COUNT(*) AS n FROM blocks WHERE tx_count IS NULL")["n"] == 0
+    assert [h["tx_count"] for h in sqlite_storage.load_block_headers(0, 5)] == \
+        [len(b.transactions) for b in chain.chain]
@@ -0,0 +1,138 @@
+"""
+Test codec nhị phân (core/codec.py): round-trip với dạng JSON đang lưu.
+
+Chạy: python -m pytest tests/test_codec.py  hoặc  python -m tests.test_codec
+"""
+import io
+import os
+import json
+
+from core.codec import (
+    CodecError,
+    encode_transaction,
+    decode_transaction,
+    encode_block,
+    decode_block,
+    encode_stream,
+    iter_transactions,
+)
+
+
+def _sample_transaction(i=0):
+    return {
+        "id": f"tx_{i}_{os.urandom(4).hex()}",
+        "from": "alice",
+        "to": "bob",
+        "sender": "alice",
+        "receiver": "bob",
+        "from_address": os.urandom(20).hex(),
+        "to_address": os.urandom(20).hex(),
+        "amount": 1_000 + i,
+        "timestamp": "2026-10-19T10:00:00.123456",
+        "expires_at": None,
+        "status": "verified",
+        "signature": os.urandom(64).hex(),
+        "nonce": i,
+        "executed": 1,
+        "message_hash": os.urandom(32).hex(),
+    }
+
+
+def _sample_block(count=3):
+    return {
+        "index": 7,
+        "timestamp": 1760868000.123456,
+        "previous_hash": os.urandom(32).hex(),
+        "nonce": 4242,
+        "hash": "00" + os.urandom(31).hex(),
+        "version": 2,
+        "merkle_root": os.urandom(32).hex(),
+        "transactions": [_sample_transaction(i) for i in range(count)],
+    }
+
+
+def _json_round_trip(value):
+    """Dạng block_transactions.transaction_data hiện tại"""
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+def test_transaction_round_trip_matches_json():
+    tx = _sample_transaction()
+    decoded = decode_transaction(encode_transaction(tx))
+    assert decoded == _json_round_trip(tx)
+    assert list(decoded) == list(tx)
+    assert json.dumps(decoded, sort_keys=True) == json.dumps(tx, sort_keys=True)
+
+
+def test_binary_is_smaller_than_json():
+    tx = _sample_transaction()
+    assert len(encode_transaction(tx)) < len(json.dumps(tx, ensure_ascii=False).encode())
+
+
+def test_value_types_preserved():
+    tx = {
+        "id": "reward_block_1",
+        "type": "mining_reward",
+        "executed": True,
+        "amount": 100.5,
+        "fee": 0,
+        "big": 1 << 70,
+        "negative": -5,
+        "note": "Chuyển tiền 💸",
+        "upper_hex": "ABCDEF",
+        "odd_hex": "abc",
+        "short_hex": "00ff",
+        "empty": "",
+        "nested": {"a": [1, 2, None]},
+        "signature": "SYSTEM_REWARD",
+    }
+    decoded = decode_transaction(encode_transaction(tx))
+    assert decoded == tx
+    assert type(decoded["executed"]) is bool
+    assert type(decoded["amount"]) is float
+    assert type(decoded["fee"]) is int
+
+
+def test_block_round_trip():
+    block = _sample_block()
+    assert decode_block(encode_block(block)) == _json_round_trip(block)
+
+    genesis = {"index": 0, "timestamp": 1.0, "previous_hash": "0", "nonce": 12,
+               "hash": os.urandom(32).hex(), "version": 2, "merkle_root": None,
+               "transactions": []}
+    assert decode_block(encode_block(genesis)) == genesis
+
+
+def test_stream_reader():
+    txs = [_sample_transaction(i) for i in range(50)]
+    buffer = io.BytesIO()
+    assert encode_stream((encode_transaction(tx) for tx in txs), buffer) == 50
+    buffer.seek(0)
+    assert list(iter_transactions(buffer)) == txs
+
+
+def test_corrupt_input_rejected():
+    data = encode_transaction(_sample_transaction())
+    for bad in (data[:-3], b"\x09" + data[1:], data[:1]):
+        try:
+            decode_transaction(bad)
+        except CodecError:
+            continue
+        raise AssertionError(f"Không phát hiện dữ liệu hỏng: {bad[:8]!r}")
+
+    buffer = io.BytesIO()
+    encode_stream([data], buffer)
+    truncated = io.BytesIO(buffer.getvalue()[:-1])
+    try:
+        list(iter_transactions(truncated))
+    except CodecError:
+        pass
+    else:
+        raise AssertionError("Không phát hiện stream bị cắt cụt")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,98 @@
+"""
+Test LeaderLock (blockchain/leader.py): chuyển quyền writer giữa hai process,
+process con fork từ leader không tự coi mình là leader và không nhả lock của
+process cha, follower khởi động trên DB trống tạo genesis khi lên writer.
+
+Chạy: python -m pytest tests/test_leader.py
+"""
+import os
+import multiprocessing
+
+import pytest
+
+from blockchain.leader import LeaderLock
+from blockchain.service import ChainService
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="cần fork (POSIX)")
+
+_ctx = multiprocessing.get_context("fork") if hasattr(os, "fork") else None
+
+
+def _hold_until(path, acquired, done):
+    lock = LeaderLock(path, retry_interval=0)
+    if lock.try_acquire():
+        acquired.set()
+    done.wait(10)
+    lock.release()
+
+
+def _inherited(lock, results):
+    results.put((lock.held, lock.try_acquire()))
+    lock.release()
+    results.put(lock.held)
+
+
+def test_handover_between_processes(tmp_path):
+    path = str(tmp_path / "chain.lock")
+    acquired, done = _ctx.Event(), _ctx.Event()
+    holder = _ctx.Process(target=_hold_until, args=(path, acquired, done))
+    holder.start()
+    try:
+        assert acquired.wait(10)
+        follower = LeaderLock(path, retry_interval=0)
+        assert not follower.try_acquire() and not follower.held
+        assert follower.owner_pid() == holder.pid
+    finally:
+        done.set()
+        holder.join(10)
+    assert holder.exitcode == 0
+
+    # Leader đã nhả -> follower lên thay
+    assert follower.try_acquire() and follower.held
+    assert follower.owner_pid() == os.getpid()
+    follower.release()
+
+
+def test_forked_child_does_not_inherit_or_release_lock(tmp_path):
+    path = str(tmp_path / "chain.lock")
+    lock = LeaderLock(path, retry_interval=0)
+    assert lock.try_acquire()
+    try:
+        results = _ctx.Queue()
+        child = _ctx.Process(target=_inherited, args=(lock, results))
+        child.start()
+        # Con: fd kế thừa bị bỏ, lock vẫn của cha -> follower
+        assert results.get(timeout=10) == (False, False)
+        assert results.get(timeout=10) is False
+        child.join(10)
+        assert child.exitcode == 0
+
+        # release() / thoát ở process con không làm mất lock của cha
+        assert lock.held and lock.owner_pid() == os.getpid()
+        assert not LeaderLock(path, retry_interval=0).try_acquire()
+    finally:
+        lock.release()
+    successor = LeaderLock(path, retry_interval=0)
+    assert successor.try_acquire()
+    successor.release()
+
+
+def test_follower_on_empty_chain_creates_genesis_when_promoted(sqlite_storage, workdir):
+    path = str(workdir / "chain.lock")
+    holder = LeaderLock(path)
+    assert holder.try_acquire()
+    service = ChainService(leader_lock=LeaderLock(path, retry_interval=0),
+                           poll_interval=0, difficulty=1)
+    try:
+        chain = service.blockchain
+        assert len(chain.chain) == 0
+        assert chain.mine_pending_transactions("miner") is None
+
+        holder.release()
+        chain.add_transaction({"id": "tx_1", "from": "alice", "to": "bob",
+                               "amount": 5, "status": "verified"})
+        block = chain.mine_pending_transactions("miner")
+        assert block is not None and block.index == 1
+        assert [b.index for b in chain.chain] == [0, 1] and chain.is_chain_valid()
+    finally:
+        service.close()
@@ -0,0 +1,137 @@
+"""
+Test Merkle tree + inclusion proof (blockchain/merkle.py) và tương thích hash
+block version 1 / 2.
+
+Chạy: python -m pytest tests/test_merkle.py
+"""
+import copy
+
+from blockchain.merkle import (
+    EMPTY_ROOT,
+    leaf_hash,
+    merkle_root,
+    merkle_proof,
+    root_from_proof,
+    verify_merkle_proof,
+    verify_inclusion,
+)
+from blockchain.blockchain import (
+    Block,
+    LEGACY_BLOCK_VERSION,
+    BLOCK_VERSION,
+    compute_block_hash,
+)
+
+
+def _transactions(count):
+    return [
+        {"id": f"tx_{i}", "from": "alice", "to": "bob", "amount": 100 + i, "nonce": i}
+        for i in range(count)
+    ]
+
+
+def _inclusion(block, position):
+    return {
+        "transaction": block.transactions[position],
+        "block": block.header(),
+        "proof": merkle_proof(block.transactions, position),
+    }
+
+
+def test_every_leaf_proves_to_root():
+    for count in range(1, 10):
+        txs = _transactions(count)
+        root = merkle_root(txs)
+        for position in range(count):
+            proof = merkle_proof(txs, position)
+            assert root_from_proof(leaf_hash(txs[position]), proof) == root
+            assert verify_merkle_proof(txs[position], proof, root)
+
+
+def test_odd_leaf_promoted_not_duplicated():
+    txs = _transactions(3)
+    # Lá cuối của tầng lẻ được đẩy lên: proof của nó chỉ có một bước
+    proof = merkle_proof(txs, 2)
+    assert proof == [{"hash": merkle_root(txs[:2]), "side": "left"}]
+    # Không nhân đôi lá cuối (kiểu Bitcoin) -> root khác với [a, b, c, c]
+    assert merkle_root(txs) != merkle_root(txs + txs[2:])
+
+
+def test_single_leaf_and_empty_tree():
+    txs = _transactions(1)
+    assert merkle_root(txs) == leaf_hash(txs[0])
+    assert merkle_proof(txs, 0) == []
+    assert verify_merkle_proof(txs[0], [], merkle_root(txs))
+    assert merkle_root([]) == EMPTY_ROOT
+    try:
+        merkle_proof(txs, 1)
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("Vị trí ngoài khoảng phải báo IndexError")
+
+
+def test_tampered_proof_rejected():
+    block = Block(1, _transactions(5), 1760868000.0, "0" * 64)
+    inclusion = _inclusion(block, 3)
+    assert verify_inclusion(inclusion)
+
+    tampered_tx = copy.deepcopy(inclusion)
+    tampered_tx["transaction"]["amount"] += 1
+    assert not verify_inclusion(tampered_tx)
+
+    tampered_sibling = copy.deepcopy(inclusion)
+    tampered_sibling["proof"][0]["hash"] = "ff" * 32
+    assert not verify_inclusion(tampered_sibling)
+
+    swapped_side = copy.deepcopy(inclusion)
+    step = swapped_side["proof"][0]
+    step["side"] = "left" if step["side"] == "right" else "right"
+    assert not verify_inclusion(swapped_side)
+
+    tampered_root = copy.deepcopy(inclusion)
+    tampered_root["block"]["merkle_root"] = merkle_root(_transactions(4))
+    assert not verify_inclusion(tampered_root)
+
+    assert not verify_inclusion({"block": block.header()})
+    assert not verify_inclusion({**inclusion, "proof": [{"hash": "xyz", "side": "left"}]})
+
+
+def test_inclusion_checks_difficulty():
+    block = Block(1, _transactions(2), 1760868000.0, "0" * 64).mine_block(2)
+    inclusion = _inclusion(block, 1)
+    assert verify_inclusion(inclusion, difficulty=2)
+    if not block.hash.startswith("0" * 8):
+        assert not verify_inclusion(inclusion, difficulty=8)
+
+
+def test_v1_and_v2_block_hashes():
+    txs = _transactions(4)
+
+    legacy = Block(3, txs, 1760868000.0, "ab" * 32, nonce=7, version=LEGACY_BLOCK_VERSION)
+    assert legacy.merkle_root is None
+    assert legacy.hash == compute_block_hash(3, txs, 1760868000.0, "ab" * 32, 7)
+
+    current = Block(3, txs, 1760868000.0, "ab" * 32, nonce=7)
+    assert current.version == BLOCK_VERSION
+    assert current.merkle_root == merkle_root(txs)
+    assert current.hash != legacy.hash
+    assert current.calculate_hash() == current.hash
+
+    # Block đã lưu không có "version" là block v1, hash cũ vẫn hợp lệ
+    stored = legacy.to_dict()
+    del stored["version"], stored["merkle_root"]
+    loaded = Block.from_dict(stored)
+    assert loaded.version == LEGACY_BLOCK_VERSION
+    assert loaded.calculate_hash() == legacy.hash
+    assert Block.from_dict(current.to_dict()).calculate_hash() == current.hash
+
+    # v2 tính lại merkle root từ transactions -> sửa giao dịch vẫn bị phát hiện
+    modified = current.to_dict()
+    modified["transactions"][0] = {**txs[0], "amount": 1}
+    assert Block.from_dict(modified).calculate_hash() != current.hash
+
+    # Block v1 không có Merkle root -> không có inclusion proof
+    assert not verify_inclusion({
+        "transaction": txs[0], "block": legacy.header(), "proof": merkle_proof(txs, 0),
+    })
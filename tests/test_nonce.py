@@ -0,0 +1,100 @@
+"""
+Test cấp nonce atomic (insert_transaction_with_nonce / reserve_nonces): nhiều
+thread cùng người gửi không trùng nonce, build / lưu lỗi không tiêu nonce,
+nhánh SQLite không có UPDATE ... RETURNING.
+
+Chạy: python -m pytest tests/test_nonce.py
+"""
+import threading
+
+import pytest
+
+import core.database as database
+from core.transaction import create_transaction, new_transaction
+
+THREADS = 8
+PER_THREAD = 10
+
+
+def _wallet(storage, name, nonce=0):
+    storage.insert_wallet({
+        "name": name, "address": f"wallet_{name}", "public_key": "00",
+        "encrypted_private_key": "00", "salt": "00", "balance": 1000,
+        "nonce": nonce, "created_at": "2026-10-19 00:00:00",
+    })
+
+
+def _run_threads(target):
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        try:
+            for _ in range(PER_THREAD):
+                target()
+        except Exception as e:  # lỗi trong thread phải làm test fail
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "no_returning"])
+def returning(request, monkeypatch):
+    monkeypatch.setattr(database, "_HAS_RETURNING", request.param)
+    return request.param
+
+
+def test_concurrent_create_transaction_unique_contiguous(storage, returning):
+    _wallet(storage, "alice")
+    _run_threads(lambda: create_transaction("alice", "bob", 10))
+
+    total = THREADS * PER_THREAD
+    nonces = sorted(tx.nonce for tx in storage.list_transactions(sender="alice"))
+    assert nonces == list(range(total))
+    assert storage.get_wallet("alice")["nonce"] == total
+
+
+def test_concurrent_reserve_nonces_disjoint_blocks(storage, returning):
+    _wallet(storage, "alice", nonce=5)
+    firsts = []
+    _run_threads(lambda: firsts.append(storage.reserve_nonces("alice", 3)))
+
+    assert sorted(firsts) == list(range(5, 5 + 3 * THREADS * PER_THREAD, 3))
+    assert storage.get_wallet("alice")["nonce"] == 5 + 3 * THREADS * PER_THREAD
+    assert storage.reserve_nonces("nobody", 3) is None
+
+
+def test_failed_build_or_insert_does_not_consume_nonce(storage, returning):
+    _wallet(storage, "alice", nonce=3)
+
+    def broken_build(nonce):
+        raise RuntimeError("build lỗi")
+
+    with pytest.raises(RuntimeError):
+        storage.insert_transaction_with_nonce("alice", broken_build)
+    assert storage.get_wallet("alice")["nonce"] == 3
+
+    first = storage.insert_transaction_with_nonce(
+        "alice", lambda nonce: new_transaction("alice", "bob", 1, nonce=nonce)
+    )
+    assert first.nonce == 3
+    # Trùng id -> INSERT lỗi, nonce vừa tăng được trả lại
+    with pytest.raises(Exception):
+        storage.insert_transaction_with_nonce(
+            "alice", lambda nonce: new_transaction("alice", "bob", 1, nonce=nonce).replace(id=first.id)
+        )
+    assert storage.get_wallet("alice")["nonce"] == 4
+    assert [tx.nonce for tx in storage.list_transactions(sender="alice")] == [3]
+
+
+def test_unknown_sender_gets_nonce_zero(storage):
+    tx = storage.insert_transaction_with_nonce(
+        "ghost", lambda nonce: new_transaction("ghost", "bob", 1, nonce=nonce)
+    )
+    assert tx.nonce == 0 and storage.get_wallet("ghost") is None
@@ -0,0 +1,115 @@
+"""
+Test VerificationPipeline (core/pipeline.py): kết quả giống hệt
+full_verification_flow() tuần tự kể cả khi các giao dịch xung đột nhau
+(cùng người gửi, trùng nonce, số dư phụ thuộc giao dịch trước), thứ tự kết
+quả và back-pressure khi queue đầy.
+
+Chạy: python -m pytest tests/test_pipeline.py
+"""
+import queue
+import threading
+
+import pytest
+
+from core.crypto import get_crypto_backend
+from core.pipeline import VerificationPipeline
+from core.storage import use_storage
+from core.transaction import new_transaction, compute_signature
+from core.verification import full_verification_flow
+
+
+def _wallet(storage, name, balance):
+    private_key, public_key = get_crypto_backend().generate_keypair()
+    storage.insert_wallet({
+        "name": name, "address": f"wallet_{name}", "public_key": public_key.hex(),
+        "encrypted_private_key": "00", "salt": "00", "balance": balance,
+        "nonce": 0, "created_at": "2026-10-19 00:00:00",
+    })
+    return private_key
+
+
+def _signed(storage, keys, tx_id, sender, receiver, amount, nonce):
+    tx = new_transaction(sender, receiver, amount, nonce=nonce).replace(id=tx_id)
+    signed = compute_signature(tx, keys[sender])
+    storage.insert_transaction(signed)
+    return tx_id
+
+
+def _conflicting_batch(storage):
+    keys = {
+        "alice": _wallet(storage, "alice", 100),
+        "bob": _wallet(storage, "bob", 0),
+        "carol": _wallet(storage, "carol", 0),
+    }
+    return [
+        _signed(storage, keys, "tx_1", "alice", "bob", 60, 0),
+        # Đủ số dư trước tx_1, không đủ sau tx_1
+        _signed(storage, keys, "tx_2", "alice", "carol", 60, 1),
+        # Trùng nonce: tx_3 thấy tx_4 còn pending -> rejected, tx_4 đi tiếp
+        _signed(storage, keys, "tx_3", "alice", "bob", 10, 2),
+        _signed(storage, keys, "tx_4", "alice", "carol", 10, 2),
+        # bob chỉ có tiền sau khi tx_1 được ghi
+        _signed(storage, keys, "tx_5", "bob", "carol", 50, 7),
+        # Submit lại giao dịch đã execute
+        "tx_1",
+    ]
+
+
+@pytest.mark.parametrize("engine", ["sqlite", "memory"])
+def test_conflicting_transactions_match_sequential_flow(workdir, monkeypatch, engine):
+    results = {}
+    balances = {}
+    for mode in ("sequential", "pipeline"):
+        (workdir / mode).mkdir()
+        monkeypatch.chdir(workdir / mode)
+        with use_storage(engine) as storage:
+            tx_ids = _conflicting_batch(storage)
+            if mode == "sequential":
+                results[mode] = [full_verification_flow(tx_id) for tx_id in tx_ids]
+            else:
+                with VerificationPipeline(signature_workers=2, check_workers=4,
+                                          use_processes=False) as pipeline:
+                    results[mode] = pipeline.verify_many(tx_ids)
+            balances[mode] = {name: storage.get_wallet(name)["balance"]
+                              for name in ("alice", "bob", "carol")}
+
+    assert [r["transaction_status"] for r in results["sequential"]] == [
+        "verified", "rejected", "rejected", "verified", "verified", "executed",
+    ]
+    assert results["pipeline"] == results["sequential"]
+    assert balances["pipeline"] == balances["sequential"] == {"alice": 30, "bob": 10, "carol": 60}
+
+
+def test_results_in_submit_order_and_backpressure(memory_storage):
+    keys = {"alice": _wallet(memory_storage, "alice", 1000), "bob": _wallet(memory_storage, "bob", 0)}
+    tx_ids = [_signed(memory_storage, keys, f"tx_{i}", "alice", "bob", 1, i) for i in range(5)]
+
+    pipeline = VerificationPipeline(signature_workers=1, check_workers=2,
+                                    queue_size=1, use_processes=False)
+    release = threading.Event()
+    signature = pipeline._signature
+
+    def blocked_signature(item):
+        release.wait()
+        signature(item)
+
+    pipeline._stages[1].handler = blocked_signature
+
+    with pipeline:
+        # 1 item ở worker signature, 1 trong signature queue, 1 ở intake (chặn
+        # khi put), 1 trong intake queue -> submit tiếp theo bị chặn
+        futures = [pipeline.submit(tx_id, timeout=5) for tx_id in tx_ids[:4]]
+        with pytest.raises(queue.Full):
+            pipeline.submit(tx_ids[4], timeout=0.2)
+        assert pipeline.stats()["queue_depth"]["intake"] == 1
+        release.set()
+        futures.append(pipeline.submit(tx_ids[4], timeout=5))
+        results = [future.result(timeout=10) for future in futures]
+
+    assert [r["transaction_id"] for r in results] == tx_ids
+    assert all(r["transaction_status"] == "verified" for r in results)
+    assert memory_storage.get_wallet("bob")["balance"] == 5
+    assert pipeline.stats()["stages"]["writer"]["count"] == 5
+
+    with pytest.raises(RuntimeError):
+        pipeline.submit(tx_ids[0])
@@ -0,0 +1,128 @@
+"""
+Test ChainService (blockchain/service.py): một Blockchain dùng chung cho CLI,
+web và BlockchainIntegration, load một lần kể cả khi nhiều thread cùng truy
+cập, difficulty lấy từ metadata, subscriber nhận block mới, nhiều thread
+mine cùng lúc vẫn ra chain liên tục.
+
+Chạy: python -m pytest tests/test_service.py
+"""
+import threading
+
+import pytest
+
+import blockchain.integration as integration
+from blockchain.blockchain import Blockchain, get_blockchain
+from blockchain.integration import BlockchainIntegration, get_blockchain_instance
+from blockchain.service import ChainService, get_chain_service, set_chain_service
+from core.transaction import new_transaction
+
+
+@pytest.fixture
+def service(storage, monkeypatch):
+    storage.set_metadata("difficulty", "1")
+    monkeypatch.setattr(integration, "_blockchain_instance", None)
+    service = ChainService(poll_interval=0)
+    previous = set_chain_service(service)
+    yield service
+    service.close()
+    set_chain_service(previous)
+
+
+def _tx(tx_id, amount=10):
+    return {"id": tx_id, "from": "alice", "to": "bob", "sender": "alice",
+            "receiver": "bob", "amount": amount, "status": "verified"}
+
+
+def test_one_chain_for_every_entry_point(service):
+    chain = get_blockchain()
+    assert get_chain_service() is service
+    assert service.blockchain is chain
+    assert get_blockchain_instance().blockchain is chain
+    bridge = BlockchainIntegration()
+    try:
+        assert bridge.blockchain is chain
+    finally:
+        bridge.close()
+    # Difficulty theo blockchain_metadata, không theo tham số mặc định
+    assert chain.difficulty == service.difficulty == 1
+
+
+def test_concurrent_first_access_loads_once(service, monkeypatch):
+    loads = []
+    load_blockchain = Blockchain.load_blockchain
+
+    def spy(chain):
+        loads.append(chain)
+        return load_blockchain(chain)
+
+    monkeypatch.setattr(Blockchain, "load_blockchain", spy)
+    start = threading.Barrier(8)
+    seen = []
+
+    def worker():
+        start.wait()
+        seen.append(service.blockchain)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert len(seen) == 8 and all(chain is loads[0] for chain in seen)
+
+
+def test_subscribers_and_integration_mempool(service):
+    received = []
+
+    def broken(block):
+        raise RuntimeError("subscriber lỗi")
+
+    service.subscribe(broken)
+    unsubscribe = service.subscribe(lambda block: received.append(block.index))
+    bridge = BlockchainIntegration(service)
+    queued = new_transaction("alice", "bob", 10).replace(id="tx_a", status="verified", executed=1)
+    other = new_transaction("alice", "bob", 20).replace(id="tx_b", status="verified", executed=1)
+    bridge.mempool = [queued, other]
+
+    chain = service.blockchain
+    chain.add_transaction(_tx("tx_a"))
+    block = service.mine("miner")
+    # Lỗi ở một subscriber không chặn các subscriber khác
+    assert received == [block.index]
+    assert [tx.id for tx in bridge.mempool] == ["tx_b"]
+
+    unsubscribe()
+    bridge.close()
+    chain.add_transaction(_tx("tx_b", 20))
+    service.mine("miner")
+    assert received == [block.index]
+    assert [tx.id for tx in bridge.mempool] == ["tx_b"]
+
+
+def test_concurrent_mining_keeps_one_writer(service):
+    chain = service.blockchain
+    start = threading.Barrier(4)
+    errors = []
+
+    def worker(n):
+        start.wait()
+        try:
+            for i in range(5):
+                chain.add_transaction(_tx(f"tx_{n}_{i}"))
+                service.mine(f"miner_{n}")
+        except Exception as e:  # lỗi trong thread phải làm test fail
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [block.index for block in chain.chain] == list(range(len(chain.chain)))
+    mined = [tx["id"] for block in chain.chain for tx in block.transactions
+             if tx.get("type") != "mining_reward"]
+    assert sorted(mined) == sorted(f"tx_{n}_{i}" for n in range(4) for i in range(5))
+    assert chain.audit_chain()["valid"]
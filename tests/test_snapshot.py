@@ -0,0 +1,138 @@
+"""
+Test snapshot số dư / nonce (blockchain/snapshot.py): restore + replay khớp
+dựng lại từ genesis, snapshot hỏng / lệch chain bị bỏ qua.
+
+Chạy: python -m pytest tests/test_snapshot.py
+"""
+import gzip
+import json
+
+import pytest
+
+from blockchain.blockchain import Blockchain
+from blockchain.snapshot import (
+    Ledger,
+    SnapshotError,
+    list_snapshots,
+    load_snapshot,
+    restore_ledger,
+    write_snapshot,
+)
+
+PARTIES = ("alice", "bob", "carol")
+
+
+def _mine_blocks(chain, count, offset=0):
+    for b in range(count):
+        for i in range(3):
+            n = offset + b * 3 + i
+            sender, receiver = PARTIES[n % 3], PARTIES[(n + 1) % 3]
+            chain.add_transaction({
+                "id": f"tx_{n}", "from": sender, "to": receiver, "sender": sender,
+                "receiver": receiver, "amount": 10 + n, "nonce": n, "status": "verified",
+            })
+        assert chain.mine_pending_transactions("miner") is not None
+
+
+def _full_rebuild(chain):
+    ledger = Ledger()
+    for block in chain.chain.iter_blocks(0):
+        ledger.apply_block(block)
+    return ledger
+
+
+def _same(a, b):
+    return (a.height, a.block_hash, a.balances, a.nonces) == (b.height, b.block_hash, b.balances, b.nonces)
+
+
+@pytest.fixture
+def chain(memory_storage):
+    return Blockchain(difficulty=1)
+
+
+@pytest.fixture
+def replay_starts(chain, monkeypatch):
+    """Ghi lại `start` của mỗi lần restore_ledger replay block"""
+    starts = []
+    iter_blocks = chain.chain.iter_blocks
+
+    def spy(start=0, *args, **kwargs):
+        starts.append(start)
+        return iter_blocks(start, *args, **kwargs)
+
+    monkeypatch.setattr(chain.chain, "iter_blocks", spy)
+    return starts
+
+
+def test_restore_from_snapshot_matches_full_rebuild(chain, workdir, replay_starts):
+    directory = str(workdir / "snapshots")
+    _mine_blocks(chain, 4)
+    snapshot = _full_rebuild(chain)
+    write_snapshot(snapshot, directory)
+    _mine_blocks(chain, 3, offset=100)
+
+    replay_starts.clear()
+    restored = restore_ledger(chain, directory)
+    assert replay_starts == [snapshot.height + 1]
+    assert _same(restored, _full_rebuild(chain))
+    assert restored.height == len(chain.chain) - 1
+    assert restored.nonce("alice") == max(n for n in range(100, 109) if n % 3 == 0)
+    # Blockchain.get_balance đọc ledger (lazy restore + cập nhật theo block mới)
+    assert chain.get_balance("bob") == restored.balance("bob")
+
+
+def test_keep_prunes_old_snapshots(chain, workdir):
+    directory = str(workdir / "snapshots")
+    ledger = Ledger()
+    for block in chain.chain.iter_blocks(0):
+        ledger.apply_block(block)
+    for round_ in range(4):
+        _mine_blocks(chain, 1, offset=round_ * 10)
+        ledger.apply_block(chain.chain[-1])
+        write_snapshot(ledger, directory, keep=2)
+    paths = list_snapshots(directory)
+    assert [load_snapshot(p).height for p in paths] == [len(chain.chain) - 2, len(chain.chain) - 1]
+
+
+def test_corrupt_sha256_rejected(chain, workdir, replay_starts):
+    directory = str(workdir / "snapshots")
+    _mine_blocks(chain, 2)
+    older = _full_rebuild(chain)
+    write_snapshot(older, directory)
+    _mine_blocks(chain, 2, offset=50)
+    newest = write_snapshot(_full_rebuild(chain), directory)
+
+    with gzip.open(newest, "rt", encoding="utf-8") as f:
+        document = json.load(f)
+    document["state"]["balances"]["alice"] += 1_000_000
+    with gzip.open(newest, "wt", encoding="utf-8") as f:
+        json.dump(document, f)
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(newest)
+
+    # restore bỏ qua snapshot sai hash, dùng snapshot cũ hơn + replay
+    replay_starts.clear()
+    restored = restore_ledger(chain, directory)
+    assert replay_starts == [older.height + 1]
+    assert _same(restored, _full_rebuild(chain))
+
+
+def test_unreadable_and_mismatched_snapshots_skipped(chain, workdir, replay_starts):
+    directory = str(workdir / "snapshots")
+    _mine_blocks(chain, 2)
+
+    # Snapshot của một chain khác (hash block tại height không khớp)
+    foreign = _full_rebuild(chain)
+    foreign.block_hash = "ab" * 32
+    write_snapshot(foreign, directory)
+    # File không phải gzip
+    with open(f"{directory}/snapshot_9999999999.json.gz", "wb") as f:
+        f.write(b"not a snapshot")
+    with pytest.raises(SnapshotError):
+        load_snapshot(f"{directory}/snapshot_9999999999.json.gz")
+
+    replay_starts.clear()
+    restored = restore_ledger(chain, directory)
+    assert replay_starts == [0]
+    assert _same(restored, _full_rebuild(chain))
@@ -0,0 +1,145 @@
+"""
+Test sweeper giao dịch hết hạn (core/sweeper.py): expire theo batch, chính sách
+nonce none / rewind trên cả hai storage engine, reservation của batch chặn
+rewind, giới hạn giao dịch chờ mỗi người gửi, metrics, index giao dịch chờ
+của MemoryStorage.
+
+Chạy: python -m pytest tests/test_sweeper.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import core.transaction as transaction
+from core import instrumentation
+from core.sweeper import sweep_expired
+from core.transaction import new_transaction, get_pending_transactions
+
+# Reservation của reserve_nonces() tính theo đồng hồ thật
+NOW = datetime.now()
+
+
+def _wallet(storage, name, nonce=0):
+    storage.insert_wallet({
+        "name": name, "address": f"wallet_{name}", "public_key": "00",
+        "encrypted_private_key": "00", "salt": "00", "balance": 1000,
+        "nonce": nonce, "created_at": str(NOW),
+    })
+
+
+def _pending(storage, sender, nonce, minutes, status="pending"):
+    """Giao dịch chờ có expires_at = NOW + minutes"""
+    tx = new_transaction(sender, "bob", 10, nonce=nonce).replace(
+        expires_at=(NOW + timedelta(minutes=minutes)).isoformat(), status=status
+    )
+    storage.insert_transaction(tx)
+    return tx
+
+
+@pytest.fixture
+def metrics():
+    instrumentation.reset()
+    yield lambda: instrumentation.summary()["counters"]
+    instrumentation.reset()
+
+
+def test_expires_across_batches_and_hides_from_pending(storage, metrics):
+    _wallet(storage, "alice", nonce=7)
+    live = _pending(storage, "alice", 0, 5)
+    for nonce in range(1, 6):
+        _pending(storage, "alice", nonce, -1, status="signed" if nonce % 2 else "pending")
+
+    assert len(get_pending_transactions("alice")) == 6
+    assert sweep_expired(batch_size=2, policy="none", now=NOW.isoformat()) == 5
+
+    assert [tx.id for tx in get_pending_transactions("alice")] == [live.id]
+    assert storage.count_transactions(("expired",)) == 5
+    # "none": nonce đã cấp không bị hạ
+    assert storage.get_wallet("alice")["nonce"] == 7
+    assert metrics()["transactions_expired_total"] == 5
+    assert "nonces_rewound_total" not in metrics()
+    # Lần quét sau không còn gì
+    assert sweep_expired(batch_size=2, policy="none", now=NOW.isoformat()) == 0
+
+
+def test_rewind_reissues_trailing_expired_nonces(storage, metrics):
+    _wallet(storage, "alice", nonce=4)
+    _wallet(storage, "carol", nonce=2)
+    _pending(storage, "alice", 0, -1)
+    _pending(storage, "alice", 1, 5)
+    _pending(storage, "alice", 2, -1)
+    _pending(storage, "alice", 3, -1)
+    _pending(storage, "carol", 0, 5)
+    _pending(storage, "carol", 1, 5)
+
+    assert sweep_expired(policy="rewind", now=NOW.isoformat()) == 3
+    # Chỉ các nonce hết hạn ở cuối (2, 3) được cấp lại; nonce 0 bị bỏ qua
+    assert storage.get_wallet("alice")["nonce"] == 2
+    assert storage.get_wallet("carol")["nonce"] == 2
+    assert metrics()["nonces_rewound_total"] == 1
+
+    reissued = storage.insert_transaction_with_nonce(
+        "alice", lambda nonce: new_transaction("alice", "bob", 1, nonce=nonce)
+    )
+    assert reissued.nonce == 2
+
+
+def test_reservation_blocks_rewind(storage):
+    _wallet(storage, "alice", nonce=1)
+    _pending(storage, "alice", 0, -1)
+    # Batch đặt trước nonce 1..3 và đang ký (chưa lưu giao dịch)
+    assert storage.reserve_nonces("alice", 3) == 1
+    assert storage.get_wallet("alice")["nonce"] == 4
+
+    assert sweep_expired(policy="rewind", now=NOW.isoformat()) == 1
+    assert storage.get_wallet("alice")["nonce"] == 4
+
+    # Reservation hết hạn -> rewind như bình thường
+    later = (datetime.now() + timedelta(hours=1)).isoformat()
+    assert storage.rewind_nonces(["alice"], later) == 1
+    assert storage.get_wallet("alice")["nonce"] == 0
+
+
+def test_pending_cap_checked_with_nonce(storage, monkeypatch):
+    _wallet(storage, "alice")
+    monkeypatch.setattr(transaction, "MAX_PENDING_PER_SENDER", 2)
+    first = transaction.create_transaction("alice", "bob", 10)
+    transaction.create_transaction("alice", "bob", 10)
+    with pytest.raises(ValueError):
+        transaction.create_transaction("alice", "bob", 10)
+    # Bị từ chối không tiêu nonce
+    assert storage.get_wallet("alice")["nonce"] == 2
+
+    # Giao dịch đã executed / expired không tính vào giới hạn
+    storage.update_transaction(first.id, status="verified", executed=1)
+    assert transaction.create_transaction("alice", "bob", 10).nonce == 2
+
+    monkeypatch.setattr(transaction, "MAX_PENDING_PER_SENDER", 0)
+    for _ in range(3):
+        transaction.create_transaction("alice", "bob", 10)
+    assert len(get_pending_transactions("alice")) == 5
+
+
+def test_memory_sweep_scans_only_pending_index(memory_storage):
+    _wallet(memory_storage, "alice")
+    _wallet(memory_storage, "bob")
+    for nonce in range(50):
+        tx = _pending(memory_storage, "alice", nonce, -1)
+        memory_storage.update_transaction(tx.id, status="verified", executed=1)
+    waiting = [_pending(memory_storage, "alice", 100 + n, -1) for n in range(3)]
+    executed = _pending(memory_storage, "alice", 200, -1)
+    memory_storage.execute_transfer(executed.id, "alice", "bob", 10)
+    rejected = _pending(memory_storage, "alice", 300, -1, status="signed")
+    memory_storage.execute_transfers([(rejected.id, "alice", "bob", 10 ** 9)])
+
+    # Index chỉ còn giao dịch chờ, theo mọi đường đổi trạng thái
+    assert list(memory_storage._pending) == [tx.id for tx in waiting]
+    assert memory_storage.expire_transactions(NOW.isoformat(), 2) == [
+        (tx.id, "alice") for tx in waiting[:2]
+    ]
+    assert list(memory_storage._pending) == [waiting[2].id]
+
+    memory_storage.update_transaction(waiting[0].id, status="pending")
+    assert list(memory_storage._pending) == [waiting[2].id, waiting[0].id]
+    memory_storage.delete_all_transactions()
+    assert memory_storage._pending == {}
@@ -0,0 +1,145 @@
+"""
+Test sync DB -> chain (BlockchainIntegration.sync_with_database): chỉ đọc giao
+dịch verified + executed chưa anchored, mốc anchored lưu trong DB nên mở lại
+process không sync lại, follower không anchor, migration cho DB cũ, thống kê
+đếm bằng COUNT thay vì đọc cả bảng.
+
+Chạy: python -m pytest tests/test_sync.py
+"""
+import pytest
+
+import blockchain.integration as integration
+import core.database as database
+from blockchain.integration import BlockchainIntegration
+from blockchain.leader import LeaderLock
+from blockchain.service import ChainService, set_chain_service
+from core.storage import use_storage
+from core.transaction import new_transaction
+
+
+def _service(workdir):
+    return ChainService(leader_lock=LeaderLock(str(workdir / "chain.lock"), retry_interval=0),
+                        poll_interval=0, difficulty=1)
+
+
+@pytest.fixture
+def service(storage, workdir):
+    service = _service(workdir)
+    previous = set_chain_service(service)
+    yield service
+    service.close()
+    set_chain_service(previous)
+
+
+def _insert(storage, count, status="verified", executed=1, start=0):
+    ids = []
+    for i in range(start, start + count):
+        tx = new_transaction("alice", "bob", 10 + i, nonce=i).replace(
+            id=f"tx_{i:03d}", status=status, executed=executed)
+        storage.insert_transaction(tx)
+        ids.append(tx.id)
+    return ids
+
+
+def _anchored_ids(chain):
+    return [tx["id"] for block in chain.chain for tx in block.transactions
+            if tx.get("type") != "mining_reward"]
+
+
+def test_sync_reads_only_unanchored_rows(storage, service):
+    verified = _insert(storage, 23)
+    _insert(storage, 4, status="signed", executed=0, start=100)
+    _insert(storage, 2, status="rejected", executed=0, start=200)
+    _insert(storage, 2, status="verified", executed=0, start=300)
+
+    bridge = BlockchainIntegration(service)
+    try:
+        # Đã sync trong __init__: đúng thứ tự cũ trước, theo block tối đa 10 giao dịch
+        assert _anchored_ids(service.blockchain) == verified
+        assert len(service.blockchain.chain) == 1 + 3
+        assert storage.list_unanchored_transactions() == []
+
+        # Không còn gì mới -> không mine thêm block
+        assert bridge.sync_with_database() == 0
+        assert len(service.blockchain.chain) == 4
+
+        fresh = _insert(storage, 3, start=400)
+        assert bridge.sync_with_database(batch_size=2) == 3
+        assert _anchored_ids(service.blockchain) == verified + fresh
+    finally:
+        bridge.close()
+
+
+def test_anchored_mark_survives_restart(sqlite_storage, workdir):
+    service = _service(workdir)
+    bridge = BlockchainIntegration(service)
+    _insert(sqlite_storage, 12)
+    assert bridge.sync_with_database() == 12
+    bridge.close()
+    service.close()
+
+    with use_storage("sqlite") as reopened:
+        assert reopened.list_unanchored_transactions() == []
+        service = _service(workdir)
+        bridge = BlockchainIntegration(service)
+        try:
+            assert bridge.sync_with_database() == 0
+            assert len(service.blockchain.chain) == 1 + 2
+        finally:
+            bridge.close()
+            service.close()
+
+
+def test_follower_leaves_rows_for_leader(sqlite_storage, workdir):
+    holder = LeaderLock(str(workdir / "chain.lock"))
+    assert holder.try_acquire()
+    service = _service(workdir)
+    try:
+        _insert(sqlite_storage, 5)
+        bridge = BlockchainIntegration(service)
+        assert bridge.sync_with_database() == 0
+        assert len(sqlite_storage.list_unanchored_transactions()) == 5
+
+        # Leader thoát -> process này lên writer và anchor phần còn lại
+        holder.release()
+        assert bridge.sync_with_database() == 5
+        assert sqlite_storage.list_unanchored_transactions() == []
+        assert _anchored_ids(service.blockchain) == [f"tx_{i:03d}" for i in range(5)]
+        bridge.close()
+    finally:
+        service.close()
+
+
+def test_migration_backfills_anchored_from_tx_index(sqlite_storage, workdir):
+    service = _service(workdir)
+    bridge = BlockchainIntegration(service)
+    _insert(sqlite_storage, 4)
+    assert bridge.sync_with_database() == 4
+    bridge.close()
+    service.close()
+    late = _insert(sqlite_storage, 2, start=50)
+
+    # DB cũ: chưa có cột anchored
+    database.execute("DROP INDEX idx_tx_unanchored")
+    database.execute("ALTER TABLE transactions DROP COLUMN anchored")
+    with use_storage("sqlite") as migrated:
+        assert [tx.id for tx in migrated.list_unanchored_transactions()] == late
+
+
+def test_stats_use_counts(storage, service, monkeypatch):
+    _insert(storage, 3)
+    _insert(storage, 2, status="rejected", executed=0, start=100)
+    _insert(storage, 1, status="pending", executed=0, start=200)
+    _insert(storage, 4, status="signed", executed=0, start=300)
+    bridge = BlockchainIntegration(service)
+
+    def full_scan():
+        raise AssertionError("get_blockchain_stats không được đọc cả bảng")
+
+    monkeypatch.setattr(integration, "get_all_transactions", full_scan)
+    try:
+        stats = bridge.get_blockchain_stats()
+    finally:
+        bridge.close()
+    assert stats["database"] == {"verified": 3, "rejected": 2, "pending": 5, "total": 10}
+    assert stats["blockchain"]["total_transactions"] == 3 + 1
@@ -0,0 +1,83 @@
+"""
+Test tail chain (storage.load_blocks_since + Blockchain.refresh): đọc giới
+hạn các block sau một height, process khác chỉ nối phần mới theo batch,
+validate phần mới, bỏ giao dịch đã mine khỏi pending pool, báo listener.
+
+Chạy: python -m pytest tests/test_tail.py
+"""
+import pytest
+
+from core import instrumentation
+from blockchain.blockchain import Blockchain
+
+
+def _mine_blocks(chain, count, offset=0):
+    for b in range(offset, offset + count):
+        chain.add_transaction({
+            "id": f"tx_{b}", "from": "alice", "to": "bob", "sender": "alice",
+            "receiver": "bob", "amount": 10 + b, "nonce": b, "status": "verified",
+        })
+        assert chain.mine_pending_transactions("miner") is not None
+
+
+@pytest.fixture
+def writer(storage):
+    chain = Blockchain(difficulty=1)
+    _mine_blocks(chain, 3)
+    return chain
+
+
+def test_load_blocks_since_is_bounded(storage, writer):
+    _mine_blocks(writer, 5, offset=10)
+    assert [b["index"] for b in storage.load_blocks_since(-1, 3)] == [0, 1, 2]
+    assert [b["index"] for b in storage.load_blocks_since(4, 100)] == [5, 6, 7, 8]
+    assert storage.load_blocks_since(8) == []
+    assert storage.load_blocks_since(4, 2) == storage.load_block_range(5, 7)
+
+
+def test_refresh_appends_only_new_blocks(storage, writer, monkeypatch):
+    instrumentation.reset()
+    tail = Blockchain(difficulty=1)
+    notified = []
+    tail.add_listener(lambda block: notified.append(block.index))
+    # Giao dịch đang chờ ở process này nhưng được process khác mine trước
+    tail.add_transaction({"id": "tx_12", "from": "alice", "to": "bob", "amount": 22,
+                          "status": "verified"})
+    tail.add_transaction({"id": "tx_local", "from": "alice", "to": "bob", "amount": 1,
+                          "status": "verified"})
+    _mine_blocks(writer, 7, offset=10)
+
+    calls = []
+    since = storage.load_blocks_since
+
+    def spy(height, limit):
+        calls.append((height, limit))
+        return since(height, limit)
+
+    monkeypatch.setattr(storage, "load_blocks_since", spy)
+    assert tail.refresh(batch_size=3) == 7
+    assert calls == [(3, 3), (6, 3), (9, 3)]
+    assert notified == list(range(4, 11))
+    assert [b.hash for b in tail.chain] == [b.hash for b in writer.chain]
+    assert tail.total_transactions == writer.total_transactions
+    assert tail.validated_height == 10 and tail.is_chain_valid()
+    assert [tx["id"] for tx in tail.pending_transactions] == ["tx_local"]
+    assert instrumentation.summary()["counters"]["chain_refresh_blocks_total"] == 7
+    instrumentation.reset()
+
+    # Không có gì mới: một lần đọc, không báo listener
+    calls.clear()
+    assert tail.refresh(batch_size=3) == 0
+    assert calls == [(10, 3)] and len(notified) == 7
+
+
+def test_refresh_validates_new_blocks(storage, writer):
+    tail = Blockchain(difficulty=1)
+    _mine_blocks(writer, 3, offset=10)
+    block = storage.load_block_range(5, 6)[0]
+    block["transactions"][0]["amount"] = 10 ** 6
+    assert storage.save_block(block)
+
+    assert tail.refresh() == 3
+    assert not tail.is_chain_valid()
+    assert tail.invalid_height == 5 and tail.validated_height == 4
@@ -0,0 +1,90 @@
+"""
+Test validate chain tăng dần (Blockchain.is_chain_valid): chỉ kiểm tra block
+sau validated height, khôi phục validated height / checkpoint khi load lại,
+audit_chain() kiểm tra lại từ genesis và bắt được block bị sửa.
+
+Chạy: python -m pytest tests/test_validation.py
+"""
+import pytest
+
+import blockchain.blockchain as blockchain
+from blockchain.blockchain import Block, Blockchain
+
+
+def _mine_blocks(chain, count, offset=0):
+    for b in range(offset, offset + count):
+        chain.add_transaction({
+            "id": f"tx_{b}", "from": "alice", "to": "bob", "sender": "alice",
+            "receiver": "bob", "amount": 10 + b, "nonce": b, "status": "verified",
+        })
+        assert chain.mine_pending_transactions("miner") is not None
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Đếm số block được hash lại để kiểm tra"""
+    indexes = []
+    calculate_hash = Block.calculate_hash
+
+    def spy(block):
+        indexes.append(block.index)
+        return calculate_hash(block)
+
+    monkeypatch.setattr(Block, "calculate_hash", spy)
+    return indexes
+
+
+@pytest.fixture
+def mined(storage, monkeypatch):
+    monkeypatch.setattr(blockchain, "CHECKPOINT_INTERVAL", 3)
+    chain = Blockchain(difficulty=1)
+    _mine_blocks(chain, 10)
+    return storage
+
+
+def test_repeated_validation_is_incremental(mined, hashed):
+    chain = Blockchain(difficulty=1)
+    assert chain.validated_height == 10
+    assert chain.is_chain_valid() and chain.is_chain_valid()
+    assert hashed == []
+
+    _mine_blocks(chain, 2, offset=100)
+    hashed.clear()
+    assert chain.is_chain_valid()
+    assert hashed == [] and chain.validated_height == 12
+    assert mined.get_metadata("validated_height") == "12"
+
+
+def test_resume_from_newest_matching_checkpoint(mined, hashed):
+    assert sorted(Blockchain(difficulty=1)._load_checkpoints()) == [3, 6, 9]
+    mined.set_metadata("validated_hash", "bogus")
+
+    chain = Blockchain(difficulty=1)
+    assert chain.validated_height == 9
+    assert chain.is_chain_valid()
+    assert hashed == [10]
+
+    # Không còn checkpoint nào khớp -> validate lại từ genesis
+    mined.set_metadata("validated_hash", "bogus")
+    mined.set_metadata("checkpoints", '{"6": "other", "9": "other"}')
+    hashed.clear()
+    chain = Blockchain(difficulty=1)
+    assert chain.validated_height == 0
+    assert chain.is_chain_valid()
+    assert hashed == list(range(1, 11))
+
+
+def test_audit_catches_tampered_block(mined):
+    block = mined.load_block_range(4, 5)[0]
+    block["transactions"][0]["amount"] = 10 ** 6
+    assert mined.save_block(block)
+
+    # Block #4 nằm trước validated height -> kiểm tra tăng dần không thấy
+    chain = Blockchain(difficulty=1)
+    assert chain.is_chain_valid()
+
+    report = chain.audit_chain()
+    assert not report["valid"]
+    assert report["first_invalid_height"] == 4 and report["blocks_checked"] == 11
+    assert not chain.is_chain_valid()
+    assert chain.validated_height == 3